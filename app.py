@@ -1,17 +1,41 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, make_response
+from flask import (Flask, render_template, request, jsonify, send_from_directory, make_response, url_for,
+                   stream_with_context)
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, select, table as sa_table, column as sa_column
+from sqlalchemy.orm import load_only
 from flask_wtf.csrf import CSRFProtect
 from datetime import datetime, date, timedelta
 import os
+import io
+import csv
 import json
+import base64
+import zipfile
 import logging
 import folium
 from folium import plugins
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from werkzeug.datastructures import MultiDict
 import re
-from functools import wraps
+import math
+import struct
+import hashlib
+from functools import wraps, lru_cache
+from collections import OrderedDict
+from urllib.parse import urlencode
+from xml.sax.saxutils import escape as xml_escape
 import time
+import gzip
+import pickle
+import sqlite3
+import threading
 from dotenv import load_dotenv
+
+try:
+    import brotli
+except ImportError:  # Optional: without it cached responses are offered as gzip only
+    brotli = None
 from io import BytesIO
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -66,32 +90,644 @@ UNICODE_FONT = register_unicode_fonts()
 # Load environment variables from .env file
 load_dotenv()
 
-# Simple in-memory cache
-cache = {}
+# ============ CACHE BACKENDS ============
+# The cached() decorator talks to a backend object with get/set/delete/clear
+# and delete_tags. Every entry is tagged with the model names it was built
+# from, so a write only drops the entries that depend on what changed.
+# MemoryCache keeps entries in the worker's own dict (fine for a single dev
+# server); SQLiteCache keeps them in a file under instance/ so every gunicorn
+# worker reads the same entries and clear_cache() reaches all of them.
+# Both are bounded: least-recently-used entries are evicted once either the
+# entry count or the byte budget is exceeded, and expired entries are purged.
 CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', 30))  # Cache timeout in seconds
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite' if os.getenv('FLASK_ENV') == 'production' else 'memory')
+CACHE_PATH = os.getenv('CACHE_PATH', os.path.abspath('./instance/cache.db'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 512))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 32 * 1024 * 1024))
+CACHE_SWEEP_INTERVAL = int(os.getenv('CACHE_SWEEP_INTERVAL', 60))  # Seconds between expired-entry purges
+CACHE_LOCK_TIMEOUT = float(os.getenv('CACHE_LOCK_TIMEOUT', 10))  # Max seconds a recompute holds its key
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv('CACHE_COMPRESS_MIN_BYTES', 1024))  # Smaller bodies are sent as-is
 
-def cached(timeout=CACHE_TIMEOUT):
-    """Simple caching decorator"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Create a cache key based on the function name and request args
-            cache_key = f"{func.__name__}:{str(request.args)}"
 
-            # Check if we have a cached result
-            if cache_key in cache:
-                result, timestamp = cache[cache_key]
-                # Check if cache is still valid
-                if time.time() - timestamp < timeout:
-                    return result
+def _entry_size(key, value):
+    """Approximate bytes held by a cache entry (key plus pickled value)."""
+    return len(key.encode('utf-8')) + len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry TTL and a byte budget.
+
+    Each worker has its own copy.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, sweep_interval=CACHE_SWEEP_INTERVAL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()  # key -> (value, expires_at, size, tags), oldest use first
+        self._bytes = 0
+        self._next_sweep = time.time() + sweep_interval
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry[1]:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, timeout, tags=()):
+        size = _entry_size(key, value)
+        if size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        with self._lock:
+            now = time.time()
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, now + timeout, size, frozenset(tags))
+            self._bytes += size
+            if now >= self._next_sweep:
+                self._purge_expired(now)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def acquire_lock(self, key, timeout):
+        # Only one process shares this dict; SingleFlight already serialises its threads
+        return True
+
+    def release_lock(self, key):
+        pass
+
+    def delete_tags(self, tags):
+        """Drop entries tagged with any of tags; returns how many were dropped."""
+        tags = set(tags)
+        with self._lock:
+            keys = [k for k, entry in self._entries.items() if entry[3] & tags]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def usage(self):
+        """Entry count and bytes held per key prefix (the cached view's name)."""
+        usage = {}
+        with self._lock:
+            for key, entry in self._entries.items():
+                bucket = usage.setdefault(key.split(':', 1)[0], {'entries': 0, 'bytes': 0})
+                bucket['entries'] += 1
+                bucket['bytes'] += entry[2]
+        return usage
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        size = self._entries.pop(key)[2]
+        self._bytes -= size
+
+    def _purge_expired(self, now):
+        for key in [k for k, entry in self._entries.items() if now >= entry[1]]:
+            self._remove(key)
+            self.expirations += 1
+        self._next_sweep = now + self.sweep_interval
+
+
+class SQLiteCache:
+    """Cache shared by all workers through a SQLite file on local disk."""
+
+    # Bump when the cache_entry layout changes; old files are simply rebuilt
+    SCHEMA_VERSION = 3
+
+    def __init__(self, path, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, sweep_interval=CACHE_SWEEP_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+        self._local = threading.local()
+        # Counted by this worker only; other workers evict from the same file too
+        self.evictions = 0
+        self.expirations = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connect()
+        if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS cache_entry")
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entry ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL, tags TEXT NOT NULL DEFAULT '')"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entry_last_used ON cache_entry (last_used)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_lock ("
+            "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._owner = f"{os.getpid()}"
+
+    def _connect(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+
+    @property
+    def size_bytes(self):
+        return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM cache_entry").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache_entry WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now >= row[1]:
+                return None
+            conn.execute("UPDATE cache_entry SET last_used = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            app.logger.warning(f"Cache read failed for {key}: {e}")
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout, tags=()):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        size = len(key.encode('utf-8')) + len(blob)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entry (key, value, expires_at, size, last_used, tags) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, now + timeout, size, now, ''.join(f'|{tag}|' for tag in sorted(tags)))
+            )
+            if now >= self._next_sweep:
+                self.expirations += conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (now,)).rowcount
+                self._next_sweep = now + self.sweep_interval
+            self._evict(conn)
+        except sqlite3.Error as e:
+            app.logger.warning(f"Cache write failed for {key}: {e}")
+
+    def _evict(self, conn):
+        """Drop least-recently-used rows beyond the entry and byte limits."""
+        self.evictions += conn.execute(
+            "DELETE FROM cache_entry WHERE key IN ("
+            "SELECT key FROM cache_entry ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        self.evictions += conn.execute(
+            "DELETE FROM cache_entry WHERE key IN ("
+            "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS running "
+            "FROM cache_entry) WHERE running > ?)",
+            (self.max_bytes,)
+        ).rowcount
+
+    def delete(self, key):
+        try:
+            self._connect().execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            app.logger.warning(f"Cache delete failed for {key}: {e}")
+
+    def acquire_lock(self, key, timeout):
+        """Take the recompute lease for key; False if another worker holds a live one."""
+        now = time.time()
+        owner = f"{self._owner}:{threading.get_ident()}"
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache_lock WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache_lock (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + timeout)
+            )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            app.logger.warning(f"Cache lock failed for {key}: {e}")
+            return True  # Fall back to computing without coordination
+
+    def release_lock(self, key):
+        owner = f"{self._owner}:{threading.get_ident()}"
+        try:
+            self._connect().execute("DELETE FROM cache_lock WHERE key = ? AND owner = ?", (key, owner))
+        except sqlite3.Error as e:
+            app.logger.warning(f"Cache unlock failed for {key}: {e}")
+
+    def delete_tags(self, tags):
+        """Drop entries tagged with any of tags; returns how many were dropped."""
+        tags = sorted(set(tags))
+        if not tags:
+            return 0
+        try:
+            return self._connect().execute(
+                "DELETE FROM cache_entry WHERE " + " OR ".join("instr(tags, ?) > 0" for _ in tags),
+                [f'|{tag}|' for tag in tags]
+            ).rowcount
+        except sqlite3.Error as e:
+            app.logger.warning(f"Cache tag invalidation failed for {tags}: {e}")
+            return 0
+
+    def usage(self):
+        """Entry count and bytes held per key prefix (the cached view's name)."""
+        try:
+            rows = self._connect().execute(
+                "SELECT substr(key, 1, instr(key, ':') - 1) AS prefix, COUNT(*), SUM(size) "
+                "FROM cache_entry GROUP BY prefix"
+            ).fetchall()
+        except sqlite3.Error as e:
+            app.logger.warning(f"Cache usage query failed: {e}")
+            return {}
+        return {prefix: {'entries': count, 'bytes': size} for prefix, count, size in rows}
+
+    def clear(self):
+        try:
+            self._connect().execute("DELETE FROM cache_entry")
+        except sqlite3.Error as e:
+            app.logger.warning(f"Cache clear failed: {e}")
+
+
+def create_cache_backend(name=CACHE_BACKEND):
+    """Build the cache backend selected by the CACHE_BACKEND setting."""
+    if name == 'sqlite':
+        return SQLiteCache(CACHE_PATH)
+    if name == 'memory':
+        return MemoryCache()
+    raise ValueError(f"Unknown CACHE_BACKEND '{name}' (expected 'memory' or 'sqlite')")
+
+
+cache = create_cache_backend()
+
+
+class CacheStats:
+    """Hit/miss counters for cached views, grouped by key prefix.
+
+    Counters live in this worker only; the snapshot reports the pid so
+    numbers from several gunicorn workers are not mistaken for one another.
+    Entry counts and bytes come from the backend and are shared when the
+    backend is.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, backend=None):
+        with self._lock:
+            self._views = {}
+            self._invalidations = {'commits': 0, 'entries_dropped': 0, 'by_tag': {}}
+            self.since = datetime.utcnow()
+        if backend is not None:
+            backend.evictions = 0
+            backend.expirations = 0
+
+    @staticmethod
+    def _empty_view():
+        return {
+            'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_failures': 0,
+            'miss_seconds': 0.0, 'max_miss_seconds': 0.0, 'refresh_seconds': 0.0
+        }
+
+    def _view(self, prefix):
+        if prefix not in self._views:
+            self._views[prefix] = self._empty_view()
+        return self._views[prefix]
+
+    def record_hit(self, prefix, stale=False):
+        with self._lock:
+            self._view(prefix)['stale_hits' if stale else 'hits'] += 1
+
+    def record_miss(self, prefix, seconds):
+        with self._lock:
+            view = self._view(prefix)
+            view['misses'] += 1
+            view['miss_seconds'] += seconds
+            view['max_miss_seconds'] = max(view['max_miss_seconds'], seconds)
+
+    def record_refresh(self, prefix, seconds, failed=False):
+        with self._lock:
+            view = self._view(prefix)
+            view['refresh_failures' if failed else 'refreshes'] += 1
+            view['refresh_seconds'] += seconds
+
+    def record_invalidation(self, tags, dropped):
+        with self._lock:
+            self._invalidations['commits'] += 1
+            self._invalidations['entries_dropped'] += dropped
+            by_tag = self._invalidations['by_tag']
+            for tag in tags:
+                by_tag[tag] = by_tag.get(tag, 0) + 1
+
+    def snapshot(self, backend):
+        """Counters plus the backend's current size, as plain JSON-able data."""
+        usage = backend.usage()
+        with self._lock:
+            views = {}
+            for prefix in sorted(set(self._views) | set(usage)):
+                counts = self._views.get(prefix) or self._empty_view()
+                lookups = counts['hits'] + counts['stale_hits'] + counts['misses']
+                views[prefix] = {
+                    'hits': counts['hits'],
+                    'stale_hits': counts['stale_hits'],
+                    'misses': counts['misses'],
+                    'hit_ratio': round((counts['hits'] + counts['stale_hits']) / lookups, 4) if lookups else None,
+                    'avg_miss_ms': round(counts['miss_seconds'] * 1000 / counts['misses'], 2) if counts['misses'] else None,
+                    'max_miss_ms': round(counts['max_miss_seconds'] * 1000, 2),
+                    'refreshes': counts['refreshes'],
+                    'refresh_failures': counts['refresh_failures'],
+                    'avg_refresh_ms': round(counts['refresh_seconds'] * 1000 / counts['refreshes'], 2) if counts['refreshes'] else None,
+                    'entries': usage.get(prefix, {}).get('entries', 0),
+                    'bytes': usage.get(prefix, {}).get('bytes', 0)
+                }
+            invalidations = dict(self._invalidations, by_tag=dict(self._invalidations['by_tag']))
+            since = self.since
+        return {
+            'worker_pid': os.getpid(),
+            'backend': type(backend).__name__,
+            'since': since.isoformat(),
+            'entries': sum(v['entries'] for v in usage.values()),
+            'bytes': sum(v['bytes'] for v in usage.values()),
+            'max_entries': backend.max_entries,
+            'max_bytes': backend.max_bytes,
+            'evictions': backend.evictions,
+            'expirations': backend.expirations,
+            'views': views,
+            'invalidations': invalidations
+        }
+
+
+cache_stats = CacheStats()
+
+
+class SingleFlight:
+    """Run one computation per key at a time within this process.
+
+    Threads that ask for a key while it is being computed wait for the
+    leader's result instead of repeating the work.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+cache_flights = SingleFlight()
+
+
+def _wait_for_entry(key, timeout, poll_interval=0.05):
+    """Poll the cache until another worker stores key or the lease runs out."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        time.sleep(poll_interval)
+        frozen = cache.get(key)
+        if frozen is not None:
+            return frozen
+    return None
+
 
-            # Call the original function
-            result = func(*args, **kwargs)
+def _compress_variants(body):
+    """Pre-compress a body once so cache hits only pick bytes to send."""
+    variants = {}
+    if len(body) < CACHE_COMPRESS_MIN_BYTES:
+        return variants
+    variants['gzip'] = gzip.compress(body, compresslevel=6, mtime=0)
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=5)
+    # Already-dense bodies can come out larger; those are not worth offering
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
 
-            # Store in cache
-            cache[cache_key] = (result, time.time())
 
-            return result
+def _freeze_response(result):
+    """Turn a view return value into plain data that any worker can rebuild.
+
+    The encoded body is kept together with its gzip/brotli variants.
+    """
+    response = make_response(result)
+    body = response.get_data()
+    return {
+        'body': body,
+        'encoded': _compress_variants(body) if response.status_code == 200 else {},
+        'status': response.status_code,
+        'mimetype': response.mimetype
+    }
+
+
+def _thaw_response(frozen):
+    """Rebuild a response, choosing the best variant the client accepts."""
+    variants = frozen.get('encoded') or {}
+    encoding = None
+    for candidate in ('br', 'gzip'):
+        if candidate in variants and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+
+    response = app.response_class(
+        variants[encoding] if encoding else frozen['body'],
+        status=frozen['status'],
+        mimetype=frozen['mimetype']
+    )
+    if variants:
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def make_cache_key(prefix, args):
+    """Build a cache key from sorted, non-empty query parameters.
+
+    ?ward=1&fiscal_year=x and ?fiscal_year=x&ward=1 map to the same entry, and
+    empty filters (?ward=) are dropped because the views ignore them anyway.
+    """
+    params = sorted((k, v) for k, v in args.items(multi=True) if v != '')
+    return f"{prefix}:{urlencode(params)}"
+
+
+def cache_policy(name, timeout, stale_timeout=None):
+    """Return (soft_ttl, hard_ttl) for a cached view.
+
+    Within soft_ttl an entry is fresh. Between soft_ttl and hard_ttl it is
+    served as-is while a background thread rebuilds it; past hard_ttl it is
+    gone and the next request recomputes. Either value can be overridden per
+    view with CACHE_TTL_<VIEW_NAME>="soft,hard", e.g.
+    CACHE_TTL_GET_STATISTICS="15,120".
+    """
+    soft = timeout
+    hard = stale_timeout if stale_timeout is not None else timeout
+    override = os.getenv(f'CACHE_TTL_{name.upper()}')
+    if override:
+        try:
+            soft, hard = (int(part) for part in override.split(','))
+        except ValueError:
+            print(f"Ignoring invalid CACHE_TTL_{name.upper()}={override!r}; expected 'soft,hard'")
+    return soft, max(soft, hard)
+
+
+# Keys this worker is already refreshing in the background
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _refresh_in_background(cache_key, path, query_string, rebuild):
+    """Rebuild a stale entry off the request thread, once per key across workers."""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+
+    def run():
+        prefix = cache_key.split(':', 1)[0]
+        started = time.perf_counter()
+        try:
+            if not cache.acquire_lock(cache_key, CACHE_LOCK_TIMEOUT):
+                return  # Another worker is already on it
+            try:
+                with app.test_request_context(path, query_string=query_string):
+                    rebuild()
+            finally:
+                cache.release_lock(cache_key)
+            cache_stats.record_refresh(prefix, time.perf_counter() - started)
+        except Exception as e:
+            cache_stats.record_refresh(prefix, time.perf_counter() - started, failed=True)
+            app.logger.exception(f"Background cache refresh failed for {cache_key}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(cache_key)
+
+    threading.Thread(target=run, name=f"cache-refresh:{cache_key}", daemon=True).start()
+
+
+def cached(timeout=CACHE_TIMEOUT, tags=(), stale_timeout=None):
+    """Cache a view's response in the shared cache backend.
+
+    tags lists the model class names the response is built from; a commit
+    touching any of them drops the entry (see invalidate_cache_tags).
+    timeout/stale_timeout are the soft and hard TTLs (see cache_policy); a
+    commit invalidation always drops the entry, it is never served stale.
+    Responses carry the tags' DataVersion counters they were built from as
+    response.data_versions, which conditional() turns into the ETag.
+    """
+    def decorator(func):
+        soft_ttl, hard_ttl = cache_policy(func.__name__, timeout, stale_timeout)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # Create a cache key based on the function name, path parameters
+            # (e.g. tile coordinates) and request args
+            key_args = request.args
+            if kwargs:
+                key_args = MultiDict(sorted(kwargs.items()) + list(request.args.items(multi=True)))
+            cache_key = make_cache_key(func.__name__, key_args)
+
+            def rebuild():
+                # A commit landing while func runs bumps these inside its own
+                # transaction, before its invalidation clears the entry
+                versions = get_data_versions(tags) if tags else None
+
+                # Call the original function
+                frozen = _freeze_response(func(*args, **kwargs))
+                frozen['fresh_until'] = time.time() + soft_ttl
+                frozen['versions'] = versions
+
+                # Only successful responses are worth sharing with other workers,
+                # and only if no commit since the start could have made them stale
+                if frozen['status'] == 200 and (versions is None or get_data_versions(tags) == versions):
+                    cache.set(cache_key, frozen, hard_ttl, tags=tags)
+                return frozen
+
+            # Check if we have a cached result; past its soft TTL it is still
+            # served, but refreshed in the background for the next poll
+            frozen = cache.get(cache_key)
+            if frozen is not None:
+                stale = time.time() >= frozen.get('fresh_until', float('inf'))
+                if stale:
+                    _refresh_in_background(cache_key, request.path, request.query_string.decode('utf-8'), rebuild)
+                cache_stats.record_hit(func.__name__, stale=stale)
+                response = _thaw_response(frozen)
+                response.headers['X-Cache'] = 'STALE' if stale else 'HIT'
+                response.data_versions = frozen.get('versions')
+                return response
+
+            def compute():
+                # Another thread or worker may have filled the entry meanwhile
+                frozen = cache.get(cache_key)
+                if frozen is not None:
+                    return frozen
+
+                # Across workers: whoever holds the lease computes, the rest wait for it
+                locked = cache.acquire_lock(cache_key, CACHE_LOCK_TIMEOUT)
+                if not locked:
+                    frozen = _wait_for_entry(cache_key, CACHE_LOCK_TIMEOUT)
+                    if frozen is not None:
+                        return frozen
+                try:
+                    return rebuild()
+                finally:
+                    if locked:
+                        cache.release_lock(cache_key)
+
+            # Within this worker: concurrent misses share one computation
+            started = time.perf_counter()
+            frozen = cache_flights.do(cache_key, compute)
+            cache_stats.record_miss(func.__name__, time.perf_counter() - started)
+            response = _thaw_response(frozen)
+            response.headers['X-Cache'] = 'MISS'
+            response.data_versions = frozen.get('versions')
+            return response
         return wrapper
     return decorator
 
@@ -182,29 +818,40 @@ def is_valid_nepali_date(date_string):
 
 # Database Models
 class ReliefDistribution(db.Model):
+    # The list, statistics and dashboard routes filter on fiscal year, disaster
+    # type or ward and page by distribution_date; these composites serve both,
+    # and their leading columns cover plain equality filters. Search uses the
+    # FTS5 index and bbox/near the R-tree, so the other columns carry no index
+    # (see audit_query_plans.py and migrate_composite_indexes.py).
+    __table_args__ = (
+        db.Index('ix_relief_distribution_fiscal_year_date', 'fiscal_year', 'distribution_date'),
+        db.Index('ix_relief_distribution_disaster_type_date', 'disaster_type', 'distribution_date'),
+        db.Index('ix_relief_distribution_ward_date', 'ward', 'distribution_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     # Beneficiary Information
-    beneficiary_name = db.Column(db.String(200), nullable=False, index=True)  # Added index
+    beneficiary_name = db.Column(db.String(200), nullable=False)
     beneficiary_id = db.Column(db.String(100), nullable=False, unique=True)
-    father_name = db.Column(db.String(200), index=True)  # Added index
+    father_name = db.Column(db.String(200))
     phone = db.Column(db.String(20))
 
     # Lock Status
-    is_locked = db.Column(db.Boolean, default=False, index=True)  # Added index
+    is_locked = db.Column(db.Boolean, default=False)
 
     # Disaster Information
-    disaster_date = db.Column(db.String(10), index=True)  # YYYY-MM-DD format (supports both Nepali and AD dates) - Added index
-    disaster_type = db.Column(db.String(100), index=True)  # Added index
-    fiscal_year = db.Column(db.String(20), index=True)  # e.g., "2080/81" - Added index
+    disaster_date = db.Column(db.String(10))  # YYYY-MM-DD format (supports both Nepali and AD dates)
+    disaster_type = db.Column(db.String(100))
+    fiscal_year = db.Column(db.String(20))  # e.g., "2080/81"
 
     # Location Information
-    ward = db.Column(db.Integer, index=True)  # 1-9 - Added index
-    tole = db.Column(db.String(200), index=True)  # Added index
-    location = db.Column(db.String(200), index=True)  # Building name/address - Added index
+    ward = db.Column(db.Integer)  # 1-9
+    tole = db.Column(db.String(200))
+    location = db.Column(db.String(200))  # Building name/address
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
-    current_shelter_location = db.Column(db.String(200), index=True)  # Added index
+    current_shelter_location = db.Column(db.String(200))
 
     # Family Details (JSON)
     family_members_json = db.Column(db.Text)  # [{"name": "...", "relation": "...", "age": ..., "gender": "M/F"}, ...]
@@ -218,9 +865,9 @@ class ReliefDistribution(db.Model):
     deaths_during_disaster = db.Column(db.Integer, default=0)
 
     # Beneficiary Status
-    in_social_security_fund = db.Column(db.Boolean, default=False, index=True)  # Added index
-    ssf_type = db.Column(db.String(100), index=True)  # Type of SSF (OAS, Widow, Disabled, etc) - Added index
-    poverty_card_holder = db.Column(db.Boolean, default=False, index=True)  # Added index
+    in_social_security_fund = db.Column(db.Boolean, default=False)
+    ssf_type = db.Column(db.String(100))  # Type of SSF (OAS, Widow, Disabled, etc)
+    poverty_card_holder = db.Column(db.Boolean, default=False)
 
     # Harm Information
     harms_json = db.Column(db.Text)  # [{"member_name": "...", "harm": "...", "severity": "..."}, ...]
@@ -232,9 +879,10 @@ class ReliefDistribution(db.Model):
 
     # Relief Distribution
     relief_items_json = db.Column(db.Text)  # Store as JSON: [{"item": "Food", "quantity": 5}, ...]
+    relief_items_text = db.Column(db.Text)  # "Food: 5 units, ..." for map tooltips, see format_relief_items()
     cash_received = db.Column(db.Float, default=0.0)
     distribution_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Added index
-    status = db.Column(db.String(50), default='Distributed', index=True)  # Added index
+    status = db.Column(db.String(50), default='Distributed')
 
     # Documentation
     documents = db.Column(db.Text)  # Comma-separated filenames
@@ -246,8 +894,8 @@ class ReliefDistribution(db.Model):
     fund_transaction = db.relationship('FundTransaction', backref=db.backref('distributions', lazy=True))
 
     # Metadata
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Added index
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Added index
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def get_relief_items(self):
         try:
@@ -257,6 +905,7 @@ class ReliefDistribution(db.Model):
 
     def set_relief_items(self, items):
         self.relief_items_json = json.dumps(items)
+        self.relief_items_text = format_relief_items(items)
 
     def get_family_members(self):
         try:
@@ -282,50 +931,253 @@ class ReliefDistribution(db.Model):
     def set_documents(self, docs):
         self.documents = ','.join(docs) if docs else None
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'beneficiary_name': self.beneficiary_name,
-            'beneficiary_id': self.beneficiary_id,
-            'father_name': self.father_name,
-            'phone': self.phone,
-            'disaster_date': self.disaster_date if self.disaster_date else None,  # Already stored as string YYYY-MM-DD
-            'disaster_type': self.disaster_type,
-            'fiscal_year': self.fiscal_year,
-            'ward': self.ward,
-            'tole': self.tole,
-            'location': self.location,
-            'latitude': self.latitude,
-            'longitude': self.longitude,
-            'current_shelter_location': self.current_shelter_location,
-            'family_members': self.get_family_members(),
-            'male_count': self.male_count,
-            'female_count': self.female_count,
-            'children_count': self.children_count,
-            'pregnant_mother_count': self.pregnant_mother_count,
-            'mother_under_2_baby': self.mother_under_2_baby,
-            'deaths_during_disaster': self.deaths_during_disaster,
-            'in_social_security_fund': self.in_social_security_fund,
-            'ssf_type': self.ssf_type,
-            'poverty_card_holder': self.poverty_card_holder,
-            'harms': self.get_harms(),
-            'bank_account_holder_name': self.bank_account_holder_name,
-            'bank_account_number': self.bank_account_number,
-            'bank_name': self.bank_name,
-            'relief_items': self.get_relief_items(),
-            'cash_received': self.cash_received,
-            'distribution_date': self.distribution_date.strftime('%Y-%m-%d %H:%M'),
-            'status': self.status,
-            'documents': self.get_documents(),
-            'image_filename': self.image_filename,
-            'notes': self.notes,
-            'is_locked': self.is_locked,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M'),
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M')
-        }
+    def to_dict(self, fields=None):
+        """Every field of DISTRIBUTION_FIELDS, or just the named ones.
+
+        JSON columns are only decoded for the fields asked for.
+        """
+        return {name: DISTRIBUTION_FIELDS[name][1](self) for name in (fields or DISTRIBUTION_FIELDS)}
+
+
+def _column_field(name):
+    return (name,), lambda distribution: getattr(distribution, name)
+
+
+def _timestamp_field(name):
+    return (name,), lambda distribution: getattr(distribution, name).strftime('%Y-%m-%d %H:%M')
+
+
+# ReliefDistribution.to_dict() fields: name -> (columns the value is read from, value).
+# ?fields= and ?view= pick from these, and only the columns they read are loaded.
+DISTRIBUTION_FIELDS = {
+    'id': _column_field('id'),
+    'beneficiary_name': _column_field('beneficiary_name'),
+    'beneficiary_id': _column_field('beneficiary_id'),
+    'father_name': _column_field('father_name'),
+    'phone': _column_field('phone'),
+    'disaster_date': _column_field('disaster_date'),  # Already stored as string YYYY-MM-DD
+    'disaster_type': _column_field('disaster_type'),
+    'fiscal_year': _column_field('fiscal_year'),
+    'ward': _column_field('ward'),
+    'tole': _column_field('tole'),
+    'location': _column_field('location'),
+    'latitude': _column_field('latitude'),
+    'longitude': _column_field('longitude'),
+    'current_shelter_location': _column_field('current_shelter_location'),
+    'family_members': (('family_members_json',), ReliefDistribution.get_family_members),
+    'male_count': _column_field('male_count'),
+    'female_count': _column_field('female_count'),
+    'children_count': _column_field('children_count'),
+    'pregnant_mother_count': _column_field('pregnant_mother_count'),
+    'mother_under_2_baby': _column_field('mother_under_2_baby'),
+    'deaths_during_disaster': _column_field('deaths_during_disaster'),
+    'in_social_security_fund': _column_field('in_social_security_fund'),
+    'ssf_type': _column_field('ssf_type'),
+    'poverty_card_holder': _column_field('poverty_card_holder'),
+    'harms': (('harms_json',), ReliefDistribution.get_harms),
+    'bank_account_holder_name': _column_field('bank_account_holder_name'),
+    'bank_account_number': _column_field('bank_account_number'),
+    'bank_name': _column_field('bank_name'),
+    'relief_items': (('relief_items_json',), ReliefDistribution.get_relief_items),
+    'relief_items_text': _column_field('relief_items_text'),
+    'cash_received': _column_field('cash_received'),
+    'distribution_date': _timestamp_field('distribution_date'),
+    'status': _column_field('status'),
+    'documents': (('documents',), ReliefDistribution.get_documents),
+    'image_filename': _column_field('image_filename'),
+    'notes': _column_field('notes'),
+    'is_locked': _column_field('is_locked'),
+    'created_at': _timestamp_field('created_at'),
+    'updated_at': _timestamp_field('updated_at')
+}
+
+# Named field sets for ?view=; summary is what the dashboard table shows, with
+# the relief items as their stored display string instead of decoded JSON
+DISTRIBUTION_VIEWS = {
+    'summary': ('id', 'beneficiary_name', 'beneficiary_id', 'phone', 'location', 'disaster_type', 'fiscal_year',
+                'ward', 'relief_items_text', 'cash_received', 'distribution_date', 'status', 'is_locked',
+                'image_filename'),
+    'full': None
+}
+
+
+def parse_distribution_fields(args, errors):
+    """Field names picked with ?fields=a,b or ?view=summary, or None for all of them."""
+    fields, view = args.get('fields'), args.get('view')
+    if fields and view:
+        errors.append('fields र view सँगै दिन मिल्दैन')
+        return None
+    if view:
+        if view not in DISTRIBUTION_VIEWS:
+            errors.append(f"view {' वा '.join(DISTRIBUTION_VIEWS)} मध्ये एक हुनुपर्छ")
+            return None
+        return DISTRIBUTION_VIEWS[view]
+    if not fields:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+    unknown = [name for name in names if name not in DISTRIBUTION_FIELDS]
+    if unknown:
+        errors.append(f"अज्ञात fields: {', '.join(unknown)}")
+    return names or None
+
+
+def load_distribution_fields(fields, *extra_columns):
+    """Loader option reading only the columns behind fields (plus extra_columns), or None for all.
+
+    Anything else raises instead of quietly loading row by row.
+    """
+    if fields is None:
+        return None
+    columns = dict.fromkeys(column for name in fields for column in DISTRIBUTION_FIELDS[name][0])
+    columns.update(dict.fromkeys(column.key for column in extra_columns))
+    return load_only(*[getattr(ReliefDistribution, column) for column in columns], raiseload=True)
+
+def parse_relief_items(items):
+    """Yield (item, quantity, unit) for relief_items_json entries.
+
+    Entries whose quantity is not a whole number are skipped, the same way
+    the statistics used to skip them when summing the JSON.
+    """
+    for item in items or []:
+        try:
+            quantity = int(item.get('quantity', 0))
+        except (ValueError, TypeError, AttributeError):
+            continue
+        unit = item.get('unit')
+        yield item.get('item') or 'Unknown', quantity, unit if isinstance(unit, str) else None
+
+
+def format_relief_items(items):
+    """Display string for relief_items_json entries, stored so readers never decode the JSON."""
+    return ", ".join([f"{i.get('item')}: {i.get('quantity')} {i.get('unit', 'units')}" for i in items or []])
+
+# Relief Statistics Rollups - totals per (fiscal_year, disaster_type, ward) group, kept in
+# step with relief_distribution inside the same flush; rebuild_relief_rollups() recomputes them.
+# Readers always SUM over a group's rows, so a duplicate row from two workers creating the
+# same new group at once only splits the totals instead of corrupting them.
+class ReliefStatRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    fiscal_year = db.Column(db.String(20), index=True)
+    disaster_type = db.Column(db.String(100), index=True)
+    ward = db.Column(db.Integer, index=True)
+    distribution_count = db.Column(db.Integer, nullable=False, default=0)
+    cash_total = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class ReliefItemRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    fiscal_year = db.Column(db.String(20), index=True)
+    disaster_type = db.Column(db.String(100), index=True)
+    ward = db.Column(db.Integer, index=True)
+    item = db.Column(db.String(200), nullable=False, index=True)
+    line_count = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+
+def _add_relief_contribution(stat_deltas, item_deltas, row, sign):
+    """Add (sign=1) or remove (sign=-1) one distribution's share of the rollups."""
+    fiscal_year, disaster_type, ward, cash_received, relief_items_json = row
+    group = (fiscal_year, disaster_type, ward)
+    stat = stat_deltas.setdefault(group, [0, 0.0])
+    stat[0] += sign
+    stat[1] += sign * (cash_received or 0.0)
+    try:
+        items = json.loads(relief_items_json) if relief_items_json else []
+    except (json.JSONDecodeError, TypeError):
+        items = []
+    for item, quantity, _unit in parse_relief_items(items):
+        line = item_deltas.setdefault(group + (item,), [0, 0])
+        line[0] += sign
+        line[1] += sign * quantity
+
+
+def _apply_rollup_delta(conn, model, key, increments, count_column):
+    """Add increments to one row of the key's group, creating or dropping the row as needed."""
+    table = model.__table__
+    match = db.and_(*[table.c[column].is_not_distinct_from(value) for column, value in key.items()])
+    first_row = db.select(db.func.min(table.c.id)).where(match).scalar_subquery()
+    updated = conn.execute(
+        table.update().where(table.c.id == first_row).values(
+            {column: table.c[column] + value for column, value in increments.items()}
+        )
+    )
+    if updated.rowcount == 0:
+        conn.execute(table.insert().values(**key, **increments))
+    conn.execute(table.delete().where(match, table.c[count_column] == 0))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _maintain_relief_rollups(session, flush_context, instances):
+    new = [obj for obj in session.new if isinstance(obj, ReliefDistribution)]
+    dirty = [obj for obj in session.dirty if isinstance(obj, ReliefDistribution)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, ReliefDistribution)]
+    if not (new or dirty or deleted):
+        return
+
+    columns = (ReliefDistribution.fiscal_year, ReliefDistribution.disaster_type, ReliefDistribution.ward,
+               ReliefDistribution.cash_received, ReliefDistribution.relief_items_json)
+    conn = session.connection()
+    stat_deltas, item_deltas = {}, {}
+
+    # The rows still hold their pre-flush values, which is what the rollups counted
+    stored_ids = [obj.id for obj in dirty + deleted if obj.id is not None]
+    if stored_ids:
+        for row in conn.execute(db.select(*columns).where(ReliefDistribution.id.in_(stored_ids))):
+            _add_relief_contribution(stat_deltas, item_deltas, row, -1)
+    for obj in new + dirty:
+        _add_relief_contribution(stat_deltas, item_deltas, [getattr(obj, c.key) for c in columns], 1)
+
+    for (fiscal_year, disaster_type, ward), (count, cash) in stat_deltas.items():
+        if count or abs(cash) > 1e-9:
+            _apply_rollup_delta(conn, ReliefStatRollup,
+                                {'fiscal_year': fiscal_year, 'disaster_type': disaster_type, 'ward': ward},
+                                {'distribution_count': count, 'cash_total': cash}, 'distribution_count')
+    for (fiscal_year, disaster_type, ward, item), (lines, quantity) in item_deltas.items():
+        if lines or quantity:
+            _apply_rollup_delta(conn, ReliefItemRollup,
+                                {'fiscal_year': fiscal_year, 'disaster_type': disaster_type, 'ward': ward, 'item': item},
+                                {'line_count': lines, 'quantity': quantity}, 'line_count')
+
+
+def rebuild_relief_rollups():
+    """Recompute both relief rollup tables from relief_distribution.
+
+    Must run inside an app context; commits when done.
+    """
+    db.session.execute(ReliefStatRollup.__table__.delete())
+    db.session.execute(ReliefItemRollup.__table__.delete())
+
+    stat_deltas, item_deltas = {}, {}
+    rows = db.session.execute(db.select(
+        ReliefDistribution.fiscal_year, ReliefDistribution.disaster_type, ReliefDistribution.ward,
+        ReliefDistribution.cash_received, ReliefDistribution.relief_items_json
+    )).yield_per(1000)
+    for row in rows:
+        _add_relief_contribution(stat_deltas, item_deltas, row, 1)
+
+    if stat_deltas:
+        db.session.execute(ReliefStatRollup.__table__.insert(), [
+            {'fiscal_year': fy, 'disaster_type': dt, 'ward': ward, 'distribution_count': count, 'cash_total': cash}
+            for (fy, dt, ward), (count, cash) in stat_deltas.items()
+        ])
+    if item_deltas:
+        db.session.execute(ReliefItemRollup.__table__.insert(), [
+            {'fiscal_year': fy, 'disaster_type': dt, 'ward': ward, 'item': item, 'line_count': lines, 'quantity': quantity}
+            for (fy, dt, ward, item), (lines, quantity) in item_deltas.items()
+        ])
+    # Raw table writes are invisible to the flush listeners, so bump and invalidate by hand
+    bump_data_versions(db.session.connection(), {'ReliefDistribution'})
+    db.session.commit()
+    invalidate_cache_tags({'ReliefDistribution'})
+    return len(stat_deltas), len(item_deltas)
 
 # Disaster Model
 class Disaster(db.Model):
+    # /api/disaster-statistics filters by fiscal year and groups by ward and type
+    __table_args__ = (
+        db.Index('ix_disaster_fiscal_year_ward_type', 'fiscal_year', 'ward', 'disaster_type'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     disaster_type = db.Column(db.String(100), nullable=False, index=True)  # Added index
     disaster_date = db.Column(db.Date, nullable=False, index=True)  # AD date (Gregorian calendar)
@@ -334,7 +1186,7 @@ class Disaster(db.Model):
     tole = db.Column(db.String(200), index=True)  # Added index
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
-    fiscal_year = db.Column(db.String(20), index=True)  # Added index
+    fiscal_year = db.Column(db.String(20))
     description = db.Column(db.Text)
     affected_households = db.Column(db.Integer, default=0)
     affected_people = db.Column(db.Integer, default=0)
@@ -410,6 +1262,134 @@ class Disaster(db.Model):
             'created_at': self.created_at.strftime('%Y-%m-%d')
         }
 
+# Daily Rollup Model - per-day totals of distributions and disasters by type and ward,
+# maintained in the same flush as the records and read by /api/timeseries. The BS date
+# of each day is stored alongside it so BS months can be grouped without converting.
+class DailyRollup(db.Model):
+    # /api/timeseries always filters by source and a day range, then optionally by type
+    # or ward; with those checked from the index the days come out in GROUP BY order
+    __table_args__ = (
+        db.Index('ix_daily_rollup_source_day_type_ward', 'source', 'day', 'disaster_type', 'ward'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)  # AD date
+    bs_date = db.Column(db.String(10), nullable=False)  # BS date YYYY-MM-DD
+    source = db.Column(db.String(20), nullable=False)  # 'relief' or 'disaster'
+    disaster_type = db.Column(db.String(100))
+    ward = db.Column(db.Integer)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    cash_total = db.Column(db.Float, nullable=False, default=0.0)
+    affected_people = db.Column(db.Integer, nullable=False, default=0)
+    affected_households = db.Column(db.Integer, nullable=False, default=0)
+    deaths = db.Column(db.Integer, nullable=False, default=0)
+    missing_persons = db.Column(db.Integer, nullable=False, default=0)
+    estimated_loss = db.Column(db.Float, nullable=False, default=0.0)
+
+
+# model -> (source name, date column, {rollup column: model column})
+DAILY_ROLLUP_SOURCES = {
+    ReliefDistribution: ('relief', 'distribution_date', {'cash_total': 'cash_received'}),
+    Disaster: ('disaster', 'disaster_date', {
+        'affected_people': 'affected_people',
+        'affected_households': 'affected_households',
+        'deaths': 'deaths',
+        'missing_persons': 'missing_persons',
+        'estimated_loss': 'estimated_loss'
+    })
+}
+
+
+def _as_day(value):
+    """Date part of a date, datetime or 'YYYY-MM-DD...' string; None if there is none."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return datetime.strptime(value[:10], '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    return None
+
+
+@lru_cache(maxsize=8192)
+def bs_date_of(day):
+    """BS date string for an AD date (cached: the same days come up over and over)."""
+    return ad_to_bs(day.year, day.month, day.day)
+
+
+def _daily_rollup_columns(model):
+    source, date_column, measures = DAILY_ROLLUP_SOURCES[model]
+    return [getattr(model, date_column), model.disaster_type, model.ward] + [getattr(model, c) for c in measures.values()]
+
+
+def _add_daily_contribution(deltas, model, row, sign):
+    """Add (sign=1) or remove (sign=-1) one record's share of its day's totals."""
+    source, _date_column, measures = DAILY_ROLLUP_SOURCES[model]
+    day = _as_day(row[0])
+    if day is None:
+        return
+    values = deltas.setdefault((day, source, row[1], row[2]), dict.fromkeys(['record_count', *measures], 0))
+    values['record_count'] += sign
+    for column, value in zip(measures, row[3:]):
+        values[column] += sign * (value or 0)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _maintain_daily_rollups(session, flush_context, instances):
+    deltas = {}
+    for model in DAILY_ROLLUP_SOURCES:
+        new = [obj for obj in session.new if isinstance(obj, model)]
+        dirty = [obj for obj in session.dirty if isinstance(obj, model)]
+        deleted = [obj for obj in session.deleted if isinstance(obj, model)]
+        if not (new or dirty or deleted):
+            continue
+
+        columns = _daily_rollup_columns(model)
+        # The rows still hold their pre-flush values, which is what the rollup counted
+        stored_ids = [obj.id for obj in dirty + deleted if obj.id is not None]
+        if stored_ids:
+            for row in session.connection().execute(db.select(*columns).where(model.id.in_(stored_ids))):
+                _add_daily_contribution(deltas, model, row, -1)
+        for obj in new + dirty:
+            row = [getattr(obj, column.key) for column in columns]
+            # distribution_date is only defaulted on insert, which happens after this
+            row[0] = row[0] or datetime.utcnow()
+            _add_daily_contribution(deltas, model, row, 1)
+
+    for (day, source, disaster_type, ward), values in deltas.items():
+        if any(abs(value) > 1e-9 for value in values.values()):
+            _apply_rollup_delta(session.connection(), DailyRollup,
+                                {'day': day, 'bs_date': bs_date_of(day), 'source': source,
+                                 'disaster_type': disaster_type, 'ward': ward},
+                                values, 'record_count')
+
+
+def rebuild_daily_rollups():
+    """Recompute the daily_rollup table from distributions and disasters.
+
+    Must run inside an app context; commits when done.
+    """
+    db.session.execute(DailyRollup.__table__.delete())
+    deltas = {}
+    for model in DAILY_ROLLUP_SOURCES:
+        for row in db.session.execute(db.select(*_daily_rollup_columns(model))).yield_per(1000):
+            _add_daily_contribution(deltas, model, row, 1)
+    if deltas:
+        # executemany needs the same columns in every row
+        measure_columns = {column: 0 for *_rest, measures in DAILY_ROLLUP_SOURCES.values() for column in measures}
+        db.session.execute(DailyRollup.__table__.insert(), [
+            dict(measure_columns, **values, day=day, bs_date=bs_date_of(day), source=source,
+                 disaster_type=disaster_type, ward=ward)
+            for (day, source, disaster_type, ward), values in deltas.items()
+        ])
+    bump_data_versions(db.session.connection(), {'ReliefDistribution', 'Disaster'})
+    db.session.commit()
+    invalidate_cache_tags({'ReliefDistribution', 'Disaster'})
+    return len(deltas)
+
 # Social Security Beneficiary Model
 class SocialSecurityBeneficiary(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -491,13 +1471,19 @@ class AppSettings(db.Model):
 
 # Event Log Model
 class EventLog(db.Model):
+    # The event log is filtered by type or status and listed newest first
+    __table_args__ = (
+        db.Index('ix_event_log_event_type_timestamp', 'event_type', 'timestamp'),
+        db.Index('ix_event_log_status_timestamp', 'status', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    event_type = db.Column(db.String(100), nullable=False, index=True)  # e.g., "Incident Report", "Assessment", "Relief Distribution"
+    event_type = db.Column(db.String(100), nullable=False)  # e.g., "Incident Report", "Assessment", "Relief Distribution"
     description = db.Column(db.Text, nullable=False)
     location = db.Column(db.String(200), index=True)
     responsible_unit = db.Column(db.String(100), index=True)
-    status = db.Column(db.String(50), default='Active', index=True)  # Active, Completed, etc.
+    status = db.Column(db.String(50), default='Active')  # Active, Completed, etc.
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
@@ -634,7 +1620,7 @@ class FundTransaction(db.Model):
     transaction_type = db.Column(db.String(50), nullable=False, index=True) # Income, Expenditure
     amount = db.Column(db.Float, nullable=False, default=0.0)
     description = db.Column(db.String(500), nullable=False)
-    transaction_date = db.Column(db.Date, nullable=False, default=date.today)
+    transaction_date = db.Column(db.Date, nullable=False, default=date.today, index=True)
     is_locked = db.Column(db.Boolean, default=False, index=True)
     is_system = db.Column(db.Boolean, default=False) # True for system generated (from distributions)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -651,6 +1637,237 @@ class FundTransaction(db.Model):
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M')
         }
 
+# Data Version Model
+class DataVersion(db.Model):
+    """Per-model change counter, bumped inside every transaction that writes the model.
+
+    Polled GET endpoints derive their ETag/Last-Modified from these rows, so a
+    client that already has the current data gets a 304 without any query
+    against the model's own table.
+    """
+    model_name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'model_name': self.model_name,
+            'version': self.version,
+            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+def bump_data_versions(connection, model_names):
+    """Increment the DataVersion rows for model_names in the current transaction."""
+    table = DataVersion.__table__
+    now = datetime.utcnow()
+    for name in sorted(model_names):
+        result = connection.execute(
+            table.update()
+            .where(table.c.model_name == name)
+            .values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(model_name=name, version=1, updated_at=now))
+
+
+def get_data_versions(model_names):
+    """Return {model_name: (version, updated_at)} for the given models."""
+    rows = db.session.query(DataVersion).filter(DataVersion.model_name.in_(model_names)).all()
+    versions = {row.model_name: (row.version, row.updated_at) for row in rows}
+    return {name: versions.get(name, (0, None)) for name in model_names}
+
+
+def conditional(*model_names):
+    """Answer GETs with 304 when the client's ETag matches the current data versions.
+
+    The ETag combines the endpoint, the normalized query string and the
+    DataVersion counters of model_names, so it changes exactly when a commit
+    touches one of those models. Matching requests skip the view (and its
+    cache lookup) entirely. A body that carries the versions it was built
+    from (response.data_versions, set by cached()) is tagged with those
+    instead, so a stale cached body never goes out under a newer ETag.
+    """
+    def decorator(func):
+        def validators(versions, kwargs):
+            fingerprint = '|'.join(
+                [make_cache_key(request.endpoint, request.args), json.dumps(kwargs, sort_keys=True)] +
+                [f"{name}={versions[name][0]}" for name in model_names]
+            )
+            timestamps = [ts for _, ts in versions.values() if ts is not None]
+            last_modified = max(timestamps).replace(microsecond=0) if timestamps else None
+            return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest(), last_modified
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # Read before the view runs, so an uncached body is never older than its ETag
+            versions = get_data_versions(model_names)
+            etag, last_modified = validators(versions, kwargs)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (last_modified is not None and request.if_modified_since is not None
+                                and last_modified <= request.if_modified_since.replace(tzinfo=None))
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                built_from = getattr(response, 'data_versions', None)
+                if built_from:
+                    versions = dict(versions, **{name: v for name, v in built_from.items() if name in versions})
+                    etag, last_modified = validators(versions, kwargs)
+
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let browsers keep the body but always revalidate it
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+# Layouts list endpoints can answer in, chosen with ?format=
+RESPONSE_FORMATS = ('rows', 'columnar')
+# Low-cardinality fields sent once per distinct value in the columnar format
+COLUMNAR_DICTIONARY_FIELDS = ('disaster_type', 'ward')
+
+
+def parse_response_format(args, errors):
+    """The requested ?format=, appending to errors if it is not one we offer."""
+    response_format = args.get('format') or 'rows'
+    if response_format not in RESPONSE_FORMATS:
+        errors.append(f"format {' वा '.join(RESPONSE_FORMATS)} मध्ये एक हुनुपर्छ")
+    return response_format
+
+
+def to_columnar(records, dictionary_fields=COLUMNAR_DICTIONARY_FIELDS):
+    """Turn a list of same-shaped dicts into one list per field.
+
+    Each of dictionary_fields is sent as indexes into dictionaries[field],
+    which holds its distinct values in order of first appearance, so a page
+    of flood records names "Flood" once.
+    """
+    columns = {field: [record[field] for record in records] for field in (records[0] if records else ())}
+    dictionaries = {}
+    for field in dictionary_fields:
+        if field in columns:
+            positions = {}
+            columns[field] = [positions.setdefault(value, len(positions)) for value in columns[field]]
+            dictionaries[field] = list(positions)
+    return {'row_count': len(records), 'columns': columns, 'dictionaries': dictionaries}
+
+
+# Query parameters that choose a page rather than filter the list
+PAGE_PARAMS = ('page', 'per_page', 'cursor', 'with_total', 'format', 'fields', 'view')
+# How long a list's COUNT(*) is reused across its pages (commits drop it sooner)
+PAGE_COUNT_TIMEOUT = 60
+
+
+def encode_cursor(direction, sort_value, row_id):
+    """Opaque ?cursor= token for the rows after ('next') or before ('prev') a row."""
+    if isinstance(sort_value, date):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([direction, sort_value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def parse_cursor(args, sort_column, errors):
+    """(direction, sort value, id) from ?cursor=, or None for offset paging."""
+    cursor = args.get('cursor')
+    if not cursor:
+        return None
+    try:
+        direction, sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if direction not in ('next', 'prev') or not isinstance(row_id, int):
+            raise ValueError(cursor)
+        if sort_value is not None:
+            python_type = sort_column.type.python_type
+            if python_type is datetime:
+                sort_value = datetime.fromisoformat(sort_value)
+            elif python_type is date:
+                sort_value = date.fromisoformat(sort_value)
+        return direction, sort_value, row_id
+    except (ValueError, TypeError):
+        errors.append('cursor अमान्य छ')
+        return None
+
+
+def cached_count(query, tag):
+    """COUNT(*) of a filtered list, shared by all its pages until a commit touches tag."""
+    filters = MultiDict([(k, v) for k, v in request.args.items(multi=True) if k not in PAGE_PARAMS])
+    key = make_cache_key(f'{request.endpoint}:count', filters)
+    total = cache.get(key)
+    if total is None:
+        total = query.order_by(None).count()
+        cache.set(key, total, PAGE_COUNT_TIMEOUT, tags=(tag,))
+    return total
+
+
+def paginate_keyset(query, sort_column, id_column, tag, page, per_page, cursor=None):
+    """One page of query, newest first by (sort_column, id_column).
+
+    Without a cursor this is ?page=N by OFFSET, with the total the page
+    numbers need. With one it seeks past the (sort value, id) the cursor
+    carries, so a deep page or a poll costs the same as the first, and the
+    total is only counted for ?with_total=true. Both counts come from
+    cached_count(). Rows with a NULL sort value come last, as SQLite orders
+    them. Returns (items, pagination dict).
+    """
+    page, per_page = max(page, 1), max(per_page, 1)
+    newest_first = (sort_column.desc(), id_column.desc())
+    if cursor is None:
+        rows = query.order_by(*newest_first).offset((page - 1) * per_page).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_prev, has_next = page > 1, len(rows) > per_page
+    else:
+        direction, sort_value, row_id = cursor
+        # Each condition is its own index range; the dated rows and the
+        # undated ones after them are read separately rather than ORed
+        # together, which would make SQLite scan the index from the top
+        if direction == 'next':
+            if sort_value is None:
+                ranges = [(db.and_(sort_column.is_(None), id_column < row_id), (id_column.desc(),))]
+            else:
+                ranges = [(db.or_(sort_column < sort_value, db.and_(sort_column == sort_value, id_column < row_id)),
+                           newest_first),
+                          (sort_column.is_(None), (id_column.desc(),))]
+        else:
+            if sort_value is None:
+                ranges = [(db.and_(sort_column.is_(None), id_column > row_id), (id_column.asc(),)),
+                          (sort_column.is_not(None), (sort_column.asc(), id_column.asc()))]
+            else:
+                ranges = [(db.or_(sort_column > sort_value, db.and_(sort_column == sort_value, id_column > row_id)),
+                           (sort_column.asc(), id_column.asc()))]
+        rows = []
+        for condition, order in ranges:
+            if len(rows) <= per_page:
+                rows += query.filter(condition).order_by(*order).limit(per_page + 1 - len(rows)).all()
+        more = len(rows) > per_page
+        if direction == 'next':
+            items, has_prev, has_next = rows[:per_page], True, more
+        else:
+            items, has_prev, has_next = rows[:per_page][::-1], more, True
+
+    def cursor_at(direction, item):
+        return encode_cursor(direction, getattr(item, sort_column.key), getattr(item, id_column.key))
+
+    pagination = {
+        'per_page': per_page,
+        'has_next': has_next,
+        'has_prev': has_prev,
+        'next_cursor': cursor_at('next', items[-1]) if has_next and items else None,
+        'prev_cursor': cursor_at('prev', items[0]) if has_prev and items else None
+    }
+    if cursor is None:
+        total = cached_count(query, tag)
+        pagination.update(page=page, pages=math.ceil(total / per_page), total=total)
+    elif request.args.get('with_total', '').lower() in ('true', '1', 'yes'):
+        pagination['total'] = cached_count(query, tag)
+    return items, pagination
+
 # Routes
 @app.template_filter('to_nepali_num')
 def to_nepali_num(value):
@@ -683,7 +1900,7 @@ def index():
 
 @app.route('/map')
 def map_view():
-    return render_template('map.html')
+    return render_template('map.html', vector_tiles=MAP_VECTOR_TILES)
 
 @app.route('/thalara_wards.json')
 def get_wards_json():
@@ -693,6 +1910,281 @@ def get_wards_json():
 def get_boundary_json():
     return send_from_directory('.', 'thalara_boundary.json')
 
+# Simplified map layers written by build_geo_assets.py; the manifest maps
+# layer name and detail level to a content-hashed filename
+GEO_ASSET_DIR = os.path.join(app.root_path, 'static', 'geo')
+
+
+def load_geo_manifest():
+    try:
+        with open(os.path.join(GEO_ASSET_DIR, 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print("No static/geo/manifest.json; map layers fall back to the raw GeoJSON (run build_geo_assets.py)")
+        return {}
+
+
+geo_manifest = load_geo_manifest()
+
+
+@app.template_global()
+def geo_asset_url(name, level='medium'):
+    """URL of a built map layer, or of the raw GeoJSON when it has not been built."""
+    filename = geo_manifest.get(name, {}).get(level)
+    if filename:
+        return url_for('get_geo_asset', filename=filename)
+    return f'/{name}.json'
+
+
+@app.route('/geo/<path:filename>')
+def get_geo_asset(filename):
+    """Serve a built map layer, pre-compressed when the client accepts it.
+
+    Filenames carry a hash of their content, so they never change and the
+    browser may keep them for a year without revalidating.
+    """
+    response = None
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        path = safe_join(GEO_ASSET_DIR, filename + suffix)
+        if request.accept_encodings[encoding] and path and os.path.isfile(path):
+            response = send_from_directory(GEO_ASSET_DIR, filename + suffix, mimetype='application/json')
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(GEO_ASSET_DIR, filename, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# ============ VECTOR TILES ============
+# Mapbox Vector Tiles (spec 2.1) for map.html. Ward and boundary polygons are
+# cut once by build_vector_tiles.py into an MBTiles file; distribution and
+# disaster points change all the time, so they are encoded per request.
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_MIN_ZOOM = 10
+TILE_MAX_ZOOM = 16
+MAP_TILES_PATH = os.getenv('MAP_TILES_PATH', os.path.abspath('./instance/map_tiles.mbtiles'))
+MAP_VECTOR_TILES = os.getenv('MAP_VECTOR_TILES', 'false').lower() in ('1', 'true', 'yes')
+
+MVT_POINT, MVT_LINESTRING, MVT_POLYGON = 1, 2, 3
+
+
+def _pb_varint(value):
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _pb_uint(field, value):
+    return _pb_varint(field << 3) + _pb_varint(value)
+
+
+def _pb_bytes(field, data):
+    return _pb_varint((field << 3) | 2) + _pb_varint(len(data)) + data
+
+
+def _pb_packed(field, values):
+    return _pb_bytes(field, b''.join(_pb_varint(v) for v in values))
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _mvt_value(value):
+    """Encode a property as a tile Value message."""
+    if isinstance(value, bool):
+        return _pb_uint(7, int(value))
+    if isinstance(value, int):
+        return _pb_uint(5, value) if value >= 0 else _pb_uint(6, _zigzag(value))
+    if isinstance(value, float):
+        return _pb_varint((3 << 3) | 1) + struct.pack('<d', value)
+    return _pb_bytes(1, str(value).encode('utf-8'))
+
+
+def _mvt_geometry(geom_type, parts):
+    """Command-encode parts: point lists for points, otherwise one list per line or ring."""
+    commands = []
+    cursor = (0, 0)
+
+    def move(point):
+        nonlocal cursor
+        commands.append(_zigzag(point[0] - cursor[0]))
+        commands.append(_zigzag(point[1] - cursor[1]))
+        cursor = point
+
+    if geom_type == MVT_POINT:
+        points = [point for part in parts for point in part]
+        commands.append((len(points) << 3) | 1)  # MoveTo, repeated
+        for point in points:
+            move(point)
+        return commands
+
+    for part in parts:
+        commands.append((1 << 3) | 1)  # MoveTo
+        move(part[0])
+        commands.append(((len(part) - 1) << 3) | 2)  # LineTo
+        for point in part[1:]:
+            move(point)
+        if geom_type == MVT_POLYGON:
+            commands.append((1 << 3) | 7)  # ClosePath
+    return commands
+
+
+def encode_vector_tile(layers):
+    """Encode [(layer_name, features)] as a vector tile.
+
+    Each feature is a dict with 'type' (1 point, 2 line, 3 polygon), 'parts'
+    in tile coordinates, 'properties' and an optional integer 'id'. Polygon
+    rings must already be wound per the spec (exterior rings positive area).
+    """
+    tile = bytearray()
+    for name, features in layers:
+        keys, values, encoded = {}, {}, bytearray()
+        for feature in features:
+            tags = []
+            for key, value in feature.get('properties', {}).items():
+                if value is None:
+                    continue
+                tags.append(keys.setdefault(key, len(keys)))
+                tags.append(values.setdefault((type(value).__name__, value), len(values)))
+            body = b''
+            if feature.get('id') is not None:
+                body += _pb_uint(1, feature['id'])
+            if tags:
+                body += _pb_packed(2, tags)
+            body += _pb_uint(3, feature['type'])
+            body += _pb_packed(4, _mvt_geometry(feature['type'], feature['parts']))
+            encoded += _pb_bytes(2, body)
+        if not encoded:
+            continue
+        layer = _pb_uint(15, 2) + _pb_bytes(1, name.encode('utf-8')) + bytes(encoded)
+        layer += b''.join(_pb_bytes(3, key.encode('utf-8')) for key in keys)
+        layer += b''.join(_pb_bytes(4, _mvt_value(value)) for _, value in values)
+        layer += _pb_uint(5, TILE_EXTENT)
+        tile += _pb_bytes(3, layer)
+    return bytes(tile)
+
+
+def lonlat_to_world(lon, lat):
+    """Web Mercator position as fractions of the world, y growing southwards."""
+    lat = max(min(lat, 85.0511), -85.0511)
+    sin_lat = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def world_to_lonlat(x, y):
+    lon = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lon, lat
+
+
+def tile_lonlat_bounds(z, x, y, buffer=0):
+    """(west, south, east, north) of a tile, widened by buffer tile units."""
+    n = 2 ** z
+    pad = buffer / TILE_EXTENT
+    west, north = world_to_lonlat((x - pad) / n, (y - pad) / n)
+    east, south = world_to_lonlat((x + 1 + pad) / n, (y + 1 + pad) / n)
+    return west, south, east, north
+
+
+def read_static_tile(z, x, y):
+    """Uncompressed ward/boundary layers for a tile, b'' if none were built."""
+    if not os.path.exists(MAP_TILES_PATH):
+        return b''
+    conn = sqlite3.connect(f'file:{MAP_TILES_PATH}?mode=ro', uri=True)
+    try:
+        # MBTiles rows are numbered from the south (TMS)
+        row = conn.execute(
+            'SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+            (z, x, 2 ** z - 1 - y)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return b''
+    data = bytes(row[0])
+    return gzip.decompress(data) if data[:2] == b'\x1f\x8b' else data
+
+
+def _point_features(rows, z, x, y, properties):
+    n = 2 ** z
+    features = []
+    for row in rows:
+        wx, wy = lonlat_to_world(row.longitude, row.latitude)
+        point = (round((wx * n - x) * TILE_EXTENT), round((wy * n - y) * TILE_EXTENT))
+        features.append({
+            'id': row.id,
+            'type': MVT_POINT,
+            'parts': [[point]],
+            'properties': {name: getter(row) for name, getter in properties.items()}
+        })
+    return features
+
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.pbf')
+@conditional('ReliefDistribution', 'Disaster')
+@cached(timeout=60, stale_timeout=600, tags=('ReliefDistribution', 'Disaster'))
+def get_vector_tile(z, x, y):
+    """Vector tile with the prebuilt ward/boundary layers plus live point layers.
+
+    Layers: wards, boundary (from MAP_TILES_PATH), distributions, disasters.
+    """
+    if not TILE_MIN_ZOOM <= z <= TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({'success': False, 'message': 'टाइल भेटिएन'}), 404
+
+    spatial = {'bbox': tile_lonlat_bounds(z, x, y, TILE_BUFFER), 'near': None, 'radius': None}
+    distributions = apply_spatial_filter(ReliefDistribution.query, ReliefDistribution, spatial).with_entities(
+        ReliefDistribution.id,
+        ReliefDistribution.beneficiary_name,
+        ReliefDistribution.disaster_type,
+        ReliefDistribution.disaster_date,
+        ReliefDistribution.location,
+        ReliefDistribution.ward,
+        ReliefDistribution.cash_received,
+        ReliefDistribution.latitude,
+        ReliefDistribution.longitude
+    ).all()
+    disasters = apply_spatial_filter(Disaster.query, Disaster, spatial).with_entities(
+        Disaster.id,
+        Disaster.disaster_type,
+        Disaster.disaster_date,
+        Disaster.ward,
+        Disaster.affected_households,
+        Disaster.affected_people,
+        Disaster.latitude,
+        Disaster.longitude
+    ).all()
+
+    # Tiles are concatenations of layer messages, so the prebuilt bytes can be
+    # extended with the point layers without decoding them
+    body = read_static_tile(z, x, y) + encode_vector_tile([
+        ('distributions', _point_features(distributions, z, x, y, {
+            'id': lambda r: r.id,
+            'beneficiary_name': lambda r: r.beneficiary_name,
+            'disaster_type': lambda r: r.disaster_type,
+            'disaster_date': lambda r: r.disaster_date,
+            'location': lambda r: r.location,
+            'ward': lambda r: r.ward,
+            'cash_received': lambda r: r.cash_received
+        })),
+        ('disasters', _point_features(disasters, z, x, y, {
+            'id': lambda r: r.id,
+            'disaster_type': lambda r: r.disaster_type,
+            'disaster_date': lambda r: r.disaster_date.strftime('%Y-%m-%d') if r.disaster_date else None,
+            'ward': lambda r: r.ward,
+            'affected_households': lambda r: r.affected_households,
+            'affected_people': lambda r: r.affected_people
+        }))
+    ])
+    return app.response_class(body, mimetype='application/vnd.mapbox-vector-tile')
+
 @app.route('/form')
 def form():
     return render_template('form.html')
@@ -732,9 +2224,34 @@ def view_distribution(id):
 def settings():
     return render_template('settings.html')
 
+def filter_distributions(query, args, errors):
+    """Apply the fiscal_year, disaster_type, ward and bbox/near filters of /api/distributions.
+
+    Shared with the distributions export so both select the same records.
+    """
+    fiscal_year = args.get('fiscal_year')
+    disaster_type = args.get('disaster_type')
+    ward = args.get('ward')
+
+    if fiscal_year:
+        query = query.filter(ReliefDistribution.fiscal_year == fiscal_year)
+    if disaster_type:
+        query = query.filter(ReliefDistribution.disaster_type == disaster_type)
+    if ward:
+        try:
+            query = query.filter(ReliefDistribution.ward == int(ward))
+        except ValueError:
+            errors.append('ward अंकमा हुनुपर्छ')
+
+    spatial, spatial_errors = parse_spatial_filter(args)
+    errors.extend(spatial_errors)
+    return apply_spatial_filter(query, ReliefDistribution, spatial)
+
 # Exempt API endpoints from CSRF protection (they should use API tokens)
 @csrf.exempt
 @app.route('/api/distributions', methods=['GET'])
+@conditional('ReliefDistribution')
+@cached(timeout=15, stale_timeout=60, tags=('ReliefDistribution',))
 def get_distributions():
     # Get pagination parameters
     page = request.args.get('page', 1, type=int)
@@ -743,43 +2260,91 @@ def get_distributions():
     # Limit per_page to prevent abuse
     per_page = min(per_page, 100)
 
-    # Get filter parameters
-    fiscal_year = request.args.get('fiscal_year')
-    disaster_type = request.args.get('disaster_type')
-    ward = request.args.get('ward')
-
     # Build query with filters
-    query = ReliefDistribution.query
-
-    if fiscal_year:
-        query = query.filter(ReliefDistribution.fiscal_year == fiscal_year)
-    if disaster_type:
-        query = query.filter(ReliefDistribution.disaster_type == disaster_type)
-    if ward:
-        query = query.filter(ReliefDistribution.ward == int(ward))
-
-    # Order by distribution date descending
-    query = query.order_by(ReliefDistribution.distribution_date.desc())
-
-    # Paginate results
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    distributions = pagination.items
+    errors = []
+    query = filter_distributions(ReliefDistribution.query, request.args, errors)
+    response_format = parse_response_format(request.args, errors)
+    cursor = parse_cursor(request.args, ReliefDistribution.distribution_date, errors)
+    fields = parse_distribution_fields(request.args, errors)
+    words = parse_search(request.args, errors)
+    if errors:
+        return jsonify({'success': False, 'message': 'अमान्य अनुरोध', 'errors': errors}), 400
+    # The cursors are read from each page's first and last rows
+    projection = load_distribution_fields(fields, ReliefDistribution.distribution_date)
+    if projection is not None:
+        query = query.options(projection)
+
+    if words:
+        # Best matches first
+        items, pagination = paginate_search(apply_search(query, ReliefDistribution, words), 'ReliefDistribution',
+                                            page, per_page)
+    else:
+        # Newest distributions first, by page number or cursor
+        items, pagination = paginate_keyset(query, ReliefDistribution.distribution_date, ReliefDistribution.id,
+                                            'ReliefDistribution', page, per_page, cursor)
+    distributions = [d.to_dict(fields) for d in items]
 
     return jsonify({
-        'distributions': [d.to_dict() for d in distributions],
-        'pagination': {
-            'page': page,
-            'pages': pagination.pages,
-            'per_page': per_page,
-            'total': pagination.total,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev
-        }
+        'distributions': to_columnar(distributions) if response_format == 'columnar' else distributions,
+        'pagination': pagination
     })
 
+# Parts /api/dashboard-bundle can include: name -> (endpoint, query parameters it reads)
+DASHBOARD_BUNDLE_PARTS = {
+    'distributions': ('get_distributions',
+                      ('fiscal_year', 'disaster_type', 'ward', 'q', 'page', 'per_page', 'fields', 'view')),
+    'statistics': ('get_statistics', ('fiscal_year', 'disaster_type', 'ward')),
+    'settings': ('get_settings', ()),
+    'funds_summary': ('get_funds_summary', ()),
+    'fund_transactions': ('get_fund_transactions', ())
+}
+DASHBOARD_BUNDLE_DEFAULT = ('distributions', 'statistics', 'settings')
+
+
+@app.route('/api/dashboard-bundle', methods=['GET'])
+@conditional('ReliefDistribution', 'AppSettings', 'FundTransaction')
+def get_dashboard_bundle():
+    """Everything a dashboard polls for, in one response.
+
+    ?include=distributions,statistics,settings,funds_summary,fund_transactions
+    (default: the first three) plus the dashboard's filter and page parameters.
+    Each part comes from its own endpoint's cached view, called with only the
+    parameters that endpoint reads, so it shares cache entries with direct
+    requests to that endpoint. The ETag covers every model the parts use.
+    """
+    include = [part for part in request.args.get('include', '').split(',') if part] or list(DASHBOARD_BUNDLE_DEFAULT)
+    unknown = [part for part in include if part not in DASHBOARD_BUNDLE_PARTS]
+    if unknown:
+        return jsonify({
+            'success': False,
+            'message': 'अमान्य अनुरोध',
+            'errors': [f"Unknown part '{part}'" for part in unknown]
+        }), 400
+
+    bundle, built_from = {}, {}
+    for part in include:
+        endpoint, params = DASHBOARD_BUNDLE_PARTS[part]
+        # Skip the part's own ETag handling; the bundle has its own
+        view = app.view_functions[endpoint].__wrapped__
+        query_string = urlencode([(key, value) for key in params for value in request.args.getlist(key)])
+        with app.test_request_context(url_for(endpoint), query_string=query_string):
+            response = make_response(view())
+        if response.status_code == 200:
+            bundle[part] = response.get_json()
+        else:
+            bundle[part] = {'success': False, 'status': response.status_code}
+        # The bundle is only as new as its oldest part
+        for name, version in (getattr(response, 'data_versions', None) or {}).items():
+            built_from[name] = min(built_from.get(name, version), version, key=lambda v: v[0])
+    response = jsonify(bundle)
+    response.data_versions = built_from
+    return response
+
 # Fund Management API
 @csrf.exempt
 @app.route('/api/funds/summary', methods=['GET'])
+@conditional('FundTransaction')
+@cached(timeout=30, tags=('FundTransaction',))
 def get_funds_summary():
     try:
         # Get total income
@@ -803,16 +2368,19 @@ def get_funds_summary():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/funds/transactions', methods=['GET'])
+@conditional('FundTransaction')
+@cached(timeout=30, tags=('FundTransaction',))
+def get_fund_transactions():
+    transactions = FundTransaction.query.order_by(FundTransaction.transaction_date.desc()).all()
+    return jsonify({
+        'success': True,
+        'transactions': [t.to_dict() for t in transactions]
+    })
+
 @csrf.exempt
-@app.route('/api/funds/transactions', methods=['GET', 'POST'])
+@app.route('/api/funds/transactions', methods=['POST'])
 def handle_fund_transactions():
-    if request.method == 'GET':
-        transactions = FundTransaction.query.order_by(FundTransaction.transaction_date.desc()).all()
-        return jsonify({
-            'success': True,
-            'transactions': [t.to_dict() for t in transactions]
-        })
-    
     if request.method == 'POST':
         try:
             data = request.json
@@ -829,9 +2397,6 @@ def handle_fund_transactions():
             db.session.add(transaction)
             db.session.commit()
             
-            # Clear cache
-            clear_cache()
-            
             return jsonify({
                 'success': True,
                 'message': 'Transaction recorded successfully',
@@ -1107,6 +2672,8 @@ def add_distribution():
         distribution.set_harms(harms)
         distribution.set_documents(documents)
         
+        distribution.ward, ward_warning = check_ward(distribution.ward, distribution.latitude, distribution.longitude)
+
         db.session.add(distribution)
         
         # If cash is distributed, record a fund transaction and link it
@@ -1125,11 +2692,9 @@ def add_distribution():
             
         db.session.commit()
 
-        # Clear cache after modification
-        clear_cache()
-
         return jsonify({
             'success': True,
+            'ward_warning': ward_warning,
             'message': 'Relief distribution recorded successfully',
             'data': distribution.to_dict()
         }), 201
@@ -1143,12 +2708,21 @@ def add_distribution():
 @app.route('/api/distributions/<int:id>', methods=['GET'])
 def get_distribution(id):
     try:
-        distribution = ReliefDistribution.query.get(id)
+        errors = []
+        fields = parse_distribution_fields(request.args, errors)
+        if errors:
+            return jsonify({'success': False, 'message': 'अमान्य अनुरोध', 'errors': errors}), 400
+
+        query = ReliefDistribution.query
+        projection = load_distribution_fields(fields)
+        if projection is not None:
+            query = query.options(projection)
+        distribution = query.filter_by(id=id).first()
         if not distribution:
             return jsonify({'success': False, 'message': 'वितरण रेकर्ड फेला परेन'}), 404
         return jsonify({
             'success': True,
-            'data': distribution.to_dict()
+            'data': distribution.to_dict(fields)
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -1289,237 +2863,1086 @@ def edit_distribution(id):
         distribution.set_documents(documents)
         distribution.updated_at = datetime.utcnow()
 
+        distribution.ward, ward_warning = check_ward(distribution.ward, distribution.latitude, distribution.longitude)
+
         db.session.commit()
 
-        # Clear cache after modification
-        clear_cache()
+        return jsonify({
+            'success': True,
+            'ward_warning': ward_warning,
+            'message': 'वितरण रेकर्ड सफलतापूर्वक सुरक्षित गरियो',
+            'data': distribution.to_dict()
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+
+@app.route('/api/statistics', methods=['GET'])
+@conditional('ReliefDistribution')
+@cached(timeout=15, stale_timeout=120, tags=('ReliefDistribution',))  # Fresh 15s, served stale up to 2 min
+def get_statistics():
+    try:
+        # Get filter parameters
+        fiscal_year = request.args.get('fiscal_year')
+        disaster_type = request.args.get('disaster_type')
+        ward = request.args.get('ward')
+
+        # Everything is read from the rollup tables, so the cost grows with the
+        # number of (fiscal year, disaster type, ward) groups, not distributions
+        def rollup_filters(model):
+            filters = []
+            if fiscal_year:
+                filters.append(model.fiscal_year == fiscal_year)
+            if disaster_type:
+                filters.append(model.disaster_type == disaster_type)
+            if ward:
+                try:
+                    filters.append(model.ward == int(ward))
+                except (ValueError, TypeError):
+                    pass  # Invalid ward value, don't filter
+            return filters
+
+        stat_filters = rollup_filters(ReliefStatRollup)
+        distribution_count = db.func.sum(ReliefStatRollup.distribution_count)
+
+        # Get basic statistics
+        total_distributions, total_cash = db.session.query(
+            db.func.coalesce(distribution_count, 0),
+            db.func.coalesce(db.func.sum(ReliefStatRollup.cash_total), 0.0)
+        ).filter(*stat_filters).one()
+
+        # Item totals, largest first
+        item_quantity = db.func.sum(ReliefItemRollup.quantity)
+        items_data = db.session.query(ReliefItemRollup.item, item_quantity).filter(
+            *rollup_filters(ReliefItemRollup)
+        ).group_by(ReliefItemRollup.item).having(
+            db.func.sum(ReliefItemRollup.line_count) > 0
+        ).order_by(item_quantity.desc(), ReliefItemRollup.item).all()
+        items_count = {item: int(quantity) for item, quantity in items_data}
+        total_items = sum(items_count.values())
+
+        # Ward distribution
+        ward_data = db.session.query(ReliefStatRollup.ward, distribution_count).filter(
+            ReliefStatRollup.ward.isnot(None), *stat_filters
+        ).group_by(ReliefStatRollup.ward).having(distribution_count > 0).all()
+
+        # Fiscal year distribution
+        fiscal_year_data = db.session.query(ReliefStatRollup.fiscal_year, distribution_count).filter(
+            ReliefStatRollup.fiscal_year.isnot(None), *stat_filters
+        ).group_by(ReliefStatRollup.fiscal_year).having(distribution_count > 0).all()
+
+        return jsonify({
+            'total_distributions': total_distributions,
+            'total_items': total_items,
+            'total_cash': float(total_cash),
+            'items_distribution': [
+                {'item': item, 'quantity': count}
+                for item, count in items_count.items()
+            ],
+            'ward_distribution': [
+                {'ward': ward, 'count': count}
+                for ward, count in ward_data if ward is not None  # Only include non-null wards
+            ],
+            'fiscal_year_distribution': [
+                {'fiscal_year': fiscal_year, 'count': count}
+                for fiscal_year, count in fiscal_year_data if fiscal_year is not None  # Only include non-null fiscal years
+            ]
+        })
+    except Exception as e:
+        print(f"Error in get_statistics: {str(e)}")  # Log the error
+        return jsonify({
+            'total_distributions': 0,
+            'total_items': 0,
+            'total_cash': 0.0,
+            'items_distribution': [],
+            'ward_distribution': [],
+            'fiscal_year_distribution': []
+        })
+
+# ============ SPATIAL FILTERS ============
+# bbox= and near=/radius= on the map and list endpoints. In SQLite each mapped
+# table has an R-tree twin kept in step by triggers, so a bbox only visits the
+# rows inside it; radius filters use the R-tree for the enclosing box first.
+SPATIAL_INDEXES = {'relief_distribution': 'relief_distribution_rtree', 'disaster': 'disaster_rtree'}
+SPATIAL_DEFAULT_RADIUS_M = 1000
+SPATIAL_MAX_RADIUS_M = 50000
+METERS_PER_DEGREE = 111320
+
+# Tables whose R-tree exists; filled by ensure_spatial_indexes()
+spatial_index_tables = set()
+
+
+def ensure_spatial_indexes():
+    """Create the R-tree tables and their triggers, backfilling new ones.
+
+    Does nothing on databases other than SQLite or builds without the rtree
+    module; the filters then fall back to plain latitude/longitude ranges.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    conn = db.session.connection()
+    for table, rtree in SPATIAL_INDEXES.items():
+        exists = conn.execute(db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                              {'name': rtree}).first() is not None
+        try:
+            conn.execute(db.text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {rtree} USING rtree(id, min_lat, max_lat, min_lon, max_lon)"))
+        except Exception as e:
+            print(f"SQLite rtree module unavailable, spatial filters will scan {table}: {e}")
+            return
+        conn.execute(db.text(f"""
+            CREATE TRIGGER IF NOT EXISTS {rtree}_insert AFTER INSERT ON {table}
+            WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL BEGIN
+                INSERT OR REPLACE INTO {rtree} VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+            END"""))
+        conn.execute(db.text(f"""
+            CREATE TRIGGER IF NOT EXISTS {rtree}_update AFTER UPDATE OF id, latitude, longitude ON {table} BEGIN
+                DELETE FROM {rtree} WHERE id = OLD.id;
+                INSERT INTO {rtree} SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+                WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+            END"""))
+        conn.execute(db.text(f"""
+            CREATE TRIGGER IF NOT EXISTS {rtree}_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM {rtree} WHERE id = OLD.id;
+            END"""))
+        if not exists:
+            rebuild_spatial_index(table)
+            print(f"Created spatial index {rtree}")
+        spatial_index_tables.add(table)
+    db.session.commit()
+
+
+def rebuild_spatial_index(table):
+    """Refill a table's R-tree from its coordinates; returns the number of rows indexed."""
+    rtree = SPATIAL_INDEXES[table]
+    conn = db.session.connection()
+    conn.execute(db.text(f"DELETE FROM {rtree}"))
+    return conn.execute(db.text(
+        f"INSERT INTO {rtree} SELECT id, latitude, latitude, longitude, longitude FROM {table} "
+        f"WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    )).rowcount
+
+
+def parse_bbox(value):
+    """'west,south,east,north' in degrees -> tuple of floats, or None if malformed."""
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+        return None
+    return west, south, east, north
+
+
+def radius_bbox(lat, lon, radius):
+    """Smallest (west, south, east, north) holding the circle of radius metres."""
+    dlat = radius / METERS_PER_DEGREE
+    dlon = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lon - dlon, lat - dlat, lon + dlon, lat + dlat
+
+
+def parse_spatial_filter(args):
+    """Read bbox=west,south,east,north and near=lat,lon with radius= in metres.
+
+    Returns (spatial, errors); spatial is None when neither bbox nor near is
+    given, otherwise {'bbox', 'near', 'radius'} with unused parts None. The
+    filter helpers below use it the same way for SQL queries and map points.
+    """
+    errors = []
+    bbox = near = radius = None
+    if args.get('bbox') is not None:
+        bbox = parse_bbox(args.get('bbox'))
+        if bbox is None:
+            errors.append('bbox पश्चिम,दक्षिण,पूर्व,उत्तर ढाँचामा हुनुपर्छ')
+    if args.get('near') is not None:
+        try:
+            lat, lon = (float(part) for part in args['near'].split(','))
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ValueError
+            near = (lat, lon)
+        except ValueError:
+            errors.append('near अक्षांश,देशान्तर ढाँचामा हुनुपर्छ')
+        radius = args.get('radius', SPATIAL_DEFAULT_RADIUS_M, type=float)
+        if radius is None or not 0 < radius <= SPATIAL_MAX_RADIUS_M:
+            errors.append(f'radius 0 देखि {SPATIAL_MAX_RADIUS_M} मिटरसम्म हुनुपर्छ')
+    elif args.get('radius') is not None:
+        errors.append('radius सँग near पनि चाहिन्छ')
+    if errors or (bbox is None and near is None):
+        return None, errors
+    return {'bbox': bbox, 'near': near, 'radius': radius}, []
+
+
+def spatial_boxes(spatial):
+    boxes = [spatial['bbox']] if spatial['bbox'] else []
+    if spatial['near']:
+        boxes.append(radius_bbox(*spatial['near'], spatial['radius']))
+    return boxes
+
+
+def apply_spatial_filter(query, model, spatial):
+    """Restrict a query on ReliefDistribution or Disaster to the spatial filter."""
+    if spatial is None:
+        return query
+    table = model.__tablename__
+    for west, south, east, north in spatial_boxes(spatial):
+        query = query.filter(model.latitude.between(south, north), model.longitude.between(west, east))
+        if table in spatial_index_tables:
+            # R-tree boxes are stored as 32-bit floats rounded outwards, so this
+            # selects a superset that the exact ranges above then trim
+            rtree = sa_table(SPATIAL_INDEXES[table], sa_column('id'), sa_column('min_lat'), sa_column('max_lat'),
+                             sa_column('min_lon'), sa_column('max_lon'))
+            query = query.filter(model.id.in_(
+                select(rtree.c.id).where(rtree.c.max_lat >= south, rtree.c.min_lat <= north,
+                                         rtree.c.max_lon >= west, rtree.c.min_lon <= east)
+            ))
+    if spatial['near']:
+        lat, lon = spatial['near']
+        # Equirectangular distance; exact enough within SPATIAL_MAX_RADIUS_M
+        scale = math.cos(math.radians(lat)) ** 2
+        query = query.filter(
+            (model.latitude - lat) * (model.latitude - lat) +
+            (model.longitude - lon) * (model.longitude - lon) * scale
+            <= (spatial['radius'] / METERS_PER_DEGREE) ** 2
+        )
+    return query
+
+
+def spatial_filter_matches(spatial, lat, lon):
+    """The same test as apply_spatial_filter for one point."""
+    for west, south, east, north in spatial_boxes(spatial):
+        if not (south <= lat <= north and west <= lon <= east):
+            return False
+    if spatial['near']:
+        lat0, lon0 = spatial['near']
+        scale = math.cos(math.radians(lat0)) ** 2
+        if (lat - lat0) ** 2 + (lon - lon0) ** 2 * scale > (spatial['radius'] / METERS_PER_DEGREE) ** 2:
+            return False
+    return True
+
+
+# ============ FULL-TEXT SEARCH ============
+# q= on /api/distributions and /api/ssf-beneficiaries. In SQLite each searchable
+# table has an FTS5 index over its name, address, ID and phone columns, kept in
+# step by triggers and ranked with bm25; elsewhere q= falls back to LIKE.
+SEARCH_INDEXES = {
+    'relief_distribution': ('relief_distribution_fts',
+                            ('beneficiary_name', 'father_name', 'tole', 'location', 'beneficiary_id', 'phone')),
+    'social_security_beneficiary': ('social_security_beneficiary_fts',
+                                    ('beneficiary_name', 'tole', 'beneficiary_id', 'phone'))
+}
+# unicode61 does not count Devanagari vowel signs and the virama as letters and
+# would cut "बहादुर" into "बह" and "द"; listing them as token characters keeps
+# words whole. remove_diacritics folds romanized spellings such as "Śarmā".
+DEVANAGARI_MARKS = ''.join(map(chr, [*range(0x0900, 0x0904), *range(0x093A, 0x0950), *range(0x0951, 0x0958),
+                                     0x0962, 0x0963]))
+SEARCH_TOKENIZER = f"unicode61 remove_diacritics 2 tokenchars '{DEVANAGARI_MARKS}'"
+# bm25 weight of a hit per column (others count 1), so a household's own name
+# or ID ranks above the same word in a father's name or address
+SEARCH_WEIGHTS = {'beneficiary_name': 10.0, 'beneficiary_id': 10.0, 'phone': 5.0}
+SEARCH_MAX_TERMS = 8
+
+# Tables whose FTS5 index exists; filled by ensure_search_indexes()
+search_index_tables = set()
+
+
+def ensure_search_indexes():
+    """Create the FTS5 tables and their triggers, filling new ones.
+
+    Does nothing on databases other than SQLite or builds without FTS5;
+    q= then falls back to LIKE over the same columns.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    conn = db.session.connection()
+    for table, (fts, columns) in SEARCH_INDEXES.items():
+        exists = conn.execute(db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                              {'name': fts}).first() is not None
+        names = ', '.join(columns)
+        new_values = ', '.join(f'NEW.{column}' for column in columns)
+        old_values = ', '.join(f'OLD.{column}' for column in columns)
+        try:
+            conn.execute(db.text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+                f"tokenize=\"{SEARCH_TOKENIZER}\", prefix='2 3')"))
+        except Exception as e:
+            print(f"SQLite FTS5 unavailable, q= will scan {table}: {e}")
+            return
+        weights = ', '.join(str(SEARCH_WEIGHTS.get(column, 1.0)) for column in columns)
+        conn.execute(db.text(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25({weights})')"))
+        conn.execute(db.text(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {names}) VALUES (NEW.id, {new_values});
+            END"""))
+        conn.execute(db.text(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF id, {names} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', OLD.id, {old_values});
+                INSERT INTO {fts} (rowid, {names}) VALUES (NEW.id, {new_values});
+            END"""))
+        conn.execute(db.text(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', OLD.id, {old_values});
+            END"""))
+        if not exists:
+            rebuild_search_index(table)
+            print(f"Created search index {fts}")
+        search_index_tables.add(table)
+    db.session.commit()
+
+
+def rebuild_search_index(table):
+    """Re-read a table into its FTS5 index."""
+    fts = SEARCH_INDEXES[table][0]
+    db.session.execute(db.text(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')"))
+
+
+def parse_search(args, errors):
+    """The words of ?q=, or None when there is nothing to search for."""
+    words = (args.get('q') or '').split()
+    if len(words) > SEARCH_MAX_TERMS:
+        errors.append(f"q मा बढीमा {SEARCH_MAX_TERMS} शब्द हुनुपर्छ")
+    # Ranked results page by number only
+    if words and args.get('cursor'):
+        errors.append('q सँग cursor होइन page प्रयोग गर्नुहोस्')
+    return words or None
+
+
+def search_match(words):
+    """FTS5 query matching rows that contain every word, each as a prefix."""
+    return ' AND '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def apply_search(query, model, words):
+    """Narrow query to rows matching every word, best matches first.
+
+    Returns the query, ordered by bm25 rank and then newest id, or by newest
+    id alone on the LIKE fallback.
+    """
+    table = model.__tablename__
+    fts, columns = SEARCH_INDEXES[table]
+    if table not in search_index_tables:
+        for word in words:
+            pattern = f"%{word}%"
+            query = query.filter(db.or_(*[getattr(model, column).ilike(pattern) for column in columns]))
+        return query.order_by(model.id.desc())
+    index = sa_table(fts, sa_column('rowid'), sa_column('rank'), sa_column(fts))
+    matches = (select(index.c.rowid, index.c.rank)
+               .where(index.c[fts].op('MATCH')(search_match(words)))
+               .subquery())
+    return query.join(matches, model.id == matches.c.rowid).order_by(matches.c.rank, model.id.desc())
+
+
+def paginate_search(query, tag, page, per_page):
+    """One page of an apply_search() query by ?page=; the shape paginate_keyset() returns, without cursors."""
+    page, per_page = max(page, 1), max(per_page, 1)
+    rows = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+    total = cached_count(query, tag)
+    return rows[:per_page], {
+        'per_page': per_page,
+        'has_next': len(rows) > per_page,
+        'has_prev': page > 1,
+        'next_cursor': None,
+        'prev_cursor': None,
+        'page': page,
+        'pages': math.ceil(total / per_page),
+        'total': total
+    }
+
+
+# ============ STREAMING EXPORTS ============
+# /api/export/<dataset>.csv or .xlsx downloads every record the dataset's list
+# endpoint pages through, selected by the same filters. Rows are read with
+# yield_per() and written out as they arrive, so memory use does not grow with
+# the table and the download starts before the last row has been read.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+# Characters XML 1.0 cannot carry, and the most text an Excel cell holds
+XLSX_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+XLSX_MAX_CELL_TEXT = 32767
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    )
+}
+# The header row is frozen so it stays in view while scrolling
+XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+XLSX_SHEET_END = '</sheetData></worksheet>'
+
+
+def model_columns(model):
+    """[(name, value getter)] for every mapped column of model, in table order."""
+    return [(attr.key, lambda record, key=attr.key: getattr(record, key)) for attr in model.__mapper__.column_attrs]
+
+
+def export_distributions(args, errors):
+    """The records and fields /api/distributions would return, for its filters, q=, fields= and view=."""
+    query = filter_distributions(ReliefDistribution.query, args, errors)
+    fields = parse_distribution_fields(args, errors)
+    words = parse_search(args, errors)
+    projection = load_distribution_fields(fields)
+    if projection is not None:
+        query = query.options(projection)
+    if words:
+        query = apply_search(query, ReliefDistribution, words)
+    else:
+        query = query.order_by(ReliefDistribution.distribution_date.desc(), ReliefDistribution.id.desc())
+    return query, [(name, DISTRIBUTION_FIELDS[name][1]) for name in fields or DISTRIBUTION_FIELDS]
+
+
+def export_disasters(args, errors):
+    spatial, spatial_errors = parse_spatial_filter(args)
+    errors.extend(spatial_errors)
+    query = apply_spatial_filter(Disaster.query, Disaster, spatial)
+    return query.order_by(Disaster.disaster_date.desc(), Disaster.id.desc()), model_columns(Disaster)
+
+
+def export_ssf_beneficiaries(args, errors):
+    words = parse_search(args, errors)
+    query = SocialSecurityBeneficiary.query
+    if words:
+        query = apply_search(query, SocialSecurityBeneficiary, words)
+    else:
+        query = query.order_by(SocialSecurityBeneficiary.created_at.desc(), SocialSecurityBeneficiary.id.desc())
+    return query, model_columns(SocialSecurityBeneficiary)
+
+
+def export_fund_transactions(args, errors):
+    query = FundTransaction.query.order_by(FundTransaction.transaction_date.desc(), FundTransaction.id.desc())
+    return query, model_columns(FundTransaction)
+
+
+def export_inventory(args, errors):
+    query = filter_inventory(InventoryItem.query, args)
+    return query.order_by(InventoryItem.updated_at.desc(), InventoryItem.id.desc()), model_columns(InventoryItem)
+
+
+# Exportable lists: name in the URL -> function(args, errors) returning (query, columns)
+EXPORT_DATASETS = {
+    'distributions': export_distributions,
+    'disasters': export_disasters,
+    'ssf-beneficiaries': export_ssf_beneficiaries,
+    'fund-transactions': export_fund_transactions,
+    'inventory': export_inventory
+}
+
+
+def export_value(value):
+    """A cell value: dates as ISO text, lists and dicts as JSON, anything else unchanged."""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def csv_chunks(columns, records):
+    """CSV of records as UTF-8 chunks of about EXPORT_CHUNK_BYTES.
+
+    Starts with a byte order mark so Excel reads Devanagari as UTF-8.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    # The header goes out before the first batch is read
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    for record in records:
+        writer.writerow([export_value(value(record)) for _, value in columns])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def xlsx_cell(value):
+    value = export_value(value)
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return f'<c><v>{value!r}</v></c>'
+    text = xml_escape(XLSX_INVALID_CHARS.sub('', str(value))[:XLSX_MAX_CELL_TEXT])
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable file that collects what a ZipFile writes until the generator takes it."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def xlsx_chunks(columns, records, sheet_name):
+    """Single-sheet XLSX workbook of records, zipped as it is written.
+
+    Cells are inline strings, numbers and booleans without styles, so the
+    workbook needs no shared-string table built up front. ZipFile writes to
+    an unseekable sink with data descriptors after each member, which lets
+    the worksheet be compressed and sent row by row.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in XLSX_PARTS.items():
+            archive.writestr(name, xml.replace('{sheet}', xml_escape(sheet_name)))
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            header = ''.join(xlsx_cell(name) for name, _ in columns)
+            sheet.write(f'{XLSX_SHEET_START}<row>{header}</row>'.encode('utf-8'))
+            yield sink.take()
+            for record in records:
+                row = ''.join(xlsx_cell(value(record)) for _, value in columns)
+                sheet.write(f'<row>{row}</row>'.encode('utf-8'))
+                if sink.size >= EXPORT_CHUNK_BYTES:
+                    yield sink.take()
+            sheet.write(XLSX_SHEET_END.encode('utf-8'))
+    yield sink.take()
+
+
+@app.route('/api/export/<dataset>.<fmt>', methods=['GET'])
+def export_records(dataset, fmt):
+    """Download a whole list as CSV or XLSX.
+
+    dataset is one of EXPORT_DATASETS and takes the filters of its list
+    endpoint: distributions (fiscal_year, disaster_type, ward, bbox/near, q,
+    fields, view), disasters (bbox/near), ssf-beneficiaries (q), inventory
+    (category, status, search) and fund-transactions (none). Paging
+    parameters are ignored; every matching record is written.
+    """
+    if dataset not in EXPORT_DATASETS or fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': 'निर्यात भेटिएन'}), 404
+
+    errors = []
+    query, columns = EXPORT_DATASETS[dataset](request.args, errors)
+    if errors:
+        return jsonify({'success': False, 'message': 'अमान्य अनुरोध', 'errors': errors}), 400
+
+    records = query.yield_per(EXPORT_BATCH_SIZE)
+    if fmt == 'csv':
+        chunks = csv_chunks(columns, records)
+    else:
+        chunks = xlsx_chunks(columns, records, dataset)
+    # stream_with_context keeps the request and its database session open
+    # until the last chunk has been sent
+    response = app.response_class(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{dataset}-{date.today().isoformat()}.{fmt}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+# ============ WARD LOOKUP ============
+# Which ward a coordinate falls in, from thalara_wards.json. The municipality
+# is cut into a WARD_GRID_SIZE x WARD_GRID_SIZE grid; cells that no ward
+# boundary crosses know their ward outright, so most lookups are one array
+# read. Points in boundary cells are ray-cast against only the edges that
+# overlap their grid row.
+WARD_GRID_SIZE = 128
+WARD_SOURCE = os.path.join(app.root_path, 'thalara_wards.json')
+
+
+class WardIndex:
+    """Point-in-polygon index over the ward boundaries.
+
+    After construction everything is plain lists: cell_wards[row][col] is a
+    ward number, 0 for outside every ward or -1 for a boundary cell, and
+    row_edges[row] holds (ward, x1, y1, x2, y2) with x = longitude and
+    y = latitude. assign_wards.py reads the same structures with NumPy.
+    """
+
+    def __init__(self, geojson):
+        self.wards = []
+        edges = []
+        for feature in geojson['features']:
+            properties = feature.get('properties') or {}
+            match = re.search(r'\d+', str(properties.get('id') or properties.get('name') or ''))
+            geometry = feature['geometry']
+            if not match or geometry['type'] not in ('Polygon', 'MultiPolygon'):
+                continue
+            ward = int(match.group())
+            self.wards.append(ward)
+            polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+            for ring in (ring for polygon in polygons for ring in polygon):
+                for (x1, y1, *_), (x2, y2, *_) in zip(ring, ring[1:] + ring[:1]):
+                    if (x1, y1) != (x2, y2):
+                        edges.append((ward, x1, y1, x2, y2))
+
+        n = WARD_GRID_SIZE
+        self.west = min(min(e[1], e[3]) for e in edges)
+        self.east = max(max(e[1], e[3]) for e in edges)
+        self.south = min(min(e[2], e[4]) for e in edges)
+        self.north = max(max(e[2], e[4]) for e in edges)
+        self.cell_width = (self.east - self.west) / n
+        self.cell_height = (self.north - self.south) / n
+
+        self.row_edges = [[] for _ in range(n)]
+        boundary = set()
+        for edge in edges:
+            _, x1, y1, x2, y2 = edge
+            first_row, last_row = sorted((self._row(y1), self._row(y2)))
+            first_col, last_col = sorted((self._col(x1), self._col(x2)))
+            for row in range(first_row, last_row + 1):
+                self.row_edges[row].append(edge)
+                for col in range(first_col, last_col + 1):
+                    boundary.add((row, col))
+
+        self.cell_wards = [
+            [-1 if (row, col) in boundary else self._ray_cast(
+                row, self.west + (col + 0.5) * self.cell_width, self.south + (row + 0.5) * self.cell_height)
+             for col in range(n)]
+            for row in range(n)
+        ]
+
+    @classmethod
+    def from_file(cls, path=WARD_SOURCE):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _row(self, lat):
+        return min(max(int((lat - self.south) / self.cell_height), 0), WARD_GRID_SIZE - 1)
+
+    def _col(self, lon):
+        return min(max(int((lon - self.west) / self.cell_width), 0), WARD_GRID_SIZE - 1)
+
+    def _ray_cast(self, row, lon, lat):
+        """Ward whose rings a ray east from the point crosses an odd number of times, else 0."""
+        crossings = {}
+        for ward, x1, y1, x2, y2 in self.row_edges[row]:
+            if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                crossings[ward] = crossings.get(ward, 0) + 1
+        for ward in self.wards:
+            if crossings.get(ward, 0) % 2:
+                return ward
+        return 0
+
+    def lookup(self, latitude, longitude):
+        """Ward number containing the point, or None outside every ward."""
+        if latitude is None or longitude is None:
+            return None
+        if not (self.south <= latitude <= self.north and self.west <= longitude <= self.east):
+            return None
+        row = self._row(latitude)
+        ward = self.cell_wards[row][self._col(longitude)]
+        if ward == -1:
+            ward = self._ray_cast(row, longitude, latitude)
+        return ward or None
+
+
+def load_ward_index():
+    try:
+        return WardIndex.from_file()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ward lookup disabled, could not load {WARD_SOURCE}: {e}")
+        return None
+
+
+ward_index = load_ward_index()
+
+
+def check_ward(ward, latitude, longitude):
+    """Reconcile an entered ward with the coordinates: returns (ward, warning).
+
+    A missing ward is filled in from the coordinates. A ward that disagrees
+    with them is kept, since GPS readings can be off, but a warning for the
+    operator is returned.
+    """
+    located = ward_index.lookup(latitude, longitude) if ward_index else None
+    if located is None:
+        return ward, None
+    if ward is None:
+        return located, None
+    if ward != located:
+        return ward, f'निर्देशाङ्क वडा {located} भित्र पर्छ, तर वडा {ward} छानिएको छ'
+    return ward, None
+
+
+# ============ MAP POINT INDEX ============
+# /api/map-data answers from an in-memory grid of every mapped record instead
+# of re-reading both tables. The grid follows this worker's own commits
+# incrementally and rebuilds when DataVersion shows another worker wrote.
+MAP_INDEX_CELL_ZOOM = 14
+MAP_CLUSTER_RADIUS_PX = 60
+MAP_CLUSTER_MAX_ZOOM = 17
+
+
+def _map_distribution(row):
+    relief_items = row.relief_items_text
+    if relief_items is None:  # Written before relief_items_text existed and not backfilled
+        relief_items = format_relief_items(json.loads(row.relief_items_json) if row.relief_items_json else [])
+    return {
+        'id': row.id,
+        'beneficiary_name': row.beneficiary_name,
+        'disaster_type': row.disaster_type,
+        'disaster_date': row.disaster_date,
+        'location': row.location,
+        'ward': row.ward,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        'relief_items': relief_items,
+        'cash_received': row.cash_received,
+        'notes': row.notes
+    }
+
+
+def _map_disaster(row):
+    return {
+        'id': row.id,
+        'disaster_type': row.disaster_type,
+        'disaster_date': row.disaster_date.strftime('%Y-%m-%d') if row.disaster_date else None,
+        'ward': row.ward,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        'affected_households': row.affected_households,
+        'affected_people': row.affected_people,
+        'deaths': row.deaths,
+        'missing_persons': row.missing_persons,
+        'public_building_damage': row.public_building_damage,
+        'public_building_destruction': row.public_building_destruction,
+        'livestock_injured': row.livestock_injured,
+        'livestock_death': row.livestock_death,
+        'affected_people_male': row.affected_people_male,
+        'affected_people_female': row.affected_people_female
+    }
+
 
-        return jsonify({
-            'success': True,
-            'message': 'वितरण रेकर्ड सफलतापूर्वक सुरक्षित गरियो',
-            'data': distribution.to_dict()
-        })
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({
-            'success': False,
-            'message': str(e)
-        }), 400
+class MapPointIndex:
+    """Map records of one model bucketed into a grid of zoom-14 tiles.
 
-@app.route('/api/statistics', methods=['GET'])
-@cached(timeout=60)  # Cache for 60 seconds
-def get_statistics():
-    try:
-        # Get filter parameters
-        fiscal_year = request.args.get('fiscal_year')
-        disaster_type = request.args.get('disaster_type')
-        ward = request.args.get('ward')
+    version is the DataVersion the contents correspond to; None until the
+    first query builds it.
+    """
 
-        # Build base query
-        base_query = ReliefDistribution.query
+    def __init__(self, model, columns, formatter, sums):
+        self.model = model
+        self.columns = columns
+        self.formatter = formatter
+        self.sums = sums  # Fields totalled per cluster
+        self.points = {}  # id -> (world x, world y, record)
+        self.cells = {}   # (cell x, cell y) -> set of ids
+        self.version = None
+        self.lock = threading.RLock()
 
-        # Apply filters to base query
-        if fiscal_year:
-            base_query = base_query.filter(ReliefDistribution.fiscal_year == fiscal_year)
-        if disaster_type:
-            base_query = base_query.filter(ReliefDistribution.disaster_type == disaster_type)
-        if ward:
-            try:
-                ward_int = int(ward)
-                base_query = base_query.filter(ReliefDistribution.ward == ward_int)
-            except (ValueError, TypeError):
-                pass  # Invalid ward value, don't filter
+    @staticmethod
+    def _cell(wx, wy):
+        n = 2 ** MAP_INDEX_CELL_ZOOM
+        return int(wx * n), int(wy * n)
+
+    def _remove(self, id):
+        point = self.points.pop(id, None)
+        if point is not None:
+            cell = self._cell(point[0], point[1])
+            self.cells[cell].discard(id)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def _put(self, record):
+        self._remove(record['id'])
+        if record['latitude'] is None or record['longitude'] is None:
+            return
+        wx, wy = lonlat_to_world(record['longitude'], record['latitude'])
+        self.points[record['id']] = (wx, wy, record)
+        self.cells.setdefault(self._cell(wx, wy), set()).add(record['id'])
+
+    def rebuild(self, version):
+        rows = self.model.query.filter(
+            self.model.latitude.isnot(None),
+            self.model.longitude.isnot(None)
+        ).with_entities(*[getattr(self.model, column) for column in self.columns]).all()
+        with self.lock:
+            self.points, self.cells = {}, {}
+            for row in rows:
+                self._put(self.formatter(row))
+            self.version = version
+
+    def apply(self, changes, bumps):
+        """Replay one committed transaction: changes is [(id, record or None)]."""
+        with self.lock:
+            if self.version is None:
+                return
+            for id, record in changes:
+                if record is None:
+                    self._remove(id)
+                else:
+                    self._put(record)
+            self.version += bumps
+
+    def records(self):
+        with self.lock:
+            return [self.points[id][2] for id in sorted(self.points)]
+
+    def within(self, west, south, east, north):
+        """[(world x, world y, record)] inside the bbox."""
+        min_wx, min_wy = lonlat_to_world(west, north)
+        max_wx, max_wy = lonlat_to_world(east, south)
+        (min_cx, min_cy), (max_cx, max_cy) = self._cell(min_wx, min_wy), self._cell(max_wx, max_wy)
+        with self.lock:
+            if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(self.cells):
+                candidates = self.points.values()
+            else:
+                candidates = [self.points[id]
+                              for cx in range(min_cx, max_cx + 1)
+                              for cy in range(min_cy, max_cy + 1)
+                              for id in self.cells.get((cx, cy), ())]
+            return [point for point in candidates
+                    if min_wx <= point[0] <= max_wx and min_wy <= point[1] <= max_wy]
+
+    def matching(self, spatial):
+        """[(world x, world y, record)] passing a parse_spatial_filter() filter."""
+        points = self.within(*spatial_boxes(spatial)[0])
+        return [point for point in points
+                if spatial_filter_matches(spatial, point[2]['latitude'], point[2]['longitude'])]
 
-        # Get basic statistics
-        filtered_distributions = base_query.all()
-        total_distributions = len(filtered_distributions)
+    @staticmethod
+    def records_of(points):
+        return sorted((point[2] for point in points), key=lambda record: record['id'])
+
+    def cluster(self, zoom, points):
+        """Grid-cluster points at zoom: {'clusters': [...], 'points': [...]}."""
+        if zoom > MAP_CLUSTER_MAX_ZOOM:
+            return {'clusters': [], 'points': self.records_of(points)}
+
+        scale = 256 * 2 ** zoom / MAP_CLUSTER_RADIUS_PX
+        groups = {}
+        for point in points:
+            groups.setdefault((int(point[0] * scale), int(point[1] * scale)), []).append(point)
+
+        clusters, singles = [], []
+        for members in groups.values():
+            if len(members) == 1:
+                singles.append(members[0][2])
+                continue
+            records = [member[2] for member in members]
+            lats = [r['latitude'] for r in records]
+            lons = [r['longitude'] for r in records]
+            cluster = {
+                'latitude': sum(lats) / len(lats),
+                'longitude': sum(lons) / len(lons),
+                'count': len(records),
+                'bounds': [min(lats), min(lons), max(lats), max(lons)]
+            }
+            for field in self.sums:
+                cluster[field] = sum(r[field] or 0 for r in records)
+            clusters.append(cluster)
+        clusters.sort(key=lambda c: (c['latitude'], c['longitude']))
+        singles.sort(key=lambda r: r['id'])
+        return {'clusters': clusters, 'points': singles}
+
+
+map_indexes = {
+    'distributions': MapPointIndex(
+        ReliefDistribution,
+        ('id', 'beneficiary_name', 'disaster_type', 'disaster_date', 'location', 'ward', 'latitude', 'longitude',
+         'relief_items_text', 'relief_items_json', 'cash_received', 'notes'),
+        _map_distribution, ('cash_received',)
+    ),
+    'disasters': MapPointIndex(
+        Disaster,
+        ('id', 'disaster_type', 'disaster_date', 'ward', 'latitude', 'longitude', 'affected_households',
+         'affected_people', 'deaths', 'missing_persons', 'public_building_damage', 'public_building_destruction',
+         'livestock_injured', 'livestock_death', 'affected_people_male', 'affected_people_female'),
+        _map_disaster, ('affected_households', 'affected_people', 'deaths')
+    )
+}
 
-        # Calculate total cash and items from the filtered results
-        total_cash = sum(dist.cash_received for dist in filtered_distributions)
-        total_items = 0
-        items_count = {}
 
-        for dist in filtered_distributions:
-            for item in dist.get_relief_items():
-                try:
-                    qty = int(item.get('quantity', 0))
-                    total_items += qty
-                    item_name = item.get('item', 'Unknown')
-                    items_count[item_name] = items_count.get(item_name, 0) + qty
-                except (ValueError, TypeError):
-                    continue
+def current_map_indexes():
+    """The map indexes, rebuilt first if the database has moved past them."""
+    versions = get_data_versions([index.model.__name__ for index in map_indexes.values()])
+    for index in map_indexes.values():
+        version = versions[index.model.__name__][0]
+        if index.version != version:
+            index.rebuild(version)
+    return map_indexes
 
-        # Efficient aggregation queries for other statistics
-        # Ward distribution - with proper filtering
-        ward_base_query = db.session.query(
-            ReliefDistribution.ward,
-            db.func.count(ReliefDistribution.id).label('count')
-        ).filter(ReliefDistribution.ward.isnot(None))
 
-        # Apply the same filters to the ward query
-        if fiscal_year:
-            ward_base_query = ward_base_query.filter(ReliefDistribution.fiscal_year == fiscal_year)
-        if disaster_type:
-            ward_base_query = ward_base_query.filter(ReliefDistribution.disaster_type == disaster_type)
-        if ward:
-            try:
-                ward_int = int(ward)
-                ward_base_query = ward_base_query.filter(ReliefDistribution.ward == ward_int)
-            except (ValueError, TypeError):
-                pass
+@event.listens_for(db.session, 'after_flush')
+def _collect_map_changes(session, flush_context):
+    # Snapshot the records now; after_commit can no longer load attributes
+    pending = session.info.setdefault('map_changes', {})
+    for name, index in map_indexes.items():
+        changes = [(obj.id, index.formatter(obj)) for obj in list(session.new) + list(session.dirty)
+                   if isinstance(obj, index.model)]
+        changes += [(obj.id, None) for obj in session.deleted if isinstance(obj, index.model)]
+        if changes:
+            # Each flush that touches the model bumps its DataVersion by one
+            entry = pending.setdefault(name, {'changes': [], 'bumps': 0})
+            entry['changes'].extend(changes)
+            entry['bumps'] += 1
 
-        ward_data = ward_base_query.group_by(ReliefDistribution.ward).all()
 
-        # Fiscal year distribution - with proper filtering
-        fiscal_year_base_query = db.session.query(
-            ReliefDistribution.fiscal_year,
-            db.func.count(ReliefDistribution.id).label('count')
-        ).filter(ReliefDistribution.fiscal_year.isnot(None))
+@event.listens_for(db.session, 'after_commit')
+def _apply_map_changes(session):
+    for name, entry in session.info.pop('map_changes', {}).items():
+        map_indexes[name].apply(entry['changes'], entry['bumps'])
 
-        # Apply the same filters to the fiscal year query
-        if fiscal_year:
-            fiscal_year_base_query = fiscal_year_base_query.filter(ReliefDistribution.fiscal_year == fiscal_year)
-        if disaster_type:
-            fiscal_year_base_query = fiscal_year_base_query.filter(ReliefDistribution.disaster_type == disaster_type)
-        if ward:
-            try:
-                ward_int = int(ward)
-                fiscal_year_base_query = fiscal_year_base_query.filter(ReliefDistribution.ward == ward_int)
-            except (ValueError, TypeError):
-                pass
 
-        fiscal_year_data = fiscal_year_base_query.group_by(ReliefDistribution.fiscal_year).all()
+@event.listens_for(db.session, 'after_rollback')
+def _forget_map_changes(session):
+    session.info.pop('map_changes', None)
 
-        return jsonify({
-            'total_distributions': total_distributions,
-            'total_items': total_items,
-            'total_cash': float(total_cash),
-            'items_distribution': [
-                {'item': item, 'quantity': count}
-                for item, count in items_count.items()
-            ],
-            'ward_distribution': [
-                {'ward': ward, 'count': count}
-                for ward, count in ward_data if ward is not None  # Only include non-null wards
-            ],
-            'fiscal_year_distribution': [
-                {'fiscal_year': fiscal_year, 'count': count}
-                for fiscal_year, count in fiscal_year_data if fiscal_year is not None  # Only include non-null fiscal years
-            ]
-        })
-    except Exception as e:
-        print(f"Error in get_statistics: {str(e)}")  # Log the error
-        return jsonify({
-            'total_distributions': 0,
-            'total_items': 0,
-            'total_cash': 0.0,
-            'items_distribution': [],
-            'ward_distribution': [],
-            'fiscal_year_distribution': []
-        })
 
 @app.route('/api/map-data', methods=['GET'])
-@cached(timeout=30)  # Cache for 30 seconds
+@conditional('ReliefDistribution', 'Disaster')
+@cached(timeout=30, stale_timeout=300, tags=('ReliefDistribution', 'Disaster'))  # Fresh 30s, served stale up to 5 min
 def get_map_data():
-    """API endpoint to get minimal data needed for the map visualization"""
+    """API endpoint to get minimal data needed for the map visualization
+
+    bbox=west,south,east,north and/or near=lat,lon&radius=metres limit the
+    records to an area. With zoom (which needs bbox, the visible area) points
+    closer than MAP_CLUSTER_RADIUS_PX pixels at that zoom are merged into
+    clusters carrying a count, bounds and totals.
+    """
     try:
-        # Get distributions with coordinates for the map
-        distributions = ReliefDistribution.query.filter(
-            ReliefDistribution.latitude.isnot(None),
-            ReliefDistribution.longitude.isnot(None)
-        ).with_entities(
-            ReliefDistribution.id,
-            ReliefDistribution.beneficiary_name,
-            ReliefDistribution.disaster_type,
-            ReliefDistribution.disaster_date,
-            ReliefDistribution.location,
-            ReliefDistribution.ward,
-            ReliefDistribution.latitude,
-            ReliefDistribution.longitude,
-            ReliefDistribution.relief_items_json,
-            ReliefDistribution.cash_received,
-            ReliefDistribution.notes
-        ).all()
+        spatial, errors = parse_spatial_filter(request.args)
+        response_format = parse_response_format(request.args, errors)
+        zoom = None
+        if request.args.get('zoom') is not None:
+            zoom = request.args.get('zoom', type=int)
+            if zoom is None or not 0 <= zoom <= 22:
+                errors.append('zoom 0 देखि 22 सम्मको पूर्णाङ्क हुनुपर्छ')
+            if request.args.get('bbox') is None:
+                errors.append('zoom सँग bbox पनि चाहिन्छ')
+        if errors:
+            return jsonify({'success': False, 'message': 'अमान्य अनुरोध', 'errors': errors}), 400
 
-        # Format distributions for map
-        dist_data = []
-        for dist in distributions:
-            relief_items = json.loads(dist.relief_items_json) if dist.relief_items_json else []
-            items_str = ", ".join([f"{i.get('item')}: {i.get('quantity')} {i.get('unit', 'units')}" for i in relief_items])
-
-            dist_data.append({
-                'id': dist.id,
-                'beneficiary_name': dist.beneficiary_name,
-                'disaster_type': dist.disaster_type,
-                'disaster_date': dist.disaster_date,
-                'location': dist.location,
-                'ward': dist.ward,
-                'latitude': dist.latitude,
-                'longitude': dist.longitude,
-                'relief_items': items_str,
-                'cash_received': dist.cash_received,
-                'notes': dist.notes
+        indexes = current_map_indexes()
+        layout = to_columnar if response_format == 'columnar' else (lambda records: records)
+        if spatial is None:
+            return jsonify({
+                'success': True,
+                'distributions': layout(indexes['distributions'].records()),
+                'disasters': layout(indexes['disasters'].records())
             })
 
-        # Get disasters with coordinates for the map
-        disasters = Disaster.query.filter(
-            Disaster.latitude.isnot(None),
-            Disaster.longitude.isnot(None)
-        ).with_entities(
-            Disaster.id,
-            Disaster.disaster_type,
-            Disaster.disaster_date,
-            Disaster.ward,
-            Disaster.latitude,
-            Disaster.longitude,
-            Disaster.affected_households,
-            Disaster.affected_people,
-            Disaster.deaths,
-            Disaster.missing_persons,
-            Disaster.public_building_damage,
-            Disaster.public_building_destruction,
-            Disaster.livestock_injured,
-            Disaster.livestock_death,
-            Disaster.affected_people_male,
-            Disaster.affected_people_female
-        ).all()
-
-        # Format disasters for map
-        dis_data = []
-        for disaster in disasters:
-            dis_data.append({
-                'id': disaster.id,
-                'disaster_type': disaster.disaster_type,
-                'disaster_date': disaster.disaster_date.strftime('%Y-%m-%d') if disaster.disaster_date else None,
-                'ward': disaster.ward,
-                'latitude': disaster.latitude,
-                'longitude': disaster.longitude,
-                'affected_households': disaster.affected_households,
-                'affected_people': disaster.affected_people,
-                'deaths': disaster.deaths,
-                'missing_persons': disaster.missing_persons,
-                'public_building_damage': disaster.public_building_damage,
-                'public_building_destruction': disaster.public_building_destruction,
-                'livestock_injured': disaster.livestock_injured,
-                'livestock_death': disaster.livestock_death,
-                'affected_people_male': disaster.affected_people_male,
-                'affected_people_female': disaster.affected_people_female
+        points = {name: index.matching(spatial) for name, index in indexes.items()}
+        if zoom is None:
+            return jsonify({
+                'success': True,
+                'distributions': layout(MapPointIndex.records_of(points['distributions'])),
+                'disasters': layout(MapPointIndex.records_of(points['disasters']))
             })
-
+        clustered = {name: indexes[name].cluster(zoom, points[name]) for name in points}
         return jsonify({
             'success': True,
-            'distributions': dist_data,
-            'disasters': dis_data
+            'zoom': zoom,
+            'bbox': list(spatial['bbox']),
+            **{name: {'clusters': layout(result['clusters']), 'points': layout(result['points'])}
+               for name, result in clustered.items()}
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
 
 def clear_cache():
-    """Clear the cache when data is modified"""
-    global cache
+    """Clear the whole cache.
+
+    Writes no longer need this: invalidate_cache_tags() runs after every
+    commit and only drops entries built from the models that changed. With the
+    sqlite backend this empties the shared file for every worker.
+    """
     cache.clear()
 
+
+def invalidate_cache_tags(tags):
+    """Drop cached entries that depend on any of the given model names."""
+    if tags:
+        cache_stats.record_invalidation(tags, cache.delete_tags(tags))
+
+
+@app.route('/api/_internal/cache-stats', methods=['GET', 'DELETE'])
+@csrf.exempt
+def cache_stats_endpoint():
+    """Cache counters for the worker that answers; DELETE resets them.
+
+    Admin only: pass the unlock key in an X-Unlock-Key header.
+    """
+    if request.headers.get('X-Unlock-Key') != os.getenv('UNLOCK_KEY', 'admin123'):
+        return jsonify({'success': False, 'message': 'अमान्य अनलक कुञ्जी'}), 403
+
+    if request.method == 'DELETE':
+        cache_stats.reset(cache)
+        response = jsonify({'success': True, 'message': 'Cache stats reset'})
+    else:
+        response = jsonify(cache_stats.snapshot(cache))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_models(session, flush_context):
+    # Remember which models this transaction touched; flushes can repeat
+    changed = session.info.setdefault('changed_models', set())
+    flushed = {type(obj).__name__ for obj in list(session.new) + list(session.dirty) + list(session.deleted)}
+    changed.update(flushed)
+    bump_data_versions(session.connection(), flushed)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_changed_models(session):
+    invalidate_cache_tags(session.info.pop('changed_models', None))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_changed_models(session):
+    session.info.pop('changed_models', None)
+
 @app.route('/api/distributions/<int:id>/lock', methods=['POST'])
 def toggle_lock_distribution(id):
     try:
@@ -1543,9 +3966,6 @@ def toggle_lock_distribution(id):
             distribution.is_locked = not distribution.is_locked
             db.session.commit()
 
-            # Clear cache after modification
-            clear_cache()
-
             action = "unlocked" if not distribution.is_locked else "locked"
             return jsonify({
                 'success': True,
@@ -1597,9 +4017,6 @@ def delete_distribution(id):
         db.session.delete(distribution)
         db.session.commit()
 
-        # Clear cache after modification
-        clear_cache()
-
         return jsonify({'success': True, 'message': 'वितरण रेकर्ड सफलतापूर्वक हटाइयो'})
     except Exception as e:
         db.session.rollback()
@@ -1610,6 +4027,8 @@ def delete_distribution(id):
 # ============================================
 
 @app.route('/api/settings', methods=['GET'])
+@conditional('AppSettings')
+@cached(timeout=300, tags=('AppSettings',))
 def get_settings():
     try:
         settings = AppSettings.query.all()
@@ -1689,33 +4108,37 @@ def verify_unlock_key():
 # ============================================
 
 @app.route('/api/disasters', methods=['GET'])
+@conditional('Disaster')
 def get_disasters():
     try:
         # Get pagination parameters
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
 
+        spatial, errors = parse_spatial_filter(request.args)
+        response_format = parse_response_format(request.args, errors)
+        cursor = parse_cursor(request.args, Disaster.disaster_date, errors)
+        if errors:
+            return jsonify({'success': False, 'message': 'अमान्य अनुरोध', 'errors': errors}), 400
+
         # Build query
-        query = Disaster.query.order_by(Disaster.disaster_date.desc())
+        query = apply_spatial_filter(Disaster.query, Disaster, spatial)
 
         # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        items, pagination = paginate_keyset(query, Disaster.disaster_date, Disaster.id, 'Disaster',
+                                            page, per_page, cursor)
+        disasters = [d.to_dict() for d in items]
 
         return jsonify({
-            'disasters': [d.to_dict() for d in pagination.items],
-            'pagination': {
-                'page': page,
-                'pages': pagination.pages,
-                'per_page': per_page,
-                'total': pagination.total,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'disasters': to_columnar(disasters) if response_format == 'columnar' else disasters,
+            'pagination': pagination
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
 @app.route('/api/disaster-statistics', methods=['GET'])
+@conditional('Disaster')
+@cached(timeout=30, stale_timeout=300, tags=('Disaster',))  # Fresh 30s, served stale up to 5 min
 def get_disaster_statistics():
     try:
         # Get filter parameters
@@ -1723,97 +4146,59 @@ def get_disaster_statistics():
         disaster_type = request.args.get('disaster_type')
         ward = request.args.get('ward')
 
-        # Build base query
-        base_query = Disaster.query
-
-        # Apply filters to base query
+        # Build the filters once; every query below shares them
+        filters = []
         if fiscal_year:
-            base_query = base_query.filter(Disaster.fiscal_year == fiscal_year)
+            filters.append(Disaster.fiscal_year == fiscal_year)
         if disaster_type:
-            base_query = base_query.filter(Disaster.disaster_type == disaster_type)
+            filters.append(Disaster.disaster_type == disaster_type)
         if ward:
             try:
                 # Handle multi-ward selection if needed
                 if ',' in ward:
                     ward_list = [int(w.strip()) for w in ward.split(',')]
-                    base_query = base_query.filter(Disaster.ward.in_(ward_list))
+                    filters.append(Disaster.ward.in_(ward_list))
                 else:
-                    base_query = base_query.filter(Disaster.ward == int(ward))
+                    filters.append(Disaster.ward == int(ward))
             except (ValueError, TypeError):
                 pass  # Invalid ward value, don't filter
 
-        # Get basic statistics
-        filtered_disasters = base_query.all()
-        total_disasters = len(filtered_disasters)
-
-        # Calculate totals from the filtered results
-        total_affected_people = sum(d.affected_people for d in filtered_disasters)
-        total_deaths = sum(d.deaths for d in filtered_disasters)
-        total_missing = sum(d.missing_persons for d in filtered_disasters)
-        total_affected_households = sum(d.affected_households for d in filtered_disasters)
-        total_public_buildings_destroyed = sum(d.public_building_destruction for d in filtered_disasters)
-        total_public_buildings_damaged = sum(d.public_building_damage for d in filtered_disasters)
-        total_livestock_injured = sum(d.livestock_injured for d in filtered_disasters)
-        total_livestock_death = sum(d.livestock_death for d in filtered_disasters)
-        
-        # Livestock breakdown totals
-        total_cattle_lost = sum(d.cattle_lost or 0 for d in filtered_disasters)
-        total_cattle_injured = sum(d.cattle_injured or 0 for d in filtered_disasters)
-        total_poultry_lost = sum(d.poultry_lost or 0 for d in filtered_disasters)
-        total_poultry_injured = sum(d.poultry_injured or 0 for d in filtered_disasters)
-        total_goats_sheep_lost = sum(d.goats_sheep_lost or 0 for d in filtered_disasters)
-        total_goats_sheep_injured = sum(d.goats_sheep_injured or 0 for d in filtered_disasters)
-        total_other_livestock_lost = sum(d.other_livestock_lost or 0 for d in filtered_disasters)
-        total_other_livestock_injured = sum(d.other_livestock_injured or 0 for d in filtered_disasters)
-        total_affected_males = sum(d.affected_people_male for d in filtered_disasters)
-        total_affected_females = sum(d.affected_people_female for d in filtered_disasters)
-        total_estimated_loss = sum(d.estimated_loss for d in filtered_disasters if hasattr(d, 'estimated_loss'))
-
-        # Ward distribution - with proper filtering
-        ward_base_query = db.session.query(
+        # Every total in a single aggregate SELECT
+        total_columns = [
+            Disaster.affected_people, Disaster.deaths, Disaster.missing_persons, Disaster.affected_households,
+            Disaster.public_building_destruction, Disaster.public_building_damage,
+            Disaster.livestock_injured, Disaster.livestock_death,
+            Disaster.cattle_lost, Disaster.cattle_injured, Disaster.poultry_lost, Disaster.poultry_injured,
+            Disaster.goats_sheep_lost, Disaster.goats_sheep_injured,
+            Disaster.other_livestock_lost, Disaster.other_livestock_injured,
+            Disaster.affected_people_male, Disaster.affected_people_female, Disaster.estimated_loss
+        ]
+        (total_disasters, total_affected_people, total_deaths, total_missing, total_affected_households,
+         total_public_buildings_destroyed, total_public_buildings_damaged,
+         total_livestock_injured, total_livestock_death,
+         total_cattle_lost, total_cattle_injured, total_poultry_lost, total_poultry_injured,
+         total_goats_sheep_lost, total_goats_sheep_injured,
+         total_other_livestock_lost, total_other_livestock_injured,
+         total_affected_males, total_affected_females, total_estimated_loss) = db.session.query(
+            db.func.count(Disaster.id),
+            *[db.func.coalesce(db.func.sum(column), 0) for column in total_columns]
+        ).filter(*filters).one()
+
+        # Ward and disaster type distributions from one (ward, type) GROUP BY
+        ward_counts = {}
+        type_counts = {}
+        pairs = db.session.query(
             Disaster.ward,
-            db.func.count(Disaster.id).label('count')
-        ).filter(Disaster.ward.isnot(None))
-
-        # Apply the same filters to the ward query
-        if fiscal_year:
-            ward_base_query = ward_base_query.filter(Disaster.fiscal_year == fiscal_year)
-        if disaster_type:
-            ward_base_query = ward_base_query.filter(Disaster.disaster_type == disaster_type)
-        if ward:
-            try:
-                if ',' in ward:
-                    ward_list = [int(w.strip()) for w in ward.split(',')]
-                    ward_base_query = ward_base_query.filter(Disaster.ward.in_(ward_list))
-                else:
-                    ward_base_query = ward_base_query.filter(Disaster.ward == int(ward))
-            except (ValueError, TypeError):
-                pass
-
-        ward_data = ward_base_query.group_by(Disaster.ward).all()
-
-        # Disaster type distribution - with proper filtering
-        disaster_type_base_query = db.session.query(
             Disaster.disaster_type,
-            db.func.count(Disaster.id).label('count')
-        ).filter(Disaster.disaster_type.isnot(None))
-
-        # Apply the same filters to the disaster type query
-        if fiscal_year:
-            disaster_type_base_query = disaster_type_base_query.filter(Disaster.fiscal_year == fiscal_year)
-        if disaster_type:
-            disaster_type_base_query = disaster_type_base_query.filter(Disaster.disaster_type == disaster_type)
-        if ward:
-            try:
-                if ',' in ward:
-                    ward_list = [int(w.strip()) for w in ward.split(',')]
-                    disaster_type_base_query = disaster_type_base_query.filter(Disaster.ward.in_(ward_list))
-                else:
-                    disaster_type_base_query = disaster_type_base_query.filter(Disaster.ward == int(ward))
-            except (ValueError, TypeError):
-                pass
-
-        disaster_type_data = disaster_type_base_query.group_by(Disaster.disaster_type).all()
+            db.func.count(Disaster.id)
+        ).filter(*filters).group_by(Disaster.ward, Disaster.disaster_type).all()
+        for pair_ward, pair_type, count in pairs:
+            if pair_ward is not None:
+                ward_counts[pair_ward] = ward_counts.get(pair_ward, 0) + count
+            if pair_type is not None:
+                type_counts[pair_type] = type_counts.get(pair_type, 0) + count
+        ward_data = sorted(ward_counts.items())
+        disaster_type_data = sorted(type_counts.items())
 
         return jsonify({
             'total_disasters': total_disasters,
@@ -1864,6 +4249,253 @@ def get_disaster_statistics():
             'disaster_type_distribution': []
         })
 
+# Sources for /api/statistics/cube. Each maps the allowed dimension and measure
+# names to columns; 'rollup' is used instead of the base table whenever every
+# requested dimension and measure is available there.
+STATISTICS_CUBE_SOURCES = {
+    'relief': {
+        'model': ReliefDistribution,
+        'dimensions': ('fiscal_year', 'disaster_type', 'ward', 'status'),
+        'measures': {
+            'count': lambda m: db.func.count(m.id),
+            'cash': lambda m: db.func.sum(m.cash_received),
+            'people': lambda m: db.func.sum(db.func.coalesce(m.male_count, 0) + db.func.coalesce(m.female_count, 0))
+        },
+        'rollup': {
+            'model': ReliefStatRollup,
+            'measures': {
+                'count': lambda m: db.func.sum(m.distribution_count),
+                'cash': lambda m: db.func.sum(m.cash_total)
+            },
+            # Groups emptied by deletes can linger; they are not real groups
+            'having': lambda m: db.func.sum(m.distribution_count) > 0
+        }
+    },
+    'relief_items': {
+        'model': ReliefItemRollup,
+        'dimensions': ('fiscal_year', 'disaster_type', 'ward', 'item'),
+        'measures': {
+            'quantity': lambda m: db.func.sum(m.quantity),
+            'lines': lambda m: db.func.sum(m.line_count)
+        },
+        'having': lambda m: db.func.sum(m.line_count) > 0
+    },
+    'disaster': {
+        'model': Disaster,
+        'dimensions': ('fiscal_year', 'disaster_type', 'ward'),
+        'measures': {
+            'count': lambda m: db.func.count(m.id),
+            'affected_people': lambda m: db.func.sum(m.affected_people),
+            'affected_households': lambda m: db.func.sum(m.affected_households),
+            'deaths': lambda m: db.func.sum(m.deaths),
+            'missing_persons': lambda m: db.func.sum(m.missing_persons),
+            'estimated_loss': lambda m: db.func.sum(m.estimated_loss)
+        }
+    }
+}
+
+
+@app.route('/api/statistics/cube', methods=['GET'])
+@conditional('ReliefDistribution', 'Disaster')
+@cached(timeout=30, stale_timeout=300, tags=('ReliefDistribution', 'Disaster'))
+def get_statistics_cube():
+    """Group any set of dimensions and measures in one query.
+
+    ?source=relief|relief_items|disaster&dimensions=ward,fiscal_year&measures=count,cash
+    plus the usual fiscal_year, disaster_type and ward (comma separated) filters.
+    The result is columnar: one list per dimension and measure, aligned by row,
+    so the client can pivot it any way it likes.
+    """
+    source_name = request.args.get('source', 'relief')
+    source = STATISTICS_CUBE_SOURCES.get(source_name)
+    if source is None:
+        return jsonify({
+            'success': False,
+            'message': 'अमान्य अनुरोध',
+            'errors': [f"Unknown source '{source_name}' (expected one of: {', '.join(STATISTICS_CUBE_SOURCES)})"]
+        }), 400
+
+    dimensions = [d for d in request.args.get('dimensions', '').split(',') if d]
+    measures = [m for m in request.args.get('measures', '').split(',') if m] or [next(iter(source['measures']))]
+    errors = [f"Unknown dimension '{d}'" for d in dimensions if d not in source['dimensions']]
+    errors += [f"Unknown measure '{m}'" for m in measures if m not in source['measures']]
+    if len(set(dimensions)) != len(dimensions) or len(set(measures)) != len(measures):
+        errors.append('Dimensions and measures may only be listed once')
+    if errors:
+        return jsonify({'success': False, 'message': 'अमान्य अनुरोध', 'errors': errors}), 400
+
+    # The rollup answers the common dashboard groupings without touching the base table
+    plan = source
+    rollup = source.get('rollup')
+    if rollup and all(hasattr(rollup['model'], d) for d in dimensions) and all(m in rollup['measures'] for m in measures):
+        plan = rollup
+    model = plan['model']
+
+    filters = []
+    if request.args.get('fiscal_year'):
+        filters.append(model.fiscal_year == request.args['fiscal_year'])
+    if request.args.get('disaster_type'):
+        filters.append(model.disaster_type == request.args['disaster_type'])
+    if request.args.get('ward'):
+        try:
+            filters.append(model.ward.in_([int(w) for w in request.args['ward'].split(',')]))
+        except (ValueError, TypeError):
+            pass  # Invalid ward value, don't filter
+
+    group_columns = [getattr(model, d) for d in dimensions]
+    query = db.session.query(
+        *group_columns,
+        *[plan['measures'][m](model) for m in measures]
+    ).filter(*filters)
+    if group_columns:
+        query = query.group_by(*group_columns).order_by(*group_columns)
+        if 'having' in plan:
+            query = query.having(plan['having'](model))
+    rows = query.all()
+
+    names = dimensions + measures
+    return jsonify({
+        'source': source_name,
+        'dimensions': dimensions,
+        'measures': measures,
+        'row_count': len(rows),
+        'columns': {name: [row[i] if row[i] is not None or name in dimensions else 0 for row in rows]
+                    for i, name in enumerate(names)}
+    })
+
+
+# Measures /api/timeseries can sum per source, mapped to daily_rollup columns
+TIMESERIES_MEASURES = {
+    'relief': {'count': 'record_count', 'cash': 'cash_total'},
+    'disaster': {
+        'count': 'record_count',
+        'affected_people': 'affected_people',
+        'affected_households': 'affected_households',
+        'deaths': 'deaths',
+        'missing_persons': 'missing_persons',
+        'estimated_loss': 'estimated_loss'
+    }
+}
+TIMESERIES_MAX_DAYS = 3660  # Ten years of buckets at most
+
+
+def parse_bs_date(value):
+    """AD date for a BS 'YYYY-MM-DD' string, or None if it is not a date the converters know."""
+    if not value or not re.match(r'^\d{4}-\d{2}-\d{2}$', value):
+        return None
+    ad_date = datetime.strptime(bs_to_ad(value), '%Y-%m-%d').date()
+    # bs_to_ad falls back to today for years it has no table for; a round trip catches that
+    return ad_date if bs_date_of(ad_date) == value else None
+
+
+@app.route('/api/timeseries', methods=['GET'])
+@conditional('ReliefDistribution', 'Disaster')
+@cached(timeout=30, stale_timeout=300, tags=('ReliefDistribution', 'Disaster'))
+def get_timeseries():
+    """Counts and sums over time, bucketed on the Bikram Sambat calendar.
+
+    ?source=relief|disaster&interval=day|week|month plus either fiscal_year
+    (e.g. 2081/82) or from_bs_date/to_bs_date, and the usual ward and
+    disaster_type filters. Days are BS dates, weeks start on Sunday and months
+    are BS months. Buckets without records are included with zeros.
+    """
+    source = request.args.get('source', 'relief')
+    interval = request.args.get('interval', 'month')
+    errors = []
+    if source not in TIMESERIES_MEASURES:
+        errors.append(f"Unknown source '{source}' (expected relief or disaster)")
+    if interval not in ('day', 'week', 'month'):
+        errors.append(f"Unknown interval '{interval}' (expected day, week or month)")
+
+    # Date range: a fiscal year (Shrawan 1 to the end of Ashad) or explicit BS dates
+    start = end = None
+    fiscal_year = request.args.get('fiscal_year')
+    if fiscal_year:
+        match = re.match(r'^(\d{4})/\d{2}$', fiscal_year)
+        start = parse_bs_date(f"{match.group(1)}-04-01") if match else None
+        next_year = parse_bs_date(f"{int(match.group(1)) + 1}-04-01") if match else None
+        if start is None or next_year is None:
+            errors.append(f"Invalid fiscal_year '{fiscal_year}'")
+        else:
+            end = next_year - timedelta(days=1)
+    else:
+        for name in ('from_bs_date', 'to_bs_date'):
+            value = request.args.get(name)
+            parsed = parse_bs_date(value)
+            if value and parsed is None:
+                errors.append(f"Invalid {name} '{value}' (expected a BS date YYYY-MM-DD)")
+            if name == 'from_bs_date':
+                start = parsed
+            else:
+                end = parsed
+    if errors:
+        return jsonify({'success': False, 'message': 'अमान्य अनुरोध', 'errors': errors}), 400
+
+    measures = TIMESERIES_MEASURES[source]
+    filters = [DailyRollup.source == source]
+    if request.args.get('disaster_type'):
+        filters.append(DailyRollup.disaster_type == request.args['disaster_type'])
+    if request.args.get('ward'):
+        try:
+            filters.append(DailyRollup.ward.in_([int(w) for w in request.args['ward'].split(',')]))
+        except (ValueError, TypeError):
+            pass  # Invalid ward value, don't filter
+
+    # Open-ended ranges stop at the first/last day with data
+    if start is None or end is None:
+        first_day, last_day = db.session.query(
+            db.func.min(DailyRollup.day), db.func.max(DailyRollup.day)
+        ).filter(*filters).one()
+        start = start or first_day
+        end = end or last_day
+    if start is None or end is None or start > end:
+        return jsonify({'source': source, 'interval': interval, 'buckets': [], 'start_dates': [],
+                        'series': {name: [] for name in measures}})
+    if (end - start).days > TIMESERIES_MAX_DAYS:
+        return jsonify({'success': False, 'message': 'अमान्य अनुरोध',
+                        'errors': [f'Date range is limited to {TIMESERIES_MAX_DAYS} days']}), 400
+
+    rows = db.session.query(
+        DailyRollup.day,
+        *[db.func.sum(getattr(DailyRollup, column)) for column in measures.values()]
+    ).filter(*filters, DailyRollup.day.between(start, end)).group_by(DailyRollup.day).all()
+    by_day = {row[0]: row[1:] for row in rows}
+
+    # Walk every day in the range so empty buckets show up as zeros
+    labels, start_dates, sums = [], [], []
+    bucket_index = {}
+    day = start
+    while day <= end:
+        if interval == 'day':
+            key = label = bs_date_of(day)
+        elif interval == 'week':
+            week_start = day - timedelta(days=(day.weekday() + 1) % 7)
+            key = label = bs_date_of(week_start)
+        else:
+            key = label = bs_date_of(day)[:7]
+        if key not in bucket_index:
+            bucket_index[key] = len(labels)
+            labels.append(label)
+            start_dates.append(day.isoformat())
+            sums.append([0] * len(measures))
+        values = by_day.get(day)
+        if values:
+            bucket = sums[bucket_index[key]]
+            for i, value in enumerate(values):
+                bucket[i] += value or 0
+        day += timedelta(days=1)
+
+    return jsonify({
+        'source': source,
+        'interval': interval,
+        'from_bs_date': bs_date_of(start),
+        'to_bs_date': bs_date_of(end),
+        'buckets': labels,
+        'start_dates': start_dates,
+        'series': {name: [bucket[i] for bucket in sums] for i, name in enumerate(measures)}
+    })
+
+
 @app.route('/api/disasters', methods=['POST'])
 def add_disaster():
     try:
@@ -1904,6 +4536,8 @@ def add_disaster():
             estimated_loss=float(data.get('estimated_loss', 0)) if data.get('estimated_loss') else 0.0,
             is_locked=True
         )
+        disaster.ward, ward_warning = check_ward(disaster.ward, disaster.latitude, disaster.longitude)
+
         db.session.add(disaster)
         db.session.commit()
 
@@ -1920,6 +4554,7 @@ def add_disaster():
 
         return jsonify({
             'success': True,
+            'ward_warning': ward_warning,
             'message': 'विपद् घटना रेकर्ड सफलतापूर्वक सुरक्षित गरियो',
             'data': disaster.to_dict()
         }), 201
@@ -1990,6 +4625,8 @@ def add_disaster_report():
             affected_people_female=int(data.get('affected_people_female', 0)),
             estimated_loss=float(data.get('estimated_loss', 0)) if data.get('estimated_loss') else 0.0
         )
+        disaster.ward, ward_warning = check_ward(disaster.ward, disaster.latitude, disaster.longitude)
+
         db.session.add(disaster)
         db.session.commit()
 
@@ -2006,6 +4643,7 @@ def add_disaster_report():
 
         return jsonify({
             'success': True,
+            'ward_warning': ward_warning,
             'message': 'विपद् रिपोर्ट सफलतापूर्वक पेश गरियो',
             'data': disaster.to_dict()
         }), 201
@@ -2035,9 +4673,6 @@ def toggle_lock_disaster(id):
             disaster.is_locked = not disaster.is_locked
             db.session.commit()
 
-            # Clear cache after modification
-            clear_cache()
-
             action = "unlocked" if not disaster.is_locked else "locked"
             return jsonify({
                 'success': True,
@@ -2132,13 +4767,13 @@ def edit_disaster(id):
         disaster.affected_people_female = int(data.get('affected_people_female', disaster.affected_people_female))
         disaster.estimated_loss = float(data.get('estimated_loss', disaster.estimated_loss)) if data.get('estimated_loss') else disaster.estimated_loss
 
-        db.session.commit()
+        disaster.ward, ward_warning = check_ward(disaster.ward, disaster.latitude, disaster.longitude)
 
-        # Clear cache after modification
-        clear_cache()
+        db.session.commit()
 
         return jsonify({
             'success': True,
+            'ward_warning': ward_warning,
             'message': 'विपद् रेकर्ड सफलतापूर्वक अपडेट गरियो',
             'data': disaster.to_dict()
         })
@@ -2163,9 +4798,6 @@ def delete_disaster(id):
         db.session.delete(disaster)
         db.session.commit()
 
-        # Clear cache after modification
-        clear_cache()
-
         return jsonify({'success': True, 'message': 'विपद् घटना रेकर्ड सफलतापूर्वक हटाइयो'})
     except Exception as e:
         db.session.rollback()
@@ -2188,8 +4820,13 @@ def get_event_logs():
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
 
+        errors = []
+        cursor = parse_cursor(request.args, EventLog.timestamp, errors)
+        if errors:
+            return jsonify({'success': False, 'message': 'अमान्य अनुरोध', 'errors': errors}), 400
+
         # Build query
-        query = EventLog.query.order_by(EventLog.timestamp.desc())
+        query = EventLog.query
 
         # Apply filters
         if event_type:
@@ -2201,21 +4838,14 @@ def get_event_logs():
         if date_to:
             query = query.filter(EventLog.timestamp <= datetime.strptime(date_to, '%Y-%m-%d'))
 
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        events = pagination.items
+        # Paginate, newest first
+        events, pagination = paginate_keyset(query, EventLog.timestamp, EventLog.id, 'EventLog',
+                                             page, per_page, cursor)
 
         return jsonify({
             'success': True,
             'event_logs': [event.to_dict() for event in events],
-            'pagination': {
-                'page': page,
-                'pages': pagination.pages,
-                'per_page': per_page,
-                'total': pagination.total,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'pagination': pagination
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -2341,10 +4971,6 @@ def toggle_lock_event_log(id):
             event_log.is_locked = not event_log.is_locked
             db.session.commit()
 
-            # Clear cache after modification
-            global cache
-            cache.clear()
-
             action = "unlocked" if not event_log.is_locked else "locked"
             return jsonify({
                 'success': True,
@@ -2525,10 +5151,6 @@ def toggle_lock_situation_report(id):
             report.is_locked = not report.is_locked
             db.session.commit()
 
-            # Clear cache after modification
-            global cache
-            cache.clear()
-
             action = "unlocked" if not report.is_locked else "locked"
             return jsonify({
                 'success': True,
@@ -2777,10 +5399,6 @@ def toggle_lock_public_information(id):
             info.is_locked = not info.is_locked
             db.session.commit()
 
-            # Clear cache after modification
-            global cache
-            cache.clear()
-
             action = "unlocked" if not info.is_locked else "locked"
             return jsonify({
                 'success': True,
@@ -2808,22 +5426,26 @@ def get_ssf_beneficiaries():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
-        # Build query
-        query = SocialSecurityBeneficiary.query.order_by(SocialSecurityBeneficiary.created_at.desc())
-        
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        
+        errors = []
+        cursor = parse_cursor(request.args, SocialSecurityBeneficiary.created_at, errors)
+        words = parse_search(request.args, errors)
+        if errors:
+            return jsonify({'success': False, 'message': 'अमान्य अनुरोध', 'errors': errors}), 400
+
+        if words:
+            # Best matches first
+            beneficiaries, pagination = paginate_search(
+                apply_search(SocialSecurityBeneficiary.query, SocialSecurityBeneficiary, words),
+                'SocialSecurityBeneficiary', page, per_page)
+        else:
+            # Paginate, newest first
+            beneficiaries, pagination = paginate_keyset(
+                SocialSecurityBeneficiary.query, SocialSecurityBeneficiary.created_at, SocialSecurityBeneficiary.id,
+                'SocialSecurityBeneficiary', page, per_page, cursor)
+
         return jsonify({
-            'beneficiaries': [b.to_dict() for b in pagination.items],
-            'pagination': {
-                'page': page,
-                'pages': pagination.pages,
-                'per_page': per_page,
-                'total': pagination.total,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'beneficiaries': [b.to_dict() for b in beneficiaries],
+            'pagination': pagination
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -2849,10 +5471,13 @@ def add_ssf_beneficiary():
             notes=data.get('notes'),
             is_locked=True
         )
+        beneficiary.ward, ward_warning = check_ward(beneficiary.ward, beneficiary.latitude, beneficiary.longitude)
+
         db.session.add(beneficiary)
         db.session.commit()
         return jsonify({
             'success': True,
+            'ward_warning': ward_warning,
             'message': 'सामाजिक सुरक्षा लाभग्राही सफलतापूर्वक थपियो',
             'data': beneficiary.to_dict()
         }), 201
@@ -2882,9 +5507,6 @@ def toggle_lock_ssf_beneficiary(id):
             beneficiary.is_locked = not beneficiary.is_locked
             db.session.commit()
 
-            # Clear cache after modification
-            clear_cache()
-
             action = "unlocked" if not beneficiary.is_locked else "locked"
             return jsonify({
                 'success': True,
@@ -2931,13 +5553,13 @@ def edit_ssf_beneficiary(id):
         beneficiary.bank_name = data.get('bank_name', beneficiary.bank_name)
         beneficiary.notes = data.get('notes', beneficiary.notes)
 
-        db.session.commit()
+        beneficiary.ward, ward_warning = check_ward(beneficiary.ward, beneficiary.latitude, beneficiary.longitude)
 
-        # Clear cache after modification
-        clear_cache()
+        db.session.commit()
 
         return jsonify({
             'success': True,
+            'ward_warning': ward_warning,
             'message': 'सामाजिक सुरक्षा लाभग्राही सफलतापूर्वक अपडेट गरियो',
             'data': beneficiary.to_dict()
         })
@@ -2962,9 +5584,6 @@ def delete_ssf_beneficiary(id):
         db.session.delete(beneficiary)
         db.session.commit()
 
-        # Clear cache after modification
-        clear_cache()
-
         return jsonify({'success': True, 'message': 'सामाजिक सुरक्षा लाभग्राही सफलतापूर्वक हटाइयो'})
     except Exception as e:
         db.session.rollback()
@@ -2976,6 +5595,8 @@ def init_db():
         try:
             # Create all tables if they don't exist
             db.create_all()
+            ensure_spatial_indexes()
+            ensure_search_indexes()
 
             # Check if the is_locked column exists in each table and add it if missing
             from sqlalchemy import text
@@ -2987,6 +5608,21 @@ def init_db():
                 db.session.execute(text("ALTER TABLE relief_distribution ADD COLUMN is_locked BOOLEAN DEFAULT 0"))
                 print("Added is_locked column to relief_distribution table")
 
+            # Check and add relief_items_text column, filled from relief_items_json
+            if 'relief_items_text' not in columns:
+                db.session.execute(text("ALTER TABLE relief_distribution ADD COLUMN relief_items_text TEXT"))
+                rows = db.session.execute(text("SELECT id, relief_items_json FROM relief_distribution")).fetchall()
+                updates = []
+                for id, items_json in rows:
+                    try:
+                        updates.append({'id': id, 'text': format_relief_items(json.loads(items_json) if items_json else [])})
+                    except (json.JSONDecodeError, TypeError, AttributeError):
+                        continue
+                if updates:
+                    db.session.execute(text("UPDATE relief_distribution SET relief_items_text = :text WHERE id = :id"), updates)
+                db.session.commit()
+                print(f"Added relief_items_text column to relief_distribution table ({len(updates)} rows filled)")
+
             # Check and add is_locked column to disaster table
             result = db.session.execute(text("PRAGMA table_info(disaster)"))
             columns = [row[1] for row in result.fetchall()]
@@ -3109,6 +5745,19 @@ def init_db():
             # Commit the changes
             db.session.commit()
 
+            # Fill the relief rollups on databases that predate them; the flush
+            # listener only applies deltas, so edits would otherwise go negative
+            has_distributions = db.session.query(ReliefDistribution.id).first() is not None
+            if has_distributions and db.session.query(ReliefStatRollup.id).first() is None:
+                groups, item_groups = rebuild_relief_rollups()
+                print(f"Filled relief statistics rollups ({groups} groups, {item_groups} item totals)")
+
+            # Same for the daily rollup behind /api/timeseries
+            has_disasters = db.session.query(Disaster.id).first() is not None
+            if (has_distributions or has_disasters) and db.session.query(DailyRollup.id).first() is None:
+                days = rebuild_daily_rollups()
+                print(f"Filled daily rollups ({days} daily totals)")
+
             # Initialize default settings
             if not AppSettings.get_setting('relief_items'):
                 AppSettings.set_setting('relief_items', [
@@ -3205,6 +5854,11 @@ def generate_daily_report():
 
 def fetch_daily_report_data(start_date, end_date, start_bs=None, end_bs=None):
     """Fetch all necessary data for the daily report range."""
+    report_start_datetime = datetime.combine(start_date, datetime.min.time())
+    report_end_datetime = datetime.combine(end_date, datetime.max.time())
+    # Compare the columns themselves rather than date(column) so the
+    # disaster_date, created_at and timestamp indexes can be used
+    next_day = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
     
     # Get disasters for the date range
     if start_bs and end_bs:
@@ -3214,20 +5868,20 @@ def fetch_daily_report_data(start_date, end_date, start_bs=None, end_bs=None):
         ).all()
     else:
         disasters = Disaster.query.filter(
-            db.func.date(Disaster.disaster_date) >= start_date,
-            db.func.date(Disaster.disaster_date) <= end_date
+            Disaster.disaster_date >= start_date,
+            Disaster.disaster_date <= end_date
         ).all()
     
     # Also get disasters created in the range for event log purposes
     all_disasters_today = Disaster.query.filter(
-        db.func.date(Disaster.created_at) >= start_date,
-        db.func.date(Disaster.created_at) <= end_date
+        Disaster.created_at >= report_start_datetime,
+        Disaster.created_at < next_day
     ).all()
     
     # Get event logs for the range
     event_logs = EventLog.query.filter(
-        db.func.date(EventLog.timestamp) >= start_date,
-        db.func.date(EventLog.timestamp) <= end_date
+        EventLog.timestamp >= report_start_datetime,
+        EventLog.timestamp < next_day
     ).order_by(EventLog.timestamp.desc()).all()
     
     # Get latest situation report for the end of the range
@@ -3236,9 +5890,6 @@ def fetch_daily_report_data(start_date, end_date, start_bs=None, end_bs=None):
     ).order_by(SituationReport.report_date.desc()).first()
     
     # Get public advisories valid in the range
-    report_start_datetime = datetime.combine(start_date, datetime.min.time())
-    report_end_datetime = datetime.combine(end_date, datetime.max.time())
-    
     public_advisories = PublicInformation.query.filter(
         PublicInformation.valid_from <= report_end_datetime,
         db.or_(
@@ -3998,22 +6649,26 @@ def add_inventory_item():
             
     return render_template('inventory_form.html')
 
-@app.route('/api/inventory', methods=['GET'])
-def get_inventory_items():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    category = request.args.get('category')
-    status = request.args.get('status')
-    search = request.args.get('search')
-    
-    query = InventoryItem.query
-    
+def filter_inventory(query, args):
+    """Apply the category, status and search filters of /api/inventory (and its export)."""
+    category = args.get('category')
+    status = args.get('status')
+    search = args.get('search')
+
     if category:
         query = query.filter(InventoryItem.category == category)
     if status:
         query = query.filter(InventoryItem.status == status)
     if search:
         query = query.filter(InventoryItem.name.ilike(f'%{search}%'))
+    return query
+
+@app.route('/api/inventory', methods=['GET'])
+def get_inventory_items():
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    
+    query = filter_inventory(InventoryItem.query, request.args)
         
     pagination = query.order_by(InventoryItem.updated_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
     
@@ -4120,7 +6775,6 @@ def toggle_lock_inventory(id):
         if unlock_key == correct_unlock_key:
             item.is_locked = not item.is_locked
             db.session.commit()
-            clear_cache()
             action = "Unlocked" if not item.is_locked else "Locked"
             return jsonify({'success': True, 'is_locked': item.is_locked, 'message': f'Item {action} successfully'})
         return jsonify({'success': False, 'message': 'अमान्य अनलक कुञ्जी'}), 401
@@ -4143,7 +6797,6 @@ def toggle_lock_fund(id):
         if unlock_key == correct_unlock_key:
             transaction.is_locked = not transaction.is_locked
             db.session.commit()
-            clear_cache()
             action = "Unlocked" if not transaction.is_locked else "Locked"
             return jsonify({'success': True, 'is_locked': transaction.is_locked, 'message': f'Transaction {action} successfully'})
         return jsonify({'success': False, 'message': 'अमान्य अनलक कुञ्जी'}), 401
@@ -4159,7 +6812,6 @@ def manage_fund_transaction(id):
         if request.method == 'DELETE':
             db.session.delete(transaction)
             db.session.commit()
-            clear_cache()
             return jsonify({'success': True, 'message': 'Transaction deleted'})
         
         data = request.json
@@ -4168,7 +6820,6 @@ def manage_fund_transaction(id):
         if data.get('transaction_date'):
             transaction.transaction_date = datetime.strptime(data.get('transaction_date'), '%Y-%m-%d').date()
         db.session.commit()
-        clear_cache()
         return jsonify({'success': True, 'message': 'Transaction updated'})
     except Exception as e:
         db.session.rollback()
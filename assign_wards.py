@@ -0,0 +1,100 @@
+"""Check the ward of every mapped record against the ward boundaries.
+
+Looks up the ward polygon containing each relief distribution, disaster and
+social security beneficiary that has coordinates, using the app's ward index
+with NumPy doing the boundary-cell ray casting for all rows at once.
+
+    python assign_wards.py            # report rows whose ward disagrees or is missing
+    python assign_wards.py --assign   # also fill in missing wards
+    python assign_wards.py --fix      # also overwrite wards that disagree
+
+Changes go through the ORM in batches, so rollups and caches stay in step.
+"""
+import sys
+from collections import Counter
+
+import numpy as np
+
+from app import app, db, ward_index, WARD_GRID_SIZE, ReliefDistribution, Disaster, SocialSecurityBeneficiary
+
+MODELS = (ReliefDistribution, Disaster, SocialSecurityBeneficiary)
+BATCH_SIZE = 500
+
+
+def lookup_wards(index, lats, lons):
+    """Vectorised WardIndex.lookup: an array of ward numbers, 0 outside every ward."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    wards = np.zeros(len(lats), dtype=int)
+    inside = (lats >= index.south) & (lats <= index.north) & (lons >= index.west) & (lons <= index.east)
+
+    rows = np.clip(((lats - index.south) / index.cell_height).astype(int), 0, WARD_GRID_SIZE - 1)
+    cols = np.clip(((lons - index.west) / index.cell_width).astype(int), 0, WARD_GRID_SIZE - 1)
+    cell_wards = np.asarray(index.cell_wards)[rows, cols]
+    wards[inside] = np.maximum(cell_wards[inside], 0)
+
+    boundary = inside & (cell_wards == -1)
+    for row in np.unique(rows[boundary]):
+        members = np.flatnonzero(boundary & (rows == row))
+        edges = np.asarray(index.row_edges[row], dtype=float)
+        if not len(edges):
+            continue
+        edge_wards, x1, y1, x2, y2 = (edges[:, i] for i in range(5))
+        py = lats[members][:, None]
+        px = lons[members][:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crosses = ((y1 > py) != (y2 > py)) & (px < x1 + (py - y1) * (x2 - x1) / (y2 - y1))
+        for ward in index.wards:
+            odd = crosses[:, edge_wards == ward].sum(axis=1) % 2 == 1
+            unset = wards[members] == 0
+            wards[members[odd & unset]] = ward
+    return wards
+
+
+def check(model, assign=False, fix=False):
+    rows = db.session.query(model.id, model.ward, model.latitude, model.longitude).filter(
+        model.latitude.isnot(None), model.longitude.isnot(None)
+    ).all()
+    if not rows:
+        print(f"{model.__tablename__}: no rows with coordinates")
+        return
+    ids = np.array([r.id for r in rows])
+    entered = np.array([r.ward if r.ward is not None else 0 for r in rows])
+    located = lookup_wards(ward_index, [r.latitude for r in rows], [r.longitude for r in rows])
+
+    outside = located == 0
+    missing = ~outside & (entered == 0)
+    mismatched = ~outside & (entered != 0) & (entered != located)
+    print(f"{model.__tablename__}: {len(rows)} with coordinates, {outside.sum()} outside every ward, "
+          f"{missing.sum()} without a ward, {mismatched.sum()} in a different ward than entered")
+    for (was, now), count in sorted(Counter(zip(entered[mismatched], located[mismatched])).items()):
+        print(f"    entered ward {was}, located in ward {now}: {count}")
+
+    update = np.zeros(len(rows), dtype=bool)
+    if assign or fix:
+        update |= missing
+    if fix:
+        update |= mismatched
+    targets = dict(zip(ids[update].tolist(), located[update].tolist()))
+    target_ids = sorted(targets)
+    for start in range(0, len(target_ids), BATCH_SIZE):
+        for obj in model.query.filter(model.id.in_(target_ids[start:start + BATCH_SIZE])):
+            obj.ward = targets[obj.id]
+        db.session.commit()
+    if targets:
+        print(f"    ✅ Updated {len(targets)} wards")
+
+
+def main(argv):
+    if ward_index is None:
+        print("❌ Ward boundaries could not be loaded")
+        return 1
+    assign, fix = '--assign' in argv, '--fix' in argv
+    with app.app_context():
+        for model in MODELS:
+            check(model, assign=assign, fix=fix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
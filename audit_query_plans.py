@@ -0,0 +1,227 @@
+"""Report the SQLite query plans of the queries the API routes issue.
+
+Seeds a throwaway database with synthetic data (or opens a copy of a real
+one with --db), requests each URL in AUDIT_URLS plus every GET /api route
+without path arguments, records the SELECTs they run and prints the
+EXPLAIN QUERY PLAN of each. On tables of at least --min-rows rows it flags
+full scans, filtered queries that walk a whole index and temporary B-trees
+built for ORDER BY, GROUP BY or DISTINCT. Usage:
+
+    python audit_query_plans.py [--rows 50000] [--db instance/leoc.db] [--min-rows 1000] [--strict]
+
+--strict exits with status 1 when anything is flagged, for use in CI.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix='leoc_audit_')
+
+# Filters the dashboard, map and reports pages actually send
+AUDIT_URLS = [
+    '/api/distributions',
+    '/api/distributions?page=40',
+    '/api/distributions?fiscal_year=2081/82',
+    '/api/distributions?disaster_type=Flood',
+    '/api/distributions?ward=4',
+    '/api/distributions?fiscal_year=2081/82&disaster_type=Flood&ward=4',
+    '/api/distributions?ward=4&view=summary',
+    '/api/distributions?q=ram',
+    '/api/distributions?bbox=80.9,29.3,81.0,29.4',
+    '/api/distributions?near=29.35,80.95&radius=500',
+    '/api/disasters',
+    '/api/disasters?bbox=80.9,29.3,81.0,29.4',
+    '/api/event-logs?event_type=Rescue',
+    '/api/event-logs?status=Completed',
+    '/api/ssf-beneficiaries?q=sita',
+    '/api/statistics?fiscal_year=2081/82',
+    '/api/statistics?ward=4&disaster_type=Flood',
+    '/api/disaster-statistics?fiscal_year=2081/82',
+    '/api/statistics/cube?dimensions=ward,disaster_type',
+    '/api/timeseries?interval=month',
+    '/api/timeseries?interval=month&disaster_type=Flood',
+    '/api/timeseries?interval=day&ward=4&from_bs_date=2081-04-01&to_bs_date=2081-06-30',
+    '/api/map-data?zoom=13&bbox=80.9,29.3,81.0,29.4',
+    '/tiles/14/11876/6793.pbf',
+    '/api/dashboard-bundle?ward=4',
+    '/api/inventory?category=Food',
+    '/api/inventory?status=Available',
+]
+
+DISASTER_TYPES = ['Flood', 'Landslide', 'Fire', 'Earthquake', 'Windstorm']
+FISCAL_YEARS = ['2079/80', '2080/81', '2081/82']
+NAMES = ['Ram', 'Sita', 'Hari', 'Gopal', 'Krishna', 'राम', 'सीता', 'हरि']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=50000, help='synthetic distributions to seed')
+    parser.add_argument('--db', help='audit a copy of this database instead of synthetic data')
+    parser.add_argument('--min-rows', type=int, default=1000, help='ignore scans of smaller tables')
+    parser.add_argument('--strict', action='store_true', help='exit 1 if anything is flagged')
+    return parser.parse_args()
+
+
+args = parse_args()
+db_path = os.path.join(_tmp_dir, 'leoc.db')
+if args.db:
+    shutil.copyfile(args.db, db_path)
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+os.environ['CACHE_PATH'] = os.path.join(_tmp_dir, 'cache.db')
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+import app as leoc
+from app import (app, db, Disaster, EventLog, FundTransaction, InventoryItem, ReliefDistribution,
+                 SocialSecurityBeneficiary, rebuild_daily_rollups, rebuild_relief_rollups)
+
+
+def seed(rows):
+    rng = random.Random(rows)
+    start = datetime(2023, 7, 17)
+
+    def when(i, count):
+        return start + timedelta(minutes=i * 1051200 // count)
+
+    def place():
+        return dict(latitude=29.3 + rng.random() / 10, longitude=80.9 + rng.random() / 10)
+
+    distributions = []
+    for i in range(rows):
+        items = [{'item': 'Rice', 'quantity': rng.randint(1, 30), 'unit': 'kg'}]
+        distributions.append(dict(
+            beneficiary_name=f'{rng.choice(NAMES)} {i}', beneficiary_id=f'AUDIT-{i}', phone=f'98{i:08d}',
+            disaster_type=rng.choice(DISASTER_TYPES), fiscal_year=rng.choice(FISCAL_YEARS), ward=rng.randint(1, 9),
+            tole=f'Tole {i % 60}', relief_items_json=json.dumps(items), relief_items_text=leoc.format_relief_items(items),
+            cash_received=rng.choice([0.0, 5000.0]), status='Distributed', distribution_date=when(i, rows),
+            created_at=when(i, rows), updated_at=when(i, rows), **place()
+        ))
+    db.session.bulk_insert_mappings(ReliefDistribution, distributions)
+
+    small = max(rows // 5, 1)
+    db.session.bulk_insert_mappings(Disaster, [dict(
+        disaster_type=rng.choice(DISASTER_TYPES), disaster_date=when(i, small).date(), ward=rng.randint(1, 9),
+        fiscal_year=rng.choice(FISCAL_YEARS), affected_people=rng.randint(0, 50), created_at=when(i, small),
+        updated_at=when(i, small), **place()
+    ) for i in range(small)])
+    db.session.bulk_insert_mappings(SocialSecurityBeneficiary, [dict(
+        beneficiary_name=f'{rng.choice(NAMES)} {i}', beneficiary_id=f'AUDIT-SSF-{i}', ssf_type='OAS',
+        ward=rng.randint(1, 9), created_at=when(i, small), updated_at=when(i, small)
+    ) for i in range(small)])
+    db.session.bulk_insert_mappings(EventLog, [dict(
+        event_type=rng.choice(['Rescue', 'Relief', 'Alert']), description=f'Event {i}',
+        status=rng.choice(['Ongoing', 'Completed']), timestamp=when(i, small), created_at=when(i, small)
+    ) for i in range(small)])
+    db.session.bulk_insert_mappings(FundTransaction, [dict(
+        transaction_type=rng.choice(['Income', 'Expense']), amount=1000.0, description=f'Transaction {i}',
+        transaction_date=when(i, small // 10 or 1).date()
+    ) for i in range(small // 10)])
+    db.session.bulk_insert_mappings(InventoryItem, [dict(
+        name=f'Item {i}', category=rng.choice(['Food', 'Shelter', 'Medical']), quantity=rng.randint(0, 500),
+        unit='kg', status=rng.choice(['Available', 'Low Stock']), created_at=when(i, 500), updated_at=when(i, 500)
+    ) for i in range(500)])
+    db.session.commit()
+    rebuild_relief_rollups()
+    rebuild_daily_rollups()
+    db.session.commit()
+
+
+def audit_urls():
+    """AUDIT_URLS plus every argument-free GET /api route they do not already cover."""
+    urls = list(AUDIT_URLS)
+    covered = {url.split('?')[0] for url in urls}
+    for rule in app.url_map.iter_rules():
+        if rule.rule.startswith('/api/') and 'GET' in rule.methods and not rule.arguments \
+                and rule.rule not in covered and '/_internal/' not in rule.rule:
+            urls.append(rule.rule)
+    return urls
+
+
+def table_sizes(conn):
+    names = [row[0] for row in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND sql NOT LIKE 'CREATE VIRTUAL%'")]
+    return {name: conn.exec_driver_sql(f'SELECT count(*) FROM "{name}"').scalar() for name in names}
+
+
+def problems(statement, plan, sizes, min_rows):
+    """The plan lines worth a look on tables of at least min_rows rows.
+
+    Those are full scans, whole-index walks of filtered queries (an
+    unfiltered walk in index order just reads the first page) and
+    temporary B-trees sorting or grouping rows from such a table.
+    """
+    tables = {match.group(1) for detail in plan for match in [re.match(r'(?:SCAN|SEARCH) (\w+)', detail)] if match}
+    large = {table for table in tables if sizes.get(table, 0) >= min_rows}
+    filtered = re.search(r'\bWHERE\b', statement, re.IGNORECASE) is not None
+    flagged = []
+    for detail in plan:
+        scan = re.match(r'SCAN (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?$', detail)
+        if scan and scan.group(1) in large:
+            table, index = scan.groups()
+            if index is None:
+                flagged.append(f'full scan of {table} ({sizes[table]:,} rows)')
+            elif filtered:
+                flagged.append(f'walks all of {index} on {table} ({sizes[table]:,} rows)')
+        elif 'USE TEMP B-TREE' in detail and large:
+            flagged.append(f"{detail.lower()} of {', '.join(sorted(large))}")
+    return flagged
+
+
+def main():
+    with app.app_context():
+        if not args.db:
+            print(f"Seeding {args.rows:,} distributions...")
+            seed(args.rows)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        results = []
+        try:
+            with app.test_client() as client:
+                for url in audit_urls():
+                    leoc.cache.clear()
+                    statements.clear()
+                    status = client.get(url).status_code
+                    results.append((url, status, list(statements)))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        conn = db.engine.connect()
+        sizes = table_sizes(conn)
+        flagged_total = 0
+        seen = {}
+        for url, status, captured in results:
+            lines = []
+            for statement, parameters in captured:
+                if statement not in seen:
+                    plan = [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+                    seen[statement] = problems(statement, plan, sizes, args.min_rows)
+                for problem in seen[statement]:
+                    lines.append(f"    {problem}\n      {' '.join(statement.split())[:160]}")
+            flagged_total += len(lines)
+            mark = '✗' if lines else '✓'
+            print(f"{mark} {url} [{status}] {len(captured)} queries")
+            for line in lines:
+                print(line)
+
+        conn.close()
+        print(f"\n{len(results)} URLs, {len(seen)} distinct queries, {flagged_total} flagged")
+    return 1 if args.strict and flagged_total else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
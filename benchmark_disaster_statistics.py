@@ -0,0 +1,83 @@
+"""Benchmark /api/disaster-statistics as the disaster table grows.
+
+Seeds a throwaway database with increasing numbers of disasters and times
+the SQL aggregation against the old row-by-row Python summing. Usage:
+
+    python benchmark_disaster_statistics.py [max_rows]
+"""
+import inspect
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix='leoc_bench_')
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'leoc.db')}"
+os.environ['CACHE_PATH'] = os.path.join(_tmp_dir, 'cache.db')
+
+from datetime import date
+
+from app import app, db, Disaster, get_disaster_statistics
+
+IMPACT_COLUMNS = [
+    'affected_people', 'deaths', 'missing_persons', 'affected_households', 'public_building_destruction',
+    'public_building_damage', 'livestock_injured', 'livestock_death', 'cattle_lost', 'cattle_injured',
+    'poultry_lost', 'poultry_injured', 'goats_sheep_lost', 'goats_sheep_injured', 'other_livestock_lost',
+    'other_livestock_injured', 'affected_people_male', 'affected_people_female', 'estimated_loss'
+]
+
+# The view without its cache and ETag decorators
+view = inspect.unwrap(get_disaster_statistics)
+
+
+def python_totals():
+    """What the endpoint did before: load every row and sum each column in Python."""
+    disasters = Disaster.query.all()
+    return {column: sum(getattr(d, column) or 0 for d in disasters) for column in IMPACT_COLUMNS}
+
+
+def seed(count):
+    rng = random.Random(count)
+    db.session.bulk_insert_mappings(Disaster, [
+        dict(disaster_type=rng.choice(['Flood', 'Landslide', 'Fire', 'Earthquake']),
+             disaster_date=date(2020 + rng.randint(0, 5), rng.randint(1, 12), rng.randint(1, 28)),
+             ward=rng.randint(1, 9), fiscal_year=rng.choice(['2079/80', '2080/81', '2081/82']),
+             estimated_loss=rng.random() * 100000,
+             **{column: rng.randint(0, 20) for column in IMPACT_COLUMNS if column != 'estimated_loss'})
+        for _ in range(count)
+    ])
+    db.session.commit()
+
+
+def best_of(fn, runs=5):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"{'rows':>8} {'sql (ms)':>10} {'python (ms)':>12}")
+    with app.app_context():
+        db.create_all()
+        total = 0
+        for size in (1000, 5000, 10000, 25000, 50000, 100000):
+            if size > max_rows:
+                break
+            seed(size - total)
+            total = size
+
+            def sql():
+                with app.test_request_context('/api/disaster-statistics'):
+                    view()
+
+            print(f"{total:>8} {best_of(sql):>10.1f} {best_of(python_totals):>12.1f}")
+            db.session.expunge_all()
+
+
+if __name__ == '__main__':
+    main()
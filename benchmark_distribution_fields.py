@@ -0,0 +1,96 @@
+"""Benchmark full rows against ?view=summary on /api/distributions.
+
+Seeds a throwaway database with 50,000 distributions (family members, harms
+and relief items filled in as the form saves them) and times serialising
+them with every field against the summary projection, both for a whole
+table read and for one page of the API. Usage:
+
+    python benchmark_distribution_fields.py [rows]
+"""
+import inspect
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix='leoc_bench_')
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'leoc.db')}"
+os.environ['CACHE_PATH'] = os.path.join(_tmp_dir, 'cache.db')
+
+from datetime import datetime, timedelta
+
+from app import (app, db, ReliefDistribution, DISTRIBUTION_VIEWS, format_relief_items, get_distributions,
+                 load_distribution_fields)
+
+# The view without its cache and ETag decorators
+view = inspect.unwrap(get_distributions)
+SUMMARY = DISTRIBUTION_VIEWS['summary']
+
+
+def seed(count):
+    rng = random.Random(count)
+    started = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        items = [{'item': item, 'quantity': rng.randint(1, 20), 'unit': 'kg'}
+                 for item in rng.sample(['Rice', 'Lentils', 'Oil', 'Salt', 'Tarpaulin', 'Blanket'], 3)]
+        rows.append(dict(
+            beneficiary_name=f'Beneficiary {i}', beneficiary_id=f'BENCH-{i}', father_name=f'Father {i}',
+            phone=f'98{i:08d}', disaster_type=rng.choice(['Flood', 'Landslide', 'Fire']),
+            fiscal_year=rng.choice(['2080/81', '2081/82']), ward=rng.randint(1, 9), tole=f'Tole {i % 40}',
+            location=f'Location {i % 200}', latitude=29.3 + rng.random() / 10, longitude=80.9 + rng.random() / 10,
+            family_members_json=json.dumps([{'name': f'Member {m}', 'relation': 'Son', 'age': 10 + m, 'gender': 'M'}
+                                            for m in range(rng.randint(2, 6))]),
+            harms_json=json.dumps([{'member_name': 'Member 0', 'harm': 'Injury', 'severity': 'Minor'}]),
+            relief_items_json=json.dumps(items), relief_items_text=format_relief_items(items),
+            cash_received=rng.choice([0.0, 5000.0, 10000.0]), status='Distributed',
+            notes='Received in person at the ward office',
+            distribution_date=started + timedelta(minutes=i), created_at=started, updated_at=started
+        ))
+    db.session.bulk_insert_mappings(ReliefDistribution, rows)
+    db.session.commit()
+
+
+def best_of(fn, runs=5):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+        db.session.expunge_all()
+    return min(timings) * 1000
+
+
+def read_table(fields):
+    query = ReliefDistribution.query
+    projection = load_distribution_fields(fields)
+    if projection is not None:
+        query = query.options(projection)
+    return json.dumps([d.to_dict(fields) for d in query])
+
+
+def read_page(params):
+    with app.test_request_context(f'/api/distributions?per_page=100&page=50{params}'):
+        return view().get_data()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+        full_bytes, summary_bytes = len(read_table(None)), len(read_table(SUMMARY))
+        print(f"{rows} distributions")
+        print(f"{'':>22} {'full':>10} {'summary':>10}")
+        print(f"{'whole table (ms)':>22} {best_of(lambda: read_table(None), 3):>10.1f} "
+              f"{best_of(lambda: read_table(SUMMARY), 3):>10.1f}")
+        print(f"{'whole table (bytes)':>22} {full_bytes:>10,} {summary_bytes:>10,}")
+        print(f"{'page of 100 (ms)':>22} {best_of(lambda: read_page('')):>10.2f} "
+              f"{best_of(lambda: read_page('&view=summary')):>10.2f}")
+        print(f"{'page of 100 (bytes)':>22} {len(read_page('')):>10,} {len(read_page('&view=summary')):>10,}")
+
+
+if __name__ == '__main__':
+    main()
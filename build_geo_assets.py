@@ -0,0 +1,135 @@
+"""Build simplified, quantized and pre-compressed map layers for map.html.
+
+For every source GeoJSON and detail level this writes
+static/geo/<name>.<level>.<hash>.json plus .gz and .br copies, and
+static/geo/manifest.json mapping each name and level to its file. Because the
+content hash is part of the filename, /geo/ can serve the files as immutable
+and browsers fetch each one only once. Re-run after editing thalara_*.json:
+
+    python build_geo_assets.py
+"""
+import glob
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip copies are always written
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_DIR, 'static', 'geo')
+SOURCES = ('thalara_wards.json', 'thalara_boundary.json')
+
+# Douglas-Peucker tolerance per level, in degrees (0.00001 deg is about 1 m here)
+LEVELS = {'high': 0.00001, 'medium': 0.00005, 'low': 0.0002}
+# Decimal places kept after quantizing; 5 is about 1 m
+PRECISION = 5
+
+
+def _perpendicular_distance(point, start, end):
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    return abs(dy * x - dx * y + x2 * y1 - y2 * x1) / (dx * dx + dy * dy) ** 0.5
+
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker simplification, iterative so long rings cannot hit the recursion limit."""
+    if len(points) < 3 or tolerance <= 0:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        index, max_distance = None, tolerance
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                index, max_distance = i, distance
+        if index is not None:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify_ring(ring, tolerance):
+    """Simplify and quantize a closed ring; falls back to the quantized ring if it would collapse."""
+    quantized = []
+    for x, y, *_ in ring:
+        point = [round(x, PRECISION), round(y, PRECISION)]
+        if not quantized or quantized[-1] != point:
+            quantized.append(point)
+    simplified = simplify_line(quantized, tolerance)
+    return simplified if len(simplified) >= 4 else quantized
+
+
+def simplify_geometry(geometry, tolerance):
+    if geometry['type'] == 'Polygon':
+        rings = [simplify_ring(ring, tolerance) for ring in geometry['coordinates']]
+        return {'type': 'Polygon', 'coordinates': rings}
+    if geometry['type'] == 'MultiPolygon':
+        polygons = [[simplify_ring(ring, tolerance) for ring in polygon] for polygon in geometry['coordinates']]
+        return {'type': 'MultiPolygon', 'coordinates': polygons}
+    return geometry
+
+
+def build_layer(source, tolerance):
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'properties': feature.get('properties') or {},
+             'geometry': simplify_geometry(feature['geometry'], tolerance)}
+            for feature in source['features']
+        ]
+    }
+
+
+def write_variants(path, body):
+    with open(path, 'wb') as f:
+        f.write(body)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(body, quality=11))
+
+
+def build():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    manifest = {}
+    for filename in SOURCES:
+        name = os.path.splitext(filename)[0]
+        with open(os.path.join(BASE_DIR, filename), encoding='utf-8') as f:
+            source = json.load(f)
+        original_size = os.path.getsize(os.path.join(BASE_DIR, filename))
+
+        manifest[name] = {}
+        for level, tolerance in LEVELS.items():
+            body = json.dumps(build_layer(source, tolerance), separators=(',', ':')).encode('utf-8')
+            digest = hashlib.sha256(body).hexdigest()[:12]
+            output = f"{name}.{level}.{digest}.json"
+            write_variants(os.path.join(OUTPUT_DIR, output), body)
+            manifest[name][level] = output
+            gzipped = os.path.getsize(os.path.join(OUTPUT_DIR, output + '.gz'))
+            print(f"{output}: {original_size:,} -> {len(body):,} bytes ({gzipped:,} gzipped)")
+
+    # Drop files from earlier builds so static/geo only holds what the manifest names
+    current = {output for levels in manifest.values() for output in levels.values()}
+    for path in glob.glob(os.path.join(OUTPUT_DIR, '*.json*')):
+        base = os.path.basename(path)
+        if base != 'manifest.json' and base.split('.json')[0] + '.json' not in current:
+            os.remove(path)
+
+    with open(os.path.join(OUTPUT_DIR, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"✅ Wrote {os.path.join(OUTPUT_DIR, 'manifest.json')}")
+
+
+if __name__ == '__main__':
+    build()
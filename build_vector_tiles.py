@@ -0,0 +1,195 @@
+"""Cut thalara_wards.json and thalara_boundary.json into vector tiles.
+
+Writes an MBTiles file (MAP_TILES_PATH, instance/map_tiles.mbtiles by
+default) holding the 'wards' and 'boundary' layers for zoom levels
+TILE_MIN_ZOOM..TILE_MAX_ZOOM. /tiles/<z>/<x>/<y>.pbf serves these together
+with live distribution and disaster points; set MAP_VECTOR_TILES=true to make
+map.html use them. Re-run after editing thalara_*.json:
+
+    python build_vector_tiles.py
+"""
+import gzip
+import json
+import os
+import sqlite3
+
+from app import (MAP_TILES_PATH, MVT_POLYGON, TILE_BUFFER, TILE_EXTENT, TILE_MAX_ZOOM, TILE_MIN_ZOOM,
+                 encode_vector_tile, lonlat_to_world, world_to_lonlat)
+from build_geo_assets import simplify_line
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LAYERS = (('wards', 'thalara_wards.json'), ('boundary', 'thalara_boundary.json'))
+
+# Douglas-Peucker tolerance in tile units (1/4096 of a tile at every zoom)
+TOLERANCE = 2
+
+
+def load_polygons(filename):
+    """[(properties, [[ring in world coordinates, ...], ...])] with one entry per polygon."""
+    with open(os.path.join(BASE_DIR, filename), encoding='utf-8') as f:
+        source = json.load(f)
+    polygons = []
+    for feature in source['features']:
+        geometry = feature['geometry']
+        if geometry['type'] == 'Polygon':
+            parts = [geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            parts = geometry['coordinates']
+        else:
+            continue
+        properties = {k: v for k, v in (feature.get('properties') or {}).items() if isinstance(v, (str, int, float))}
+        for polygon in parts:
+            rings = [[lonlat_to_world(point[0], point[1]) for point in ring] for ring in polygon]
+            polygons.append((properties, rings))
+    return polygons
+
+
+def _clip_edge(points, inside, intersect):
+    output = []
+    for i, current in enumerate(points):
+        previous = points[i - 1]
+        if inside(current):
+            if not inside(previous):
+                output.append(intersect(previous, current))
+            output.append(current)
+        elif inside(previous):
+            output.append(intersect(previous, current))
+    return output
+
+
+def clip_ring(ring, low, high):
+    """Sutherland-Hodgman clip of a ring to the square [low, high] in both axes."""
+    def cross_x(bound):
+        return lambda a, b: (bound, a[1] + (b[1] - a[1]) * (bound - a[0]) / (b[0] - a[0]))
+
+    def cross_y(bound):
+        return lambda a, b: (a[0] + (b[0] - a[0]) * (bound - a[1]) / (b[1] - a[1]), bound)
+
+    points = ring[:-1] if ring[0] == ring[-1] else ring
+    for inside, intersect in (
+        (lambda p: p[0] >= low, cross_x(low)),
+        (lambda p: p[0] <= high, cross_x(high)),
+        (lambda p: p[1] >= low, cross_y(low)),
+        (lambda p: p[1] <= high, cross_y(high)),
+    ):
+        if not points:
+            break
+        points = _clip_edge(points, inside, intersect)
+    return points
+
+
+def ring_area(ring):
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+def tile_ring(ring, z, x, y, exterior):
+    """Ring in integer tile coordinates, clipped, simplified and wound per the spec, or None."""
+    n = 2 ** z
+    projected = [((wx * n - x) * TILE_EXTENT, (wy * n - y) * TILE_EXTENT) for wx, wy in ring]
+    clipped = clip_ring(projected, -TILE_BUFFER, TILE_EXTENT + TILE_BUFFER)
+    if len(clipped) < 3:
+        return None
+    closed = simplify_line(clipped + clipped[:1], TOLERANCE)
+    points = []
+    for px, py in closed[:-1]:
+        point = (round(px), round(py))
+        if not points or points[-1] != point:
+            points.append(point)
+    area = ring_area(points) if len(points) >= 3 else 0
+    if area == 0:
+        return None
+    # Exterior rings have positive area in tile coordinates, holes negative
+    if (area > 0) != exterior:
+        points.reverse()
+    return points
+
+
+def build_tile(layers, z, x, y):
+    n = 2 ** z
+    west, east = (x - TILE_BUFFER / TILE_EXTENT) / n, (x + 1 + TILE_BUFFER / TILE_EXTENT) / n
+    north, south = (y - TILE_BUFFER / TILE_EXTENT) / n, (y + 1 + TILE_BUFFER / TILE_EXTENT) / n
+    encoded = []
+    for name, polygons in layers:
+        features = []
+        for properties, rings, (min_x, min_y, max_x, max_y) in polygons:
+            if max_x < west or min_x > east or max_y < north or min_y > south:
+                continue
+            exterior = tile_ring(rings[0], z, x, y, exterior=True)
+            if exterior is None:
+                continue
+            holes = [tile_ring(ring, z, x, y, exterior=False) for ring in rings[1:]]
+            features.append({
+                'type': MVT_POLYGON,
+                'parts': [exterior] + [hole for hole in holes if hole],
+                'properties': properties
+            })
+        encoded.append((name, features))
+    return encode_vector_tile(encoded)
+
+
+def build():
+    layers = []
+    for name, filename in LAYERS:
+        polygons = []
+        for properties, rings in load_polygons(filename):
+            xs = [p[0] for p in rings[0]]
+            ys = [p[1] for p in rings[0]]
+            polygons.append((properties, rings, (min(xs), min(ys), max(xs), max(ys))))
+        layers.append((name, polygons))
+
+    bboxes = [bbox for _, polygons in layers for _, _, bbox in polygons]
+    min_x, min_y = min(b[0] for b in bboxes), min(b[1] for b in bboxes)
+    max_x, max_y = max(b[2] for b in bboxes), max(b[3] for b in bboxes)
+
+    os.makedirs(os.path.dirname(MAP_TILES_PATH), exist_ok=True)
+    temp_path = MAP_TILES_PATH + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    conn.executescript("""
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+        CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+    """)
+
+    total = 0
+    for z in range(TILE_MIN_ZOOM, TILE_MAX_ZOOM + 1):
+        n = 2 ** z
+        count = size = 0
+        for x in range(int(min_x * n), int(max_x * n) + 1):
+            for y in range(int(min_y * n), int(max_y * n) + 1):
+                data = build_tile(layers, z, x, y)
+                if not data:
+                    continue
+                # MBTiles numbers rows from the south (TMS) and stores tiles gzipped
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                conn.execute('INSERT INTO tiles VALUES (?, ?, ?, ?)', (z, x, n - 1 - y, compressed))
+                count += 1
+                size += len(compressed)
+        print(f"z{z}: {count} tiles, {size:,} bytes")
+        total += count
+
+    west, north = world_to_lonlat(min_x, min_y)
+    east, south = world_to_lonlat(max_x, max_y)
+    metadata = {
+        'name': 'thalara',
+        'format': 'pbf',
+        'minzoom': TILE_MIN_ZOOM,
+        'maxzoom': TILE_MAX_ZOOM,
+        'bounds': f"{west:.5f},{south:.5f},{east:.5f},{north:.5f}",
+        'center': f"{(west + east) / 2:.5f},{(south + north) / 2:.5f},{TILE_MIN_ZOOM + 2}",
+        'json': json.dumps({'vector_layers': [
+            {'id': name, 'minzoom': TILE_MIN_ZOOM, 'maxzoom': TILE_MAX_ZOOM,
+             'fields': {key: 'String' for key in (polygons[0][0] if polygons else {})}}
+            for name, polygons in layers
+        ]})
+    }
+    conn.executemany('INSERT INTO metadata VALUES (?, ?)', [(k, str(v)) for k, v in metadata.items()])
+    conn.commit()
+    conn.close()
+    os.replace(temp_path, MAP_TILES_PATH)
+    print(f"✅ Wrote {total} tiles to {MAP_TILES_PATH}")
+
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,44 @@
+"""Replace single-column indexes with the composite indexes the routes need.
+
+The list routes filter relief_distribution by fiscal year, disaster type or
+ward and page it by distribution_date, the event log by type or status
+newest first, and /api/timeseries reads daily_rollup by source and day range. The single-column indexes on those tables made SQLite walk the
+whole date index and check each row, while the other relief_distribution
+indexes were never used and only slowed inserts. This creates the indexes the
+models now declare, drops the ones they replace and refreshes the planner
+statistics. Safe to re-run. Check the result with:
+
+    python audit_query_plans.py --db instance/leoc.db
+"""
+from app import app, db, DailyRollup, Disaster, EventLog, FundTransaction, ReliefDistribution
+
+REPLACED_INDEXES = [f'ix_relief_distribution_{column}' for column in (
+    'beneficiary_name', 'father_name', 'is_locked', 'disaster_date', 'disaster_type', 'fiscal_year', 'ward',
+    'tole', 'location', 'current_shelter_location', 'in_social_security_fund', 'ssf_type',
+    'poverty_card_holder', 'status', 'created_at', 'updated_at'
+)] + ['ix_event_log_event_type', 'ix_event_log_status', 'ix_disaster_fiscal_year'] + [
+    f'ix_daily_rollup_{column}' for column in ('day', 'bs_date', 'source', 'disaster_type', 'ward')
+]
+
+
+def migrate():
+    with app.app_context():
+        existing = {row[0] for row in db.session.execute(db.text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+        db.session.commit()
+
+        for model in (ReliefDistribution, EventLog, Disaster, FundTransaction, DailyRollup):
+            for index in sorted(model.__table__.indexes, key=lambda index: index.name):
+                if index.name not in existing:
+                    index.create(db.engine, checkfirst=True)
+                    print(f"✅ Created {index.name}")
+
+        dropped = [name for name in REPLACED_INDEXES if name in existing]
+        for name in dropped:
+            db.session.execute(db.text(f'DROP INDEX IF EXISTS "{name}"'))
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        print(f"✅ Dropped {len(dropped)} replaced indexes and refreshed the query planner statistics.")
+
+
+if __name__ == "__main__":
+    migrate()
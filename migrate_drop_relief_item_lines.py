@@ -0,0 +1,25 @@
+"""Drop the relief_item_line table left behind by older builds.
+
+relief_item_line held one row per relief item, a copy of
+relief_distribution.relief_items_json. The statistics now read the relief
+rollups (see rebuild_rollups.py), which are built from the JSON, so nothing
+reads or writes the table any more. Run this once after upgrading to reclaim
+the space; safe to re-run.
+"""
+from app import app, db
+from sqlalchemy import inspect, text
+
+
+def migrate():
+    with app.app_context():
+        if 'relief_item_line' not in inspect(db.engine).get_table_names():
+            print("Table 'relief_item_line' does not exist, nothing to do.")
+            return
+        count = db.session.execute(text("SELECT count(*) FROM relief_item_line")).scalar()
+        db.session.execute(text("DROP TABLE relief_item_line"))
+        db.session.commit()
+        print(f"✅ Dropped relief_item_line ({count} rows; relief_items_json still holds the items).")
+
+
+if __name__ == "__main__":
+    migrate()
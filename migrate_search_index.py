@@ -0,0 +1,25 @@
+"""Create the FTS5 search indexes behind q= on relief_distribution and social_security_beneficiary.
+
+The app creates them on startup too; run this to (re)fill them explicitly,
+e.g. after restoring a database file from a build without the triggers or
+after bulk edits made with the triggers dropped. Safe to re-run: each index
+is rebuilt from its table.
+"""
+from app import app, db, SEARCH_INDEXES, ensure_search_indexes, rebuild_search_index, search_index_tables
+
+
+def migrate():
+    with app.app_context():
+        ensure_search_indexes()
+        if not search_index_tables:
+            print("❌ SQLite FTS5 is not available; q= will scan the tables.")
+            return
+        for table, (fts, _) in SEARCH_INDEXES.items():
+            rebuild_search_index(table)
+            count = db.session.execute(db.text(f"SELECT count(*) FROM {table}")).scalar()
+            print(f"✅ Indexed {count} {table} rows in {fts}.")
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,23 @@
+"""Create the R-tree spatial indexes on relief_distribution and disaster coordinates.
+
+The app creates them on startup too; run this to (re)fill them explicitly,
+e.g. after restoring a database file from a build without the triggers.
+Safe to re-run: each index is rebuilt from the coordinate columns.
+"""
+from app import app, db, SPATIAL_INDEXES, ensure_spatial_indexes, rebuild_spatial_index, spatial_index_tables
+
+
+def migrate():
+    with app.app_context():
+        ensure_spatial_indexes()
+        if not spatial_index_tables:
+            print("❌ SQLite rtree module is not available; spatial filters will scan the tables.")
+            return
+        for table in SPATIAL_INDEXES:
+            count = rebuild_spatial_index(table)
+            print(f"✅ Indexed {count} {table} rows in {SPATIAL_INDEXES[table]}.")
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    migrate()
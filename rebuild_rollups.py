@@ -0,0 +1,22 @@
+"""Recompute the statistics rollup tables from relief_distribution and disaster.
+
+init_db() fills empty rollup tables on its own; run this any time the
+rollups may have drifted, e.g. after editing those tables directly in SQL.
+"""
+from app import app, db, rebuild_relief_rollups, rebuild_daily_rollups
+
+
+def rebuild():
+    with app.app_context():
+        # Creates the rollup tables if this database predates them
+        db.create_all()
+        print("Rebuilding relief statistics rollups...")
+        groups, item_groups = rebuild_relief_rollups()
+        print(f"✅ Rebuilt {groups} groups and {item_groups} item totals.")
+        print("Rebuilding daily rollups...")
+        days = rebuild_daily_rollups()
+        print(f"✅ Rebuilt {days} daily totals.")
+
+
+if __name__ == "__main__":
+    rebuild()
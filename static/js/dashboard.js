@@ -16,25 +16,27 @@ let filteredDistributions = [];
 let currentPage = 1;
 let itemsPerPage = 10; // Default to 10 rows per page
 
+// Last ETag and parsed body per polled URL, so refreshes can send If-None-Match
+const etagCache = new Map();
+
 // Initialize dashboard on page load
 document.addEventListener('DOMContentLoaded', function () {
-    loadDistributions();
-    loadStatistics();
+    loadDashboard();
 
     // Set up event listeners for filter controls
     setupFilterEventListeners();
 
     // Refresh data every 15 seconds for more frequent updates
-    setInterval(() => {
-        loadDistributions();
-        loadStatistics();
-    }, 15000);
+    setInterval(loadDashboard, 15000);
 });
 
 // Set up event listeners for filter controls
 function setupFilterEventListeners() {
     document.getElementById('applyFiltersBtn').addEventListener('click', applyFilters);
     document.getElementById('resetFiltersBtn').addEventListener('click', resetFilters);
+    document.getElementById('searchFilter').addEventListener('keydown', event => {
+        if (event.key === 'Enter') applyFilters();
+    });
 
     // Add event listener for per page selector
     const perPageSelector = document.getElementById('perPageSelector');
@@ -49,52 +51,82 @@ function setupFilterEventListeners() {
     }
 }
 
-// Load all distributions and populate table
-async function loadDistributions() {
+// Fetch JSON, revalidating against the ETag from the previous response.
+// Returns { data, changed }; changed is false when the server answered 304.
+async function fetchJSONWithETag(url) {
+    const previous = etagCache.get(url);
+    const headers = {};
+    if (previous) headers['If-None-Match'] = previous.etag;
+
+    // no-store: we handle validation ourselves and want to see the 304
+    const response = await fetch(url, { headers, cache: 'no-store' });
+    if (response.status === 304 && previous) {
+        return { data: previous.data, changed: false };
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        etagCache.set(url, { etag, data });
+    } else {
+        etagCache.delete(url);
+    }
+    return { data, changed: true };
+}
+
+// Query parameters for the current filter selections
+function filterParams() {
+    const params = new URLSearchParams();
+    const fiscalYearFilter = document.getElementById('fiscalYearFilter').value;
+    const disasterTypeFilter = document.getElementById('disasterTypeFilter').value;
+    const wardFilter = document.getElementById('wardFilter').value;
+    const searchFilter = document.getElementById('searchFilter').value.trim();
+    if (searchFilter) params.append('q', searchFilter);
+    if (fiscalYearFilter) params.append('fiscal_year', fiscalYearFilter);
+    if (disasterTypeFilter) params.append('disaster_type', disasterTypeFilter);
+    if (wardFilter) params.append('ward', wardFilter);
+    return params;
+}
+
+// Load the table, statistics and dropdown settings in a single request
+async function loadDashboard() {
     try {
-        // Save current filter values before refreshing data
-        const fiscalYearFilter = document.getElementById('fiscalYearFilter').value;
-        const disasterTypeFilter = document.getElementById('disasterTypeFilter').value;
-        const wardFilter = document.getElementById('wardFilter').value;
-
-        // Build query parameters
-        const params = new URLSearchParams();
-        if (fiscalYearFilter) params.append('fiscal_year', fiscalYearFilter);
-        if (disasterTypeFilter) params.append('disaster_type', disasterTypeFilter);
-        if (wardFilter) params.append('ward', wardFilter);
+        const params = filterParams();
         params.append('page', currentPage);
         params.append('per_page', itemsPerPage);
 
-        const response = await fetch(`/api/distributions?${params}`);
+        const { data: bundle, changed } = await fetchJSONWithETag(`/api/dashboard-bundle?${params}`);
 
-        // Check if the response is OK before proceeding
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+        // Nothing changed since the last poll; keep the current view as is
+        if (!changed) {
+            return;
         }
 
-        const result = await response.json();
-        const newDistributions = result.distributions;
-        const pagination = result.pagination;
-
-        // Update the stored distributions
-        currentDistributions = newDistributions;
-        filteredDistributions = newDistributions; // Since we're applying filters server-side now
-
-        // Store pagination info
-        paginationInfo = pagination;
+        showDistributions(bundle.distributions, bundle.settings);
+        showStatistics(bundle.statistics);
+    } catch (error) {
+        console.error('Error loading dashboard:', error);
+    }
+}
 
-        // Populate filter dropdowns (this preserves existing options and adds new ones)
-        populateFilterDropdowns([...currentDistributions]); // Use spread to avoid reference issues
+// Load all distributions and populate table
+async function loadDistributions() {
+    try {
+        const params = filterParams();
+        params.append('page', currentPage);
+        params.append('per_page', itemsPerPage);
 
-        // Restore the previous filter selections
-        document.getElementById('fiscalYearFilter').value = fiscalYearFilter;
-        document.getElementById('disasterTypeFilter').value = disasterTypeFilter;
-        document.getElementById('wardFilter').value = wardFilter;
+        const { data: result, changed } = await fetchJSONWithETag(`/api/distributions?${params}`);
 
-        // Update pagination controls
-        generatePaginationControls();
-        renderTablePage();
+        // Nothing changed since the last poll; keep the current table as is
+        if (!changed) {
+            return;
+        }
 
+        showDistributions(result);
     } catch (error) {
         console.error('Error loading distributions:', error);
         // Don't update the UI if there's an error, keep showing the current data
@@ -106,8 +138,36 @@ async function loadDistributions() {
     }
 }
 
+// Render a page of distributions returned by the API
+function showDistributions(result, settings) {
+    // Save current filter values before the dropdowns are rebuilt
+    const fiscalYearFilter = document.getElementById('fiscalYearFilter').value;
+    const disasterTypeFilter = document.getElementById('disasterTypeFilter').value;
+    const wardFilter = document.getElementById('wardFilter').value;
+
+    // Update the stored distributions
+    currentDistributions = result.distributions;
+    filteredDistributions = result.distributions; // Since we're applying filters server-side now
+
+    // Store pagination info
+    paginationInfo = result.pagination;
+
+    // Populate filter dropdowns (this preserves existing options and adds new ones)
+    populateFilterDropdowns([...currentDistributions], settings); // Use spread to avoid reference issues
+
+    // Restore the previous filter selections
+    document.getElementById('fiscalYearFilter').value = fiscalYearFilter;
+    document.getElementById('disasterTypeFilter').value = disasterTypeFilter;
+    document.getElementById('wardFilter').value = wardFilter;
+
+    // Update pagination controls
+    generatePaginationControls();
+    renderTablePage();
+}
+
 // Populate filter dropdowns with unique values
-function populateFilterDropdowns(distributions) {
+// Values configured in settings are offered even when the current page has none of them
+function populateFilterDropdowns(distributions, settings) {
     const fiscalYearSelect = document.getElementById('fiscalYearFilter');
     const disasterTypeSelect = document.getElementById('disasterTypeFilter');
     const wardSelect = document.getElementById('wardFilter');
@@ -118,8 +178,12 @@ function populateFilterDropdowns(distributions) {
     wardSelect.innerHTML = '<option value="">All Wards</option>';
 
     // Extract unique values
-    const fiscalYears = [...new Set(distributions.map(d => d.fiscal_year).filter(year => year))];
-    const disasterTypes = [...new Set(distributions.map(d => d.disaster_type).filter(type => type))];
+    const settingValues = key => {
+        const setting = ((settings && settings.data) || []).find(s => s.setting_key === key);
+        return setting && Array.isArray(setting.setting_value) ? setting.setting_value : [];
+    };
+    const fiscalYears = [...new Set(distributions.map(d => d.fiscal_year).concat(settingValues('fiscal_years')).filter(year => year))];
+    const disasterTypes = [...new Set(distributions.map(d => d.disaster_type).concat(settingValues('disaster_types')).filter(type => type))];
     const wards = [...new Set(distributions.map(d => d.ward).filter(ward => ward))];
 
     // Add options to selects
@@ -147,9 +211,9 @@ function populateFilterDropdowns(distributions) {
 
 // Apply filters to the distributions
 function applyFilters() {
-    // Reload distributions with current filter values
+    // Reload distributions and statistics with current filter values
     currentPage = 1; // Reset to first page when applying filters
-    loadDistributions();
+    loadDashboard();
 }
 
 // Reset all filters
@@ -157,12 +221,13 @@ function resetFilters() {
     document.getElementById('fiscalYearFilter').value = '';
     document.getElementById('disasterTypeFilter').value = '';
     document.getElementById('wardFilter').value = '';
+    document.getElementById('searchFilter').value = '';
 
     // Reset to first page
     currentPage = 1;
 
-    // Reload distributions without filters
-    loadDistributions();
+    // Reload distributions and statistics without filters
+    loadDashboard();
 }
 
 // Render the current page of the table
@@ -335,48 +400,24 @@ function arraysEqual(arr1, arr2) {
     return true;
 }
 
-// Load and display statistics
-async function loadStatistics() {
-    try {
-        // Get current filter values
-        const fiscalYearFilter = document.getElementById('fiscalYearFilter').value;
-        const disasterTypeFilter = document.getElementById('disasterTypeFilter').value;
-        const wardFilter = document.getElementById('wardFilter').value;
-
-        // Build query parameters
-        const params = new URLSearchParams();
-        if (fiscalYearFilter) params.append('fiscal_year', fiscalYearFilter);
-        if (disasterTypeFilter) params.append('disaster_type', disasterTypeFilter);
-        if (wardFilter) params.append('ward', wardFilter);
-
-        const response = await fetch(`/api/statistics?${params}`);
-
-        // Check if the response is OK before proceeding
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-
-        const stats = await response.json();
-
-        // Update stat cards with smooth transition
-        const totalDistEl = document.getElementById('total-distributions');
-        const totalItemsEl = document.getElementById('total-items');
-        const totalCashEl = document.getElementById('total-cash');
-        const totalBenEl = document.getElementById('total-beneficiaries');
-
-        if (totalDistEl && totalItemsEl && totalCashEl && totalBenEl) {
-            // Add animation effect when values change
-            animateValue(totalDistEl, parseInt(totalDistEl.textContent.replace(/,/g, '')), stats.total_distributions);
-            animateValue(totalItemsEl, parseInt(totalItemsEl.textContent.replace(/,/g, '')), stats.total_items);
-            animateValue(totalCashEl, parseFloat(totalCashEl.textContent.replace(/[₹,]/g, '')), Math.floor(stats.total_cash), 'currency');
-            animateValue(totalBenEl, parseInt(totalBenEl.textContent.replace(/,/g, '')), stats.total_distributions);
-        }
-
-        // Update charts
-        updateChartsData(stats);
-    } catch (error) {
-        console.error('Error loading statistics:', error);
+// Update the stat cards and charts from a statistics response
+function showStatistics(stats) {
+    // Update stat cards with smooth transition
+    const totalDistEl = document.getElementById('total-distributions');
+    const totalItemsEl = document.getElementById('total-items');
+    const totalCashEl = document.getElementById('total-cash');
+    const totalBenEl = document.getElementById('total-beneficiaries');
+
+    if (totalDistEl && totalItemsEl && totalCashEl && totalBenEl) {
+        // Add animation effect when values change
+        animateValue(totalDistEl, parseInt(totalDistEl.textContent.replace(/,/g, '')), stats.total_distributions);
+        animateValue(totalItemsEl, parseInt(totalItemsEl.textContent.replace(/,/g, '')), stats.total_items);
+        animateValue(totalCashEl, parseFloat(totalCashEl.textContent.replace(/[₹,]/g, '')), Math.floor(stats.total_cash), 'currency');
+        animateValue(totalBenEl, parseInt(totalBenEl.textContent.replace(/,/g, '')), stats.total_distributions);
     }
+
+    // Update charts
+    updateChartsData(stats);
 }
 
 // Helper function to animate value changes
@@ -647,8 +688,7 @@ async function deleteDistribution(id) {
 
         if (data.success) {
             showNotification('success', 'Distribution deleted successfully');
-            loadDistributions();
-            loadStatistics();
+            loadDashboard();
         } else {
             showNotification('danger', 'Error: ' + data.message);
         }
@@ -810,8 +850,7 @@ async function saveEdit() {
         if (data.success) {
             showNotification('success', 'Distribution updated successfully');
             bootstrap.Modal.getInstance(document.getElementById('editModal')).hide();
-            loadDistributions();
-            loadStatistics();
+            loadDashboard();
         } else {
             showNotification('danger', 'Error: ' + data.message);
         }
@@ -820,142 +859,27 @@ async function saveEdit() {
     }
 }
 
-// Export filtered data to XLSX or PDF
+// Export the filtered distributions as CSV or XLSX (every matching record,
+// streamed by the server) or the current page as PDF
 function exportFilteredData(format) {
-    // Get the filtered data that's currently displayed
-    let exportData;
+    if (format === 'csv' || format === 'xlsx') {
+        window.location.href = `/api/export/distributions.${format}?${filterParams()}`;
+        return;
+    }
 
     // If there are filtered results, use them; otherwise, use all data
+    let exportData;
     if (filteredDistributions && filteredDistributions.length > 0) {
         exportData = filteredDistributions;
     } else {
         exportData = currentDistributions;
     }
 
-    if (format === 'xlsx') {
-        exportToXLSX(exportData);
-    } else if (format === 'pdf') {
+    if (format === 'pdf') {
         exportToPDF(exportData);
     }
 }
 
-// Export data to XLSX format
-function exportToXLSX(data) {
-    // Check if SheetJS library is loaded
-    if (typeof XLSX === 'undefined') {
-        // Dynamically load SheetJS if not available
-        loadSheetJS(() => {
-            exportToXLSXInternal(data);
-        });
-        return;
-    }
-
-    exportToXLSXInternal(data);
-}
-
-// Internal function to export to XLSX
-function exportToXLSXInternal(data) {
-    // Prepare the data for export
-    const exportRows = data.map(dist => {
-        // Format relief items as a single string
-        const itemsList = dist.relief_items.map(item => `${item.item} ${item.quantity} ${item.unit || 'units'}`).join('; ');
-
-        return {
-            'Beneficiary Name': dist.beneficiary_name,
-            'Beneficiary ID': dist.beneficiary_id,
-            'Father Name': dist.father_name || '',
-            'Phone': dist.phone || '',
-            'Disaster Date': dist.disaster_date || '',
-            'Disaster Type': dist.disaster_type || '',
-            'Fiscal Year': dist.fiscal_year || '',
-            'Ward': dist.ward || '',
-            'Tole': dist.tole || '',
-            'Location': dist.location || '',
-            'Latitude': dist.latitude || '',
-            'Longitude': dist.longitude || '',
-            'Current Shelter Location': dist.current_shelter_location || '',
-            'Male Count': dist.male_count || 0,
-            'Female Count': dist.female_count || 0,
-            'Children Count': dist.children_count || 0,
-            'Pregnant Mother Count': dist.pregnant_mother_count || 0,
-            'Mother with Baby <2 Years': dist.mother_under_2_baby || 0,
-            'Deaths During Disaster': dist.deaths_during_disaster || 0,
-            'In Social Security Fund': dist.in_social_security_fund ? 'Yes' : 'No',
-            'SSF Type': dist.ssf_type || '',
-            'Poverty Card Holder': dist.poverty_card_holder ? 'Yes' : 'No',
-            'Bank Account Holder Name': dist.bank_account_holder_name || '',
-            'Bank Account Number': dist.bank_account_number || '',
-            'Bank Name': dist.bank_name || '',
-            'Relief Items': itemsList,
-            'Cash Received': dist.cash_received || 0,
-            'Distribution Date': dist.distribution_date || '',
-            'Status': dist.status || '',
-            'Notes': dist.notes || '',
-            'Created At': dist.created_at || '',
-            'Updated At': dist.updated_at || ''
-        };
-    });
-
-    // Create worksheet and workbook
-    const ws = XLSX.utils.json_to_sheet(exportRows);
-    const wb = XLSX.utils.book_new();
-    XLSX.utils.book_append_sheet(wb, ws, "Relief Distributions");
-
-    // Set column widths for better readability
-    const colWidths = [
-        { wch: 20 }, // Beneficiary Name
-        { wch: 15 }, // Beneficiary ID
-        { wch: 15 }, // Father Name
-        { wch: 12 }, // Phone
-        { wch: 12 }, // Disaster Date
-        { wch: 15 }, // Disaster Type
-        { wch: 12 }, // Fiscal Year
-        { wch: 8 },  // Ward
-        { wch: 15 }, // Tole
-        { wch: 20 }, // Location
-        { wch: 12 }, // Latitude
-        { wch: 12 }, // Longitude
-        { wch: 25 }, // Current Shelter Location
-        { wch: 8 },  // Male Count
-        { wch: 8 },  // Female Count
-        { wch: 8 },  // Children Count
-        { wch: 10 }, // Pregnant Mother Count
-        { wch: 10 }, // Mother with Baby <2 Years
-        { wch: 10 }, // Deaths During Disaster
-        { wch: 8 },  // In Social Security Fund
-        { wch: 12 }, // SSF Type
-        { wch: 8 },  // Poverty Card Holder
-        { wch: 20 }, // Bank Account Holder Name
-        { wch: 15 }, // Bank Account Number
-        { wch: 15 }, // Bank Name
-        { wch: 30 }, // Relief Items
-        { wch: 12 }, // Cash Received
-        { wch: 15 }, // Distribution Date
-        { wch: 12 }, // Status
-        { wch: 30 }, // Notes
-        { wch: 15 }, // Created At
-        { wch: 15 }  // Updated At
-    ];
-    ws['!cols'] = colWidths;
-
-    // Export the file
-    const fileName = `Relief_Distributions_${new Date().toISOString().slice(0, 10)}.xlsx`;
-    XLSX.writeFile(wb, fileName);
-}
-
-// Function to dynamically load SheetJS library
-function loadSheetJS(callback) {
-    if (window.XLSX) {
-        callback();
-        return;
-    }
-
-    const script = document.createElement('script');
-    script.src = 'https://cdn.sheetjs.com/xlsx-0.20.0/package/dist/xlsx.full.min.js';
-    script.onload = callback;
-    document.head.appendChild(script);
-}
-
 // Export data to PDF format
 function exportToPDF(data) {
     // Check if jsPDF library is loaded
@@ -1180,8 +1104,7 @@ async function toggleLock(id, isCurrentlyLocked) {
         if (data.success) {
             showNotification('success', `Record ${data.is_locked ? 'locked' : 'unlocked'} successfully`);
             // Reload the table to reflect the new lock status
-            loadDistributions();
-            loadStatistics();
+            loadDashboard();
         } else {
             showNotification('danger', 'Error: ' + data.message);
         }
@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+"""Tests for the LEOC response cache layer"""
+
+import gzip
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Keep the test run away from instance/leoc.db and the shared cache file
+_tmp_dir = tempfile.mkdtemp(prefix='leoc_cache_test_')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir, 'leoc.db')}")
+os.environ.setdefault('CACHE_PATH', os.path.join(_tmp_dir, 'cache.db'))
+
+from flask import jsonify
+from werkzeug.datastructures import MultiDict
+
+import app as leoc
+from app import app, db, MemoryCache, SQLiteCache, SingleFlight, cache_policy, create_cache_backend, make_cache_key
+
+
+def test_memory_cache_expiry():
+    """Memory backend returns values until their timeout passes"""
+    backend = MemoryCache()
+    backend.set('a', {'x': 1}, 60)
+    backend.set('b', {'x': 2}, -1)
+    assert backend.get('a') == {'x': 1}
+    assert backend.get('b') is None, "Expired entries must not be served"
+    backend.clear()
+    assert backend.get('a') is None
+    print("✓ Memory cache honours timeouts")
+
+
+def test_memory_cache_lru_eviction():
+    """Memory backend evicts the least recently used entry past max_entries"""
+    backend = MemoryCache(max_entries=2)
+    backend.set('a', 1, 60)
+    backend.set('b', 2, 60)
+    backend.get('a')  # 'b' is now the least recently used
+    backend.set('c', 3, 60)
+    assert backend.get('b') is None, "LRU entry should have been evicted"
+    assert backend.get('a') == 1 and backend.get('c') == 3
+    assert len(backend) == 2
+    print("✓ Memory cache evicts LRU entries")
+
+
+def test_memory_cache_byte_budget():
+    """Memory backend keeps its byte total under max_bytes"""
+    backend = MemoryCache(max_bytes=4096)
+    for i in range(50):
+        backend.set(f'k{i}', b'x' * 500, 60)
+    assert backend.size_bytes <= 4096
+    assert backend.get('k49') == b'x' * 500, "Newest entry should survive"
+    assert backend.get('k0') is None, "Oldest entry should have been evicted"
+
+    backend.set('huge', b'x' * 10000, 60)
+    assert backend.get('huge') is None, "Entries larger than the budget are not stored"
+    print("✓ Memory cache respects byte budget")
+
+
+def test_sqlite_cache_bounded():
+    """SQLite backend evicts least recently used rows past max_entries"""
+    backend = SQLiteCache(os.path.join(_tmp_dir, 'bounded.db'), max_entries=3)
+    for i in range(10):
+        backend.set(f'k{i}', i, 60)
+    assert len(backend) == 3
+    assert backend.get('k9') == 9 and backend.get('k0') is None
+    print("✓ SQLite cache is bounded")
+
+
+def test_cache_key_normalized():
+    """Query parameter order and empty filters do not change the cache key"""
+    a = make_cache_key('get_statistics', MultiDict([('ward', '1'), ('fiscal_year', '2081/82')]))
+    b = make_cache_key('get_statistics', MultiDict([('fiscal_year', '2081/82'), ('ward', '1'), ('disaster_type', '')]))
+    assert a == b, f"{a} != {b}"
+    print("✓ Cache keys are normalized")
+
+
+def test_sqlite_cache_shared_between_instances():
+    """Two SQLite backends on one file see each other's writes and clears"""
+    path = os.path.join(_tmp_dir, 'shared.db')
+    worker_a = SQLiteCache(path)
+    worker_b = SQLiteCache(path)
+
+    worker_a.set('stats', {'body': b'{}', 'status': 200}, 60)
+    assert worker_b.get('stats') == {'body': b'{}', 'status': 200}, "Entry not visible to second worker"
+
+    worker_b.clear()
+    assert worker_a.get('stats') is None, "Clear did not reach the first worker"
+    print("✓ SQLite cache is shared across workers")
+
+
+def test_tag_invalidation():
+    """delete_tags only drops entries tagged with one of the given models"""
+    for backend in (MemoryCache(), SQLiteCache(os.path.join(_tmp_dir, 'tags.db'))):
+        backend.set('stats', 1, 60, tags=('ReliefDistribution',))
+        backend.set('map', 2, 60, tags=('ReliefDistribution', 'Disaster'))
+        backend.set('funds', 3, 60, tags=('FundTransaction',))
+
+        backend.delete_tags(['Disaster'])
+        assert backend.get('map') is None
+        assert backend.get('stats') == 1 and backend.get('funds') == 3
+
+        backend.delete_tags(['ReliefDistribution', 'AppSettings'])
+        assert backend.get('stats') is None and backend.get('funds') == 3
+    print("✓ Tag invalidation is selective")
+
+
+def test_commit_invalidates_matching_tags():
+    """Committing a model change drops only the cache entries tagged with it"""
+    leoc.cache.clear()
+    with app.test_client() as client:
+        client.get('/api/statistics')
+    assert len(leoc.cache) == 1
+
+    with app.app_context():
+        db.session.add(leoc.FundTransaction(transaction_type='Income', amount=100.0, description='Donation'))
+        db.session.commit()
+    assert len(leoc.cache) == 1, "Fund entry should not invalidate relief statistics"
+
+    with app.app_context():
+        db.session.add(leoc.ReliefDistribution(beneficiary_name='Test Person', beneficiary_id='TAG-1'))
+        db.session.commit()
+    assert len(leoc.cache) == 0, "Distribution commit should invalidate relief statistics"
+    print("✓ Commits invalidate matching tags")
+
+
+def test_etag_not_modified():
+    """Polled endpoints answer 304 until a commit bumps the model's data version"""
+    with app.test_client() as client:
+        first = client.get('/api/statistics?ward=3')
+        etag = first.headers['ETag']
+        assert client.get('/api/statistics?ward=3', headers={'If-None-Match': etag}).status_code == 304
+
+        with app.app_context():
+            db.session.add(leoc.ReliefDistribution(beneficiary_name='Etag Person', beneficiary_id='ETAG-1', ward=3))
+            db.session.commit()
+
+        changed = client.get('/api/statistics?ward=3', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+    print("✓ ETag revalidation works")
+
+
+def test_etag_matches_cached_body():
+    """A cached body keeps the ETag of the versions it was built from until it is invalidated"""
+    leoc.cache.clear()
+    with app.test_client() as client:
+        etag = client.get('/api/statistics?ward=5').headers['ETag']
+
+        # A commit that has bumped the version but not yet run its invalidation
+        with app.app_context():
+            leoc.bump_data_versions(db.session.connection(), {'ReliefDistribution'})
+            db.session.commit()
+        hit = client.get('/api/statistics?ward=5')
+        assert hit.headers['X-Cache'] == 'HIT'
+        assert hit.headers['ETag'] == etag, "A pre-commit body must not get the new ETag"
+
+        leoc.invalidate_cache_tags({'ReliefDistribution'})
+        fresh = client.get('/api/statistics?ward=5', headers={'If-None-Match': etag})
+        assert fresh.status_code == 200 and fresh.headers['ETag'] != etag
+    print("✓ ETags follow the cached body's data versions")
+
+
+def test_commit_during_compute_not_cached():
+    """A response computed across a commit to its tags is returned but not cached"""
+    leoc.cache.clear()
+
+    def view():
+        db.session.add(leoc.FundTransaction(transaction_type='Income', amount=10.0, description='Mid-compute'))
+        db.session.commit()
+        return jsonify({'total': 10.0})
+
+    racing = leoc.cached(tags=('FundTransaction',))(view)
+    with app.test_request_context('/racing'):
+        assert racing().get_json() == {'total': 10.0}
+        assert leoc.cache.get(make_cache_key('view', MultiDict())) is None, "Pre-commit response must not be cached"
+
+    quiet = leoc.cached(tags=('FundTransaction',))(lambda: jsonify({'total': 0}))
+    with app.test_request_context('/quiet'):
+        quiet()
+        assert leoc.cache.get(make_cache_key('<lambda>', MultiDict())) is not None
+    print("✓ Commits during a compute keep it out of the cache")
+
+
+def test_single_flight_coalesces_threads():
+    """Concurrent callers for one key share a single computation"""
+    flights = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'stats'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do('k', compute))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1, f"Expected one computation, got {len(calls)}"
+    assert results == ['stats'] * 8
+    print("✓ Single flight coalesces concurrent misses")
+
+
+def test_sqlite_lock_is_exclusive_across_workers():
+    """Only one worker at a time holds the recompute lease for a key"""
+    path = os.path.join(_tmp_dir, 'locks.db')
+    worker_a = SQLiteCache(path)
+    worker_b = SQLiteCache(path)
+    worker_b._owner = 'other-worker'
+
+    assert worker_a.acquire_lock('stats', 5)
+    assert not worker_b.acquire_lock('stats', 5), "Second worker must wait for the lease"
+    worker_a.release_lock('stats')
+    assert worker_b.acquire_lock('stats', 5)
+
+    # Expired leases are taken over
+    assert worker_a.acquire_lock('map', -1)
+    assert worker_b.acquire_lock('map', 5)
+    print("✓ SQLite recompute lease is exclusive")
+
+
+def test_stale_entry_served_and_refreshed():
+    """An entry past its soft TTL is served immediately and rebuilt in the background"""
+    leoc.cache.clear()
+    with app.test_client() as client:
+        fresh = client.get('/api/disaster-statistics?ward=9')
+        key = make_cache_key('get_disaster_statistics', MultiDict([('ward', '9')]))
+        entry = leoc.cache.get(key)
+        entry['fresh_until'] = time.time() - 1
+        leoc.cache.set(key, entry, 60, tags=('Disaster',))
+
+        stale = client.get('/api/disaster-statistics?ward=9')
+        assert stale.status_code == 200
+        assert stale.get_json() == fresh.get_json()
+
+    deadline = time.time() + 5
+    while time.time() < deadline and leoc.cache.get(key)['fresh_until'] < time.time():
+        time.sleep(0.05)
+    assert leoc.cache.get(key)['fresh_until'] > time.time(), "Background refresh did not run"
+    print("✓ Stale entries are served while revalidating")
+
+
+def test_cache_policy_env_override():
+    """CACHE_TTL_<VIEW> overrides the soft and hard TTLs of a view"""
+    os.environ['CACHE_TTL_SOME_VIEW'] = '5,50'
+    try:
+        assert cache_policy('some_view', 30, 300) == (5, 50)
+    finally:
+        del os.environ['CACHE_TTL_SOME_VIEW']
+    assert cache_policy('some_view', 30, 300) == (30, 300)
+    assert cache_policy('some_view', 30) == (30, 30)
+    print("✓ Cache policies can be overridden per view")
+
+
+def test_unknown_backend_rejected():
+    """An unknown CACHE_BACKEND name fails loudly"""
+    try:
+        create_cache_backend('redis-ish')
+    except ValueError:
+        print("✓ Unknown backend rejected")
+        return
+    assert False, "Expected ValueError for unknown backend"
+
+
+def test_cached_endpoint_round_trip():
+    """A cached endpoint returns the same JSON on a hit as on a miss"""
+    with app.test_client() as client:
+        first = client.get('/api/statistics')
+        second = client.get('/api/statistics')
+        assert first.status_code == 200
+        assert first.get_json() == second.get_json()
+        assert second.mimetype == 'application/json'
+    print("✓ Cached endpoint round trip")
+
+
+def test_cache_stats_endpoint():
+    """cache-stats reports per-view hits, misses and invalidations, and can be reset"""
+    leoc.cache.clear()
+    headers = {'X-Unlock-Key': os.getenv('UNLOCK_KEY', 'admin123')}
+    with app.test_client() as client:
+        assert client.get('/api/_internal/cache-stats').status_code == 403, "Stats must be admin only"
+        assert client.delete('/api/_internal/cache-stats', headers=headers).status_code == 200
+
+        assert client.get('/api/statistics?ward=5').headers['X-Cache'] == 'MISS'
+        assert client.get('/api/statistics?ward=5').headers['X-Cache'] == 'HIT'
+        with app.app_context():
+            db.session.add(leoc.ReliefDistribution(beneficiary_name='Stats Person', beneficiary_id='STATS-1'))
+            db.session.commit()
+
+        stats = client.get('/api/_internal/cache-stats', headers=headers).get_json()
+        view = stats['views']['get_statistics']
+        assert view['hits'] == 1 and view['misses'] == 1 and view['hit_ratio'] == 0.5
+        assert view['avg_miss_ms'] is not None
+        assert stats['invalidations']['by_tag']['ReliefDistribution'] == 1
+        assert stats['invalidations']['entries_dropped'] >= 1
+        assert stats['worker_pid'] == os.getpid()
+
+        client.delete('/api/_internal/cache-stats', headers=headers)
+        stats = client.get('/api/_internal/cache-stats', headers=headers).get_json()
+        assert stats['views'] == {} and stats['invalidations']['commits'] == 0
+    print("✓ Cache stats endpoint works")
+
+
+def test_backend_usage_by_prefix():
+    """Both backends report entries and bytes per view prefix"""
+    for backend in (MemoryCache(), SQLiteCache(os.path.join(_tmp_dir, 'usage.db'))):
+        backend.set('get_statistics:ward=1', 1, 60)
+        backend.set('get_statistics:ward=2', 2, 60)
+        backend.set('get_map_data:', 3, 60)
+        usage = backend.usage()
+        assert usage['get_statistics']['entries'] == 2
+        assert usage['get_map_data']['entries'] == 1
+        assert sum(u['bytes'] for u in usage.values()) == backend.size_bytes
+    print("✓ Backends report usage per prefix")
+
+
+def test_cached_response_precompressed():
+    """Cache hits are served gzip or brotli encoded according to Accept-Encoding"""
+    import gzip
+    leoc.cache.clear()
+    with app.app_context():
+        for i in range(40):
+            db.session.add(leoc.Disaster(disaster_type='Flood', disaster_date=leoc.date(2024, 7, 1), ward=(i % 9) + 1,
+                                         latitude=28.2 + i / 1000, longitude=83.9, tole=f'Compress {i}'))
+        db.session.commit()
+
+    with app.test_client() as client:
+        plain = client.get('/api/map-data')
+        assert 'Content-Encoding' not in plain.headers
+        assert plain.headers['Vary'] == 'Accept-Encoding'
+
+        zipped = client.get('/api/map-data', headers={'Accept-Encoding': 'gzip'})
+        assert zipped.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(zipped.data) == plain.data
+
+        if leoc.brotli is not None:
+            br = client.get('/api/map-data', headers={'Accept-Encoding': 'gzip, br'})
+            assert br.headers['Content-Encoding'] == 'br'
+            assert leoc.brotli.decompress(br.data) == plain.data
+            assert len(br.data) < len(plain.data)
+    print("✓ Cached responses are pre-compressed")
+
+
+def test_dashboard_bundle():
+    """The bundle returns each part as its endpoint would, under one combined ETag"""
+    leoc.cache.clear()
+    with app.test_client() as client:
+        bundle = client.get('/api/dashboard-bundle?ward=2&page=1&include=distributions,statistics,funds_summary')
+        assert bundle.status_code == 200
+        data = bundle.get_json()
+        assert set(data) == {'distributions', 'statistics', 'funds_summary'}
+        assert data['statistics'] == client.get('/api/statistics?ward=2').get_json()
+        assert data['distributions'] == client.get('/api/distributions?ward=2&page=1').get_json()
+
+        # Parts live in the same cache entries as the endpoints themselves
+        assert leoc.cache.get(make_cache_key('get_statistics', MultiDict([('ward', '2')]))) is not None
+
+        etag = bundle.headers['ETag']
+        url = '/api/dashboard-bundle?ward=2&page=1&include=distributions,statistics,funds_summary'
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+        with app.app_context():
+            db.session.add(leoc.FundTransaction(transaction_type='Income', amount=50.0, description='Bundle'))
+            db.session.commit()
+        changed = client.get(url, headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.get_json()['funds_summary']['total_income'] >= 50.0
+
+        assert client.get('/api/dashboard-bundle?include=everything').status_code == 400
+    print("✓ Dashboard bundle combines cached parts")
+
+
+def test_geo_assets_precompressed():
+    """Hashed /geo assets are served precompressed and cached immutably"""
+    with app.test_request_context():
+        url = leoc.geo_asset_url('thalara_wards', 'low')
+    assert url.startswith('/geo/thalara_wards.low.')
+
+    with app.test_client() as client:
+        plain = client.get(url)
+        assert plain.status_code == 200
+        assert 'Content-Encoding' not in plain.headers
+        assert 'immutable' in plain.headers['Cache-Control']
+        assert plain.get_json()['type'] == 'FeatureCollection'
+
+        gz = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert gz.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(gz.data) == plain.data
+        assert 'Accept-Encoding' in gz.headers['Vary']
+
+        assert client.get('/geo/../app.py').status_code == 404
+    print("✓ Geo assets served precompressed")
+
+
+if __name__ == '__main__':
+    failed = 0
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            try:
+                func()
+            except AssertionError as e:
+                print(f"✗ {name} FAILED: {e}")
+                failed += 1
+    sys.exit(1 if failed else 0)
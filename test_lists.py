@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+"""Tests for the list endpoints: cursor pagination, cached page totals, sparse fieldsets, search, query plans and exports"""
+
+import csv
+import io
+import os
+import sys
+import tempfile
+import zipfile
+from datetime import date, datetime
+from xml.etree import ElementTree
+
+from sqlalchemy import event
+
+# Keep the test run away from instance/leoc.db and the shared cache file
+_tmp_dir = tempfile.mkdtemp(prefix='leoc_lists_test_')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir, 'leoc.db')}")
+os.environ.setdefault('CACHE_PATH', os.path.join(_tmp_dir, 'cache.db'))
+
+import app as leoc
+from app import app, db, Disaster, EventLog, InventoryItem, ReliefDistribution, SocialSecurityBeneficiary
+
+
+def _walk(client, url, key, direction='next', cursor=None):
+    """Every record reachable from url by following the given cursor."""
+    seen = []
+    while True:
+        data = client.get(f'{url}&cursor={cursor}' if cursor else url).get_json()
+        seen.extend(data[key])
+        cursor = data['pagination'][f'{direction}_cursor']
+        if cursor is None:
+            return seen, data
+
+
+def test_cursor_pagination():
+    """Cursors walk the same records as page numbers, in both directions"""
+    with app.app_context():
+        # Shared timestamps make the id tie-breaker matter
+        for i in range(23):
+            db.session.add(ReliefDistribution(beneficiary_name=f'Cursor {i}', beneficiary_id=f'CURSOR-{i}', fiscal_year='2060/61',
+                                              distribution_date=datetime(2024, 5, 1 + i // 4)))
+        for i in range(7):
+            db.session.add(EventLog(event_type='Cursor', description=f'Event {i}', timestamp=datetime(2024, 6, 1)))
+        db.session.commit()
+
+    with app.test_client() as client:
+        url = '/api/distributions?fiscal_year=2060/61&per_page=5'
+        by_page = []
+        for page in range(1, 6):
+            by_page.extend(d['id'] for d in client.get(f'{url}&page={page}').get_json()['distributions'])
+        first = client.get(url).get_json()['pagination']
+        assert first['total'] == 23 and first['pages'] == 5 and first['prev_cursor'] is None
+
+        forward, last = _walk(client, url, 'distributions')
+        assert [d['id'] for d in forward] == by_page
+        assert 'total' not in last['pagination'] and not last['pagination']['has_next']
+
+        # Walking back from the last page returns the same records in reverse page order
+        backward, first_page = _walk(client, url, 'distributions', 'prev', last['pagination']['prev_cursor'])
+        assert [d['id'] for d in backward] == by_page[15:20] + by_page[10:15] + by_page[5:10] + by_page[:5]
+        assert [d['id'] for d in first_page['distributions']] == by_page[:5]
+
+        counted = client.get(f"{url}&with_total=true&cursor={first['next_cursor']}").get_json()['pagination']
+        assert counted['total'] == 23
+
+        events, _ = _walk(client, '/api/event-logs?event_type=Cursor&per_page=3', 'event_logs')
+        assert [e['description'] for e in events] == [f'Event {i}' for i in reversed(range(7))]
+
+        bad = client.get('/api/disasters?cursor=not-a-cursor')
+        assert bad.status_code == 400 and bad.get_json()['errors'] == ['cursor अमान्य छ']
+        assert client.get('/api/ssf-beneficiaries?cursor=bm9wZQ').status_code == 400
+    print("✓ Cursor pagination matches page numbers")
+
+
+def test_page_totals_cached():
+    """Page totals are counted once per filter and recounted after a commit"""
+    with app.app_context():
+        db.session.add(Disaster(disaster_type='Fire', disaster_date=date(2024, 3, 1), ward=5))
+        db.session.commit()
+
+    with app.test_client() as client:
+        first = client.get('/api/disasters?per_page=2').get_json()['pagination']['total']
+        key = leoc.make_cache_key('get_disasters:count', leoc.MultiDict())
+        assert leoc.cache.get(key) == first
+        assert client.get('/api/disasters?per_page=2&page=2').get_json()['pagination']['total'] == first
+
+        with app.app_context():
+            db.session.add(Disaster(disaster_type='Fire', disaster_date=date(2024, 3, 2), ward=5))
+            db.session.commit()
+        assert leoc.cache.get(key) is None
+        assert client.get('/api/disasters?per_page=2').get_json()['pagination']['total'] == first + 1
+    print("✓ Page totals are cached per filter")
+
+
+def test_sparse_fieldsets():
+    """fields= and view=summary return only the asked-for fields and load only their columns"""
+    with app.app_context():
+        distribution = ReliefDistribution(beneficiary_name='Sparse', beneficiary_id='SPARSE-1', fiscal_year='2061/62',
+                                          phone='9800000000', cash_received=500.0)
+        distribution.set_relief_items([{'item': 'Rice', 'quantity': 5, 'unit': 'kg'}])
+        distribution.set_harms([{'member_name': 'Sparse', 'harm': 'Injury'}])
+        db.session.add(distribution)
+        db.session.commit()
+        distribution_id = distribution.id
+        full = distribution.to_dict()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.test_client() as client:
+        url = '/api/distributions?fiscal_year=2061/62'
+        assert client.get(url).get_json()['distributions'] == [full]
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            summary = client.get(f'{url}&view=summary').get_json()['distributions']
+        finally:
+            with app.app_context():
+                event.remove(db.engine, 'before_cursor_execute', record)
+        assert summary == [{name: full[name] for name in leoc.DISTRIBUTION_VIEWS['summary']}]
+        assert summary[0]['relief_items_text'] == 'Rice: 5 kg'
+        select = next(s for s in statements if 'FROM relief_distribution' in s and 'count(' not in s)
+        assert 'harms_json' not in select and 'relief_items_json' not in select, select
+
+        picked = client.get(f'{url}&fields=beneficiary_id,harms&format=columnar').get_json()['distributions']
+        assert picked['columns'] == {'beneficiary_id': ['SPARSE-1'], 'harms': [full['harms']]}
+
+        one = client.get(f'/api/distributions/{distribution_id}?fields=cash_received,relief_items').get_json()
+        assert one['data'] == {'cash_received': 500.0, 'relief_items': full['relief_items']}
+        assert client.get(f'/api/distributions/{distribution_id}').get_json()['data'] == full
+
+        bad = client.get(f'{url}&fields=beneficiary_id,password')
+        assert bad.status_code == 400 and 'password' in bad.get_json()['errors'][0]
+        assert client.get(f'{url}&view=tiny').status_code == 400
+        assert client.get(f'/api/distributions/{distribution_id}?view=summary&fields=id').status_code == 400
+    print("✓ Sparse fieldsets load only the asked-for columns")
+
+
+def test_search():
+    """q= finds Devanagari and romanized names, IDs and phones through FTS5 and follows edits"""
+    with app.app_context():
+        assert leoc.search_index_tables == {'relief_distribution', 'social_security_beneficiary'}
+        db.session.add_all([
+            ReliefDistribution(beneficiary_name='राम बहादुर थापा', father_name='हरि थापा', beneficiary_id='FTS-1',
+                               tole='सिमलटोल', phone='9841000001'),
+            ReliefDistribution(beneficiary_name='Śarmā Krishna', father_name='Ram Sharma', beneficiary_id='FTS-2',
+                               location='Ward Office', phone='9841000002'),
+            ReliefDistribution(beneficiary_name='Bahadur Ram', beneficiary_id='FTS-3',
+                               location='Bazar near the old ward office building'),
+            SocialSecurityBeneficiary(beneficiary_name='सीता कुमारी', beneficiary_id='FTS-SSF-1', ssf_type='OAS',
+                                      phone='9841000003')
+        ])
+        db.session.commit()
+
+    def names(url):
+        return [d['beneficiary_id'] for d in client.get(url).get_json()['distributions']]
+
+    with app.test_client() as client:
+        # Whole Devanagari words and their prefixes, not fragments cut at vowel signs
+        assert names('/api/distributions?q=बहादुर') == ['FTS-1']
+        assert names('/api/distributions?q=बहा') == ['FTS-1']
+        assert names('/api/distributions?q=थापा सिमल') == ['FTS-1']
+        assert names('/api/distributions?q=sarma') == ['FTS-2']
+        assert names('/api/distributions?q=FTS-2') == ['FTS-2']
+        assert names('/api/distributions?q=9841000001') == ['FTS-1']
+        # A match in the name outranks one in the father's name
+        ranked = names('/api/distributions?q=ram&per_page=50')
+        assert set(ranked) >= {'FTS-2', 'FTS-3'} and ranked.index('FTS-3') < ranked.index('FTS-2')
+
+        # FTS5 syntax in the input is searched for, not run
+        data = client.get('/api/distributions?q="थापा OR NOT&view=summary').get_json()
+        assert data['distributions'] == [] and data['pagination']['total'] == 0
+
+        ssf = client.get('/api/ssf-beneficiaries?q=सीता').get_json()
+        assert [b['beneficiary_id'] for b in ssf['beneficiaries']] == ['FTS-SSF-1']
+
+        with app.app_context():
+            edited = ReliefDistribution.query.filter_by(beneficiary_id='FTS-3').first()
+            edited.beneficiary_name = 'Gopal Karki'
+            db.session.delete(ReliefDistribution.query.filter_by(beneficiary_id='FTS-1').first())
+            db.session.commit()
+        assert names('/api/distributions?q=gopal') == ['FTS-3']
+        assert names('/api/distributions?q=bahadur') == []
+        assert names('/api/distributions?q=बहादुर') == []
+
+        assert client.get('/api/distributions?q=ram&cursor=abc').status_code == 400
+
+    # Without FTS5 the same words are matched with LIKE
+    with app.app_context():
+        leoc.search_index_tables.discard('relief_distribution')
+        try:
+            with app.test_request_context('/api/distributions?q=gopal'):
+                query = leoc.apply_search(ReliefDistribution.query, ReliefDistribution, ['karki', 'gop'])
+                assert [d.beneficiary_id for d in query] == ['FTS-3']
+        finally:
+            leoc.search_index_tables.add('relief_distribution')
+    print("✓ Search finds Devanagari and romanized names")
+
+
+def test_filtered_pages_use_composite_indexes():
+    """Filtered list pages seek the (filter, date) composite instead of walking the date index"""
+    def plan(query):
+        compiled = str(query.statement.compile(compile_kwargs={'literal_binds': True}))
+        return ' '.join(str(row[-1]) for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")))
+
+    with app.app_context():
+        newest_first = (ReliefDistribution.distribution_date.desc(), ReliefDistribution.id.desc())
+        for column, index in ((ReliefDistribution.fiscal_year, 'ix_relief_distribution_fiscal_year_date'),
+                              (ReliefDistribution.disaster_type, 'ix_relief_distribution_disaster_type_date'),
+                              (ReliefDistribution.ward, 'ix_relief_distribution_ward_date')):
+            value = 4 if column is ReliefDistribution.ward else 'x'
+            page = plan(ReliefDistribution.query.filter(column == value).order_by(*newest_first).limit(20))
+            assert f'SEARCH relief_distribution USING INDEX {index}' in page, page
+
+        events = plan(EventLog.query.filter(EventLog.status == 'Completed')
+                      .order_by(EventLog.timestamp.desc(), EventLog.id.desc()).limit(20))
+        assert 'USING INDEX ix_event_log_status_timestamp' in events, events
+    print("✓ Filtered pages use the composite indexes")
+
+
+def _sheet_rows(data):
+    """Cell values of the first worksheet of an XLSX file, as text."""
+    ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+    return [[''.join(cell.itertext()) for cell in row.findall('x:c', ns)] for row in sheet.iter(f"{{{ns['x']}}}row")]
+
+
+def test_streaming_exports():
+    """Exports stream every record the list endpoint's filters select, as CSV and XLSX"""
+    with app.app_context():
+        for i in range(12):
+            distribution = ReliefDistribution(beneficiary_name=f'निर्यात {i}', beneficiary_id=f'EXPORT-{i}', ward=i % 3 + 1,
+                                              fiscal_year='2062/63', cash_received=100.0 * i,
+                                              distribution_date=datetime(2024, 7, 1 + i))
+            distribution.set_relief_items([{'item': 'Rice', 'quantity': i, 'unit': 'kg'}])
+            db.session.add(distribution)
+        db.session.add(InventoryItem(name='Export Tent', category='ExportShelter', quantity=3, unit='pcs'))
+        db.session.commit()
+
+    with app.test_client() as client:
+        listed = client.get('/api/distributions?fiscal_year=2062/63&ward=2&per_page=100').get_json()['distributions']
+        response = client.get('/api/export/distributions.csv?fiscal_year=2062/63&ward=2&view=summary')
+        assert response.status_code == 200 and response.is_streamed
+        assert response.mimetype == 'text/csv'
+        assert 'attachment' in response.headers['Content-Disposition']
+        assert response.data.startswith('\ufeff'.encode('utf-8'))
+        rows = list(csv.DictReader(io.StringIO(response.data.decode('utf-8-sig'))))
+        assert list(rows[0]) == list(leoc.DISTRIBUTION_VIEWS['summary'])
+        assert [row['beneficiary_id'] for row in rows] == [d['beneficiary_id'] for d in listed]
+        assert rows[0]['beneficiary_name'] == listed[0]['beneficiary_name'] and rows[0]['relief_items_text'] == 'Rice: 10 kg'
+
+        # The XLSX workbook carries the same cells
+        workbook = client.get('/api/export/distributions.xlsx?fiscal_year=2062/63&ward=2&view=summary')
+        assert workbook.is_streamed and workbook.mimetype == leoc.EXPORT_FORMATS['xlsx']
+        sheet = _sheet_rows(workbook.data)
+        assert sheet[0] == list(rows[0])
+        assert [row[2] for row in sheet[1:]] == [row['beneficiary_id'] for row in rows]
+        assert sheet[1][1] == rows[0]['beneficiary_name'] and float(sheet[1][9]) == float(rows[0]['cash_received'])
+
+        # Without view= every to_dict() field is written
+        full = list(csv.reader(io.StringIO(client.get('/api/export/distributions.csv?fiscal_year=2062/63').data.decode('utf-8-sig'))))
+        assert full[0] == list(leoc.DISTRIBUTION_FIELDS) and len(full) == 13
+
+        inventory = client.get('/api/export/inventory.csv?category=ExportShelter').data.decode('utf-8-sig')
+        assert [row['name'] for row in csv.DictReader(io.StringIO(inventory))] == ['Export Tent']
+
+        bad = client.get('/api/export/distributions.csv?ward=two&view=tiny')
+        assert bad.status_code == 400 and len(bad.get_json()['errors']) == 2
+        assert client.get('/api/export/users.csv').status_code == 404
+        assert client.get('/api/export/disasters.json').status_code == 404
+    print("✓ Exports stream the filtered records")
+
+
+if __name__ == '__main__':
+    failed = 0
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            try:
+                func()
+            except AssertionError as e:
+                print(f"✗ {name} FAILED: {e}")
+                failed += 1
+    sys.exit(1 if failed else 0)
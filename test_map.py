@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+"""Tests for the map endpoints and spatial helpers: vector tiles, clustering, spatial filters, columnar format, ward lookup"""
+
+import gzip
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+
+# Keep the test run away from instance/leoc.db and the shared cache file
+_tmp_dir = tempfile.mkdtemp(prefix='leoc_map_test_')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir, 'leoc.db')}")
+os.environ.setdefault('CACHE_PATH', os.path.join(_tmp_dir, 'cache.db'))
+
+import app as leoc
+from app import app, db, Disaster, ReliefDistribution, lonlat_to_world
+import build_vector_tiles
+
+
+def _varint(buf, i):
+    value = shift = 0
+    while True:
+        byte = buf[i]
+        i += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, i
+
+
+def _fields(buf):
+    """Yield (field number, value) from a protobuf message; enough to read vector tiles."""
+    i = 0
+    while i < len(buf):
+        key, i = _varint(buf, i)
+        if key & 7 == 0:
+            value, i = _varint(buf, i)
+        elif key & 7 == 1:
+            value, i = buf[i:i + 8], i + 8
+        else:
+            length, i = _varint(buf, i)
+            value, i = buf[i:i + length], i + length
+        yield key >> 3, value
+
+
+def _packed(buf):
+    values, i = [], 0
+    while i < len(buf):
+        value, i = _varint(buf, i)
+        values.append(value)
+    return values
+
+
+def _layers(tile):
+    """{layer name: [feature property dicts]} of a vector tile."""
+    layers = {}
+    for _, layer in _fields(tile):
+        name, features, keys, values = None, [], [], []
+        for field, value in _fields(layer):
+            if field == 1:
+                name = value.decode('utf-8')
+            elif field == 2:
+                features.append(dict(_fields(value)))
+            elif field == 3:
+                keys.append(value.decode('utf-8'))
+            elif field == 4:
+                values.append(next(_fields(value))[1])
+        props = []
+        for feature in features:
+            tags = _packed(feature.get(2, b''))
+            props.append({keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])})
+        layers[name] = props
+    return layers
+
+
+def _tile_of(lon, lat, z):
+    x, y = lonlat_to_world(lon, lat)
+    return int(x * 2 ** z), int(y * 2 ** z)
+
+
+def test_vector_tiles():
+    """Tiles combine the prebuilt ward layer with live points and change with the data"""
+    z = 14
+    x, y = _tile_of(81.0, 29.45, z)
+
+    # A one-tile MBTiles file built the same way as build_vector_tiles.py does
+    tiles_path = os.path.join(_tmp_dir, 'map_tiles.mbtiles')
+    layers = []
+    for name, filename in build_vector_tiles.LAYERS:
+        polygons = []
+        for properties, rings in build_vector_tiles.load_polygons(filename):
+            xs, ys = [p[0] for p in rings[0]], [p[1] for p in rings[0]]
+            polygons.append((properties, rings, (min(xs), min(ys), max(xs), max(ys))))
+        layers.append((name, polygons))
+    conn = sqlite3.connect(tiles_path)
+    conn.execute('CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)')
+    conn.execute('INSERT INTO tiles VALUES (?, ?, ?, ?)',
+                 (z, x, 2 ** z - 1 - y, gzip.compress(build_vector_tiles.build_tile(layers, z, x, y))))
+    conn.commit()
+    conn.close()
+    leoc.MAP_TILES_PATH = tiles_path
+
+    with app.app_context():
+        db.session.add(ReliefDistribution(beneficiary_name='Tile Person', beneficiary_id='TILE-1',
+                                          ward=3, latitude=29.45, longitude=81.0, cash_received=100.0))
+        db.session.add(ReliefDistribution(beneficiary_name='Far Away', beneficiary_id='TILE-2',
+                                          ward=3, latitude=27.7, longitude=85.3))
+        db.session.commit()
+
+    with app.test_client() as client:
+        response = client.get(f'/tiles/{z}/{x}/{y}.pbf')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/vnd.mapbox-vector-tile'
+        tile = _layers(response.data)
+        assert tile['wards'], "Prebuilt ward polygons missing"
+        assert [p['beneficiary_name'] for p in tile['distributions']] == [b'Tile Person']
+        assert 'disasters' not in tile
+
+        # Each tile is its own cache entry
+        neighbour = client.get(f'/tiles/{z}/{x + 5}/{y}.pbf')
+        assert neighbour.status_code == 200 and 'distributions' not in _layers(neighbour.data)
+        assert client.get(f'/tiles/{z}/{x}/{y}.pbf').headers['X-Cache'] == 'HIT'
+
+        etag = response.headers['ETag']
+        with app.app_context():
+            db.session.add(Disaster(disaster_type='Landslide', disaster_date=date(2024, 7, 1), ward=3,
+                                     latitude=29.4501, longitude=81.0001))
+            db.session.commit()
+        changed = client.get(f'/tiles/{z}/{x}/{y}.pbf', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert [p['disaster_type'] for p in _layers(changed.data)['disasters']] == [b'Landslide']
+
+        assert client.get(f'/tiles/3/{x}/{y}.pbf').status_code == 404
+        assert client.get(f'/tiles/{z}/{2 ** z}/{y}.pbf').status_code == 404
+    print("✓ Vector tiles combine ward polygons with live points")
+
+
+def test_map_data_clusters():
+    """zoom/bbox requests are clustered from the in-memory index, which follows commits"""
+    index = leoc.map_indexes['distributions']
+    with app.app_context():
+        for i in range(3):
+            db.session.add(ReliefDistribution(beneficiary_name=f'Cluster {i}', beneficiary_id=f'CLUSTER-{i}', ward=7,
+                                              latitude=29.40 + i * 0.0005, longitude=80.95, cash_received=100.0))
+        db.session.commit()
+
+    bbox = '80.94,29.39,80.96,29.41'
+    with app.test_client() as client:
+        data = client.get(f'/api/map-data?zoom=12&bbox={bbox}').get_json()
+        assert data['success']
+        clusters = data['distributions']['clusters']
+        assert [(c['count'], c['cash_received']) for c in clusters] == [(3, 300.0)]
+        assert clusters[0]['bounds'] == [29.40, 80.95, 29.401, 80.95]
+        assert data['distributions']['points'] == []
+
+        # Past the cluster zoom every record comes back on its own
+        points = client.get(f'/api/map-data?zoom=18&bbox={bbox}').get_json()['distributions']['points']
+        assert sorted(p['beneficiary_name'] for p in points) == ['Cluster 0', 'Cluster 1', 'Cluster 2']
+        assert client.get('/api/map-data?zoom=12&bbox=80.0,28.0,80.1,28.1').get_json()['distributions'] == \
+            {'clusters': [], 'points': []}
+
+        # Local commits are applied to the index without a rebuild
+        rebuilds = []
+        original = index.rebuild
+        index.rebuild = lambda version: (rebuilds.append(version), original(version))
+        try:
+            with app.app_context():
+                moved = ReliefDistribution.query.filter_by(beneficiary_id='CLUSTER-2').first()
+                moved.latitude = 29.45
+                db.session.commit()
+            points = client.get(f'/api/map-data?zoom=18&bbox={bbox}').get_json()['distributions']['points']
+            assert sorted(p['beneficiary_name'] for p in points) == ['Cluster 0', 'Cluster 1']
+            assert rebuilds == []
+
+            # A write from another worker only shows up as a newer DataVersion
+            with app.app_context():
+                db.session.execute(db.text(
+                    "UPDATE relief_distribution SET latitude = 29.4002 WHERE beneficiary_id = 'CLUSTER-2'"))
+                leoc.bump_data_versions(db.session.connection(), ['ReliefDistribution'])
+                db.session.commit()
+            leoc.invalidate_cache_tags(['ReliefDistribution'])
+            points = client.get(f'/api/map-data?zoom=18&bbox={bbox}').get_json()['distributions']['points']
+            assert len(points) == 3 and len(rebuilds) == 1
+        finally:
+            index.rebuild = original
+
+        bad = client.get('/api/map-data?zoom=99&bbox=1,2,3')
+        assert bad.status_code == 400 and len(bad.get_json()['errors']) == 2
+    print("✓ Map data clustered by zoom and bbox")
+
+
+def test_spatial_filters():
+    """bbox and near/radius filters use the R-tree and agree across endpoints"""
+    with app.app_context():
+        assert leoc.spatial_index_tables == {'relief_distribution', 'disaster'}
+        landslide = Disaster(disaster_type='Landslide', disaster_date=date(2024, 8, 1), ward=2,
+                             latitude=29.3000, longitude=80.8000)
+        db.session.add(landslide)
+        # About 100 m and 2 km north of the landslide
+        near = ReliefDistribution(beneficiary_name='Near', beneficiary_id='RTREE-1', ward=2,
+                                  latitude=29.3009, longitude=80.8000)
+        far = ReliefDistribution(beneficiary_name='Far', beneficiary_id='RTREE-2', ward=2,
+                                 latitude=29.3300, longitude=80.8000)
+        db.session.add_all([near, far])
+        db.session.commit()
+
+        def indexed(table, id):
+            return db.session.execute(db.text(f"SELECT count(*) FROM {leoc.SPATIAL_INDEXES[table]} WHERE id = :id"),
+                                      {'id': id}).scalar()
+        assert indexed('disaster', landslide.id) == 1 and indexed('relief_distribution', far.id) == 1
+
+        # Triggers follow moves and deletes
+        far.latitude = 29.3180
+        db.session.commit()
+        far_id = far.id
+        assert db.session.execute(db.text("SELECT min_lat FROM relief_distribution_rtree WHERE id = :id"),
+                                  {'id': far_id}).scalar() < 29.319
+
+        query = leoc.apply_spatial_filter(ReliefDistribution.query, ReliefDistribution,
+                                          {'bbox': (80.79, 29.29, 80.81, 29.31), 'near': None, 'radius': None})
+        compiled = str(query.statement.compile(compile_kwargs={'literal_binds': True}))
+        plan = ' '.join(str(row[-1]) for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")))
+        assert 'relief_distribution_rtree VIRTUAL TABLE INDEX' in plan, plan
+
+    with app.test_client() as client:
+        landslide_near = 'near=29.3,80.8&radius=500'
+        names = [d['beneficiary_name'] for d in client.get(f'/api/distributions?{landslide_near}').get_json()['distributions']]
+        assert names == ['Near']
+        names = {d['beneficiary_name'] for d in client.get('/api/distributions?near=29.3,80.8&radius=300').get_json()['distributions']}
+        assert names == {'Near'}
+        wide = client.get('/api/distributions?near=29.3,80.8&radius=3000&per_page=100').get_json()['distributions']
+        assert {'Near', 'Far'} <= {d['beneficiary_name'] for d in wide}
+
+        bbox = 'bbox=80.79,29.295,80.81,29.305'
+        assert [d['disaster_type'] for d in client.get(f'/api/disasters?{bbox}').get_json()['disasters']] == ['Landslide']
+        map_data = client.get(f'/api/map-data?{landslide_near}').get_json()
+        assert [d['beneficiary_name'] for d in map_data['distributions']] == ['Near']
+        assert [d['disaster_type'] for d in map_data['disasters']] == ['Landslide']
+
+        bad = client.get('/api/distributions?near=north&radius=-1')
+        assert bad.status_code == 400 and len(bad.get_json()['errors']) == 2
+        assert client.get('/api/disasters?radius=100').status_code == 400
+        assert client.get('/api/map-data?zoom=12&near=29.3,80.8').status_code == 400
+
+    with app.app_context():
+        db.session.delete(ReliefDistribution.query.filter_by(beneficiary_id='RTREE-2').first())
+        db.session.commit()
+        assert db.session.execute(db.text("SELECT count(*) FROM relief_distribution_rtree WHERE id = :id"),
+                                  {'id': far_id}).scalar() == 0
+    print("✓ Spatial filters use the R-tree index")
+
+
+def _rows(table):
+    """Decode a format=columnar table back into records."""
+    return [{field: table['dictionaries'][field][values[i]] if field in table['dictionaries'] else values[i]
+             for field, values in table['columns'].items()}
+            for i in range(table['row_count'])]
+
+
+def test_columnar_format():
+    """format=columnar carries the same records as rows in a smaller payload"""
+    with app.app_context():
+        for i in range(30):
+            distribution = ReliefDistribution(beneficiary_name=f'Columnar {i}', beneficiary_id=f'COL-{i}', ward=8,
+                                              latitude=29.5 + i / 10000, longitude=81.1, disaster_type='Flood')
+            distribution.set_relief_items([{'item': 'Rice', 'quantity': 2, 'unit': 'kg'}])
+            db.session.add(distribution)
+            db.session.add(Disaster(disaster_type='Flood', disaster_date=date(2024, 9, 1), ward=8,
+                                    latitude=29.5 + i / 10000, longitude=81.1001))
+        db.session.commit()
+        assert distribution.relief_items_text == leoc.format_relief_items(distribution.get_relief_items())
+
+    with app.test_client() as client:
+        for url, key in (('/api/map-data?bbox=81.09,29.49,81.11,29.51', 'distributions'),
+                         ('/api/map-data?bbox=81.09,29.49,81.11,29.51', 'disasters'),
+                         ('/api/distributions?ward=8&per_page=50', 'distributions'),
+                         ('/api/disasters?bbox=81.09,29.49,81.11,29.51&per_page=50', 'disasters')):
+            rows = client.get(url)
+            columnar = client.get(f'{url}&format=columnar')
+            table = columnar.get_json()[key]
+            assert _rows(table) == rows.get_json()[key]
+            assert table['dictionaries']['disaster_type'] == ['Flood']
+            assert len(columnar.data) < len(rows.data) * 0.7, (url, len(columnar.data), len(rows.data))
+
+        points = client.get('/api/map-data?zoom=18&bbox=81.09,29.49,81.11,29.51&format=columnar').get_json()
+        assert points['distributions']['points']['row_count'] == 30
+        assert 'Rice' in points['distributions']['points']['columns']['relief_items'][0]
+
+        bad = client.get('/api/distributions?format=xml')
+        assert bad.status_code == 400 and len(bad.get_json()['errors']) == 1
+    print("✓ Columnar payloads match row payloads")
+
+
+def _point_in_ward(ward):
+    """Centre of a grid cell that lies wholly inside the ward."""
+    index = leoc.ward_index
+    for row, cells in enumerate(index.cell_wards):
+        for col, cell_ward in enumerate(cells):
+            if cell_ward == ward:
+                return (index.south + (row + 0.5) * index.cell_height,
+                        index.west + (col + 0.5) * index.cell_width)
+
+
+def test_ward_lookup_and_assignment():
+    """Coordinates resolve to wards per request and in the NumPy batch job"""
+    import assign_wards
+
+    index = leoc.ward_index
+    assert sorted(index.wards) == list(range(1, 10))
+    lat4, lon4 = _point_in_ward(4)
+    lat7, lon7 = _point_in_ward(7)
+    assert index.lookup(lat4, lon4) == 4
+    assert index.lookup(27.7, 85.3) is None
+
+    assert leoc.check_ward(None, lat4, lon4) == (4, None)
+    assert leoc.check_ward(4, lat4, lon4) == (4, None)
+    ward, warning = leoc.check_ward(5, lat4, lon4)
+    assert ward == 5 and 'वडा 4' in warning
+    assert leoc.check_ward(5, None, None) == (5, None)
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        with app.test_client() as client:
+            created = client.post('/api/ssf-beneficiaries', json={
+                'beneficiary_name': 'Ward Lookup', 'beneficiary_id': 'WARD-1', 'ssf_type': 'OAS',
+                'latitude': lat7, 'longitude': lon7
+            }).get_json()
+            assert created['success'] and created['ward_warning'] is None
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+    with app.app_context():
+        assert leoc.SocialSecurityBeneficiary.query.filter_by(beneficiary_id='WARD-1').first().ward == 7
+        db.session.add(ReliefDistribution(beneficiary_name='Wrong Ward', beneficiary_id='WARD-2', ward=1,
+                                          latitude=lat4, longitude=lon4))
+        db.session.add(ReliefDistribution(beneficiary_name='No Ward', beneficiary_id='WARD-3',
+                                          latitude=lat7, longitude=lon7))
+        db.session.commit()
+
+        lats = [lat4, lat7, 27.7]
+        assert assign_wards.lookup_wards(index, lats, [lon4, lon7, 85.3]).tolist() == [4, 7, 0]
+
+        assign_wards.check(ReliefDistribution, assign=True)
+        wards = dict(db.session.query(ReliefDistribution.beneficiary_id, ReliefDistribution.ward)
+                     .filter(ReliefDistribution.beneficiary_id.in_(['WARD-2', 'WARD-3'])).all())
+        assert wards == {'WARD-2': 1, 'WARD-3': 7}
+        assign_wards.check(ReliefDistribution, fix=True)
+        assert ReliefDistribution.query.filter_by(beneficiary_id='WARD-2').first().ward == 4
+    print("✓ Wards looked up from coordinates")
+
+
+if __name__ == '__main__':
+    failed = 0
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            try:
+                func()
+            except AssertionError as e:
+                print(f"✗ {name} FAILED: {e}")
+                failed += 1
+    sys.exit(1 if failed else 0)
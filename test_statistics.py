@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+"""Tests for the relief and disaster statistics endpoints"""
+
+import os
+import sys
+import tempfile
+
+from flask import request
+
+# Keep the test run away from instance/leoc.db and the shared cache file
+_tmp_dir = tempfile.mkdtemp(prefix='leoc_stats_test_')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir, 'leoc.db')}")
+os.environ.setdefault('CACHE_PATH', os.path.join(_tmp_dir, 'cache.db'))
+
+import app as leoc
+from app import (app, db, Disaster, ReliefDistribution, ReliefStatRollup, ReliefItemRollup, DailyRollup,
+                 rebuild_relief_rollups, rebuild_daily_rollups, bs_to_ad)
+
+
+def _add_distribution(beneficiary_id, items, **fields):
+    distribution = ReliefDistribution(beneficiary_name=f'Person {beneficiary_id}', beneficiary_id=beneficiary_id, **fields)
+    distribution.set_relief_items(items)
+    db.session.add(distribution)
+    return distribution
+
+
+def test_statistics_item_totals():
+    """Item totals are summed per item and respect the statistics filters"""
+    with app.app_context():
+        _add_distribution('STAT-1', [{'item': 'Rice', 'quantity': 10}, {'item': 'Dal', 'quantity': 2}],
+                          ward=4, fiscal_year='2070/71', cash_received=500.0)
+        _add_distribution('STAT-2', [{'item': 'Rice', 'quantity': 3}], ward=4, fiscal_year='2070/71', cash_received=250.0)
+        _add_distribution('STAT-3', [{'item': 'Rice', 'quantity': 7}], ward=5, fiscal_year='2070/71')
+        db.session.commit()
+
+    with app.test_client() as client:
+        data = client.get('/api/statistics?fiscal_year=2070/71&ward=4').get_json()
+    assert data['total_distributions'] == 2
+    assert data['total_cash'] == 750.0
+    assert data['total_items'] == 15
+    assert data['items_distribution'] == [{'item': 'Rice', 'quantity': 13}, {'item': 'Dal', 'quantity': 2}]
+    print("✓ Statistics item totals come from the rollups")
+
+
+def _rollup_snapshot():
+    stats = db.session.query(
+        ReliefStatRollup.fiscal_year, ReliefStatRollup.disaster_type, ReliefStatRollup.ward,
+        db.func.sum(ReliefStatRollup.distribution_count), db.func.round(db.func.sum(ReliefStatRollup.cash_total), 2)
+    ).group_by(ReliefStatRollup.fiscal_year, ReliefStatRollup.disaster_type, ReliefStatRollup.ward).all()
+    items = db.session.query(
+        ReliefItemRollup.fiscal_year, ReliefItemRollup.disaster_type, ReliefItemRollup.ward, ReliefItemRollup.item,
+        db.func.sum(ReliefItemRollup.line_count), db.func.sum(ReliefItemRollup.quantity)
+    ).group_by(ReliefItemRollup.fiscal_year, ReliefItemRollup.disaster_type, ReliefItemRollup.ward, ReliefItemRollup.item).all()
+    return sorted(map(tuple, stats), key=repr), sorted(map(tuple, items), key=repr)
+
+
+def test_rollups_follow_create_edit_delete():
+    """Incremental rollup maintenance matches a full rebuild"""
+    with app.app_context():
+        rebuild_relief_rollups()  # Other tests write rows behind the ORM's back
+        a = _add_distribution('ROLL-1', [{'item': 'Rice', 'quantity': 4}], ward=2, fiscal_year='2071/72',
+                              disaster_type='Flood', cash_received=100.0)
+        b = _add_distribution('ROLL-2', [{'item': 'Rice', 'quantity': 1}], ward=2, fiscal_year='2071/72',
+                              disaster_type='Flood')
+        _add_distribution('ROLL-3', [{'item': 'Tent', 'quantity': 1}])  # No group keys at all
+        db.session.commit()
+
+        # Moving a distribution to another ward and changing its items
+        a.ward = 3
+        a.cash_received = 150.0
+        a.set_relief_items([{'item': 'Dal', 'quantity': 2}])
+        db.session.commit()
+        db.session.delete(b)
+        db.session.commit()
+
+        incremental = _rollup_snapshot()
+        rebuild_relief_rollups()
+        assert _rollup_snapshot() == incremental, "Incremental rollups drifted from a rebuild"
+
+        ward_two = db.session.query(db.func.sum(ReliefStatRollup.distribution_count)).filter(
+            ReliefStatRollup.fiscal_year == '2071/72', ReliefStatRollup.ward == 2
+        ).scalar()
+        assert not ward_two, "Emptied groups should not keep counting"
+    print("✓ Rollups follow create, edit and delete")
+
+
+def test_init_db_backfills_relief_rollups():
+    """init_db fills empty relief rollups on a database that already has distributions"""
+    with app.app_context():
+        _add_distribution('INIT-1', [{'item': 'Rice', 'quantity': 6}], ward=7, fiscal_year='2072/73', cash_received=40.0)
+        db.session.commit()
+        expected = _rollup_snapshot()
+        # Simulate a database from before the rollup tables existed
+        db.session.execute(ReliefStatRollup.__table__.delete())
+        db.session.execute(ReliefItemRollup.__table__.delete())
+        db.session.commit()
+
+    leoc.init_db()
+
+    with app.app_context():
+        assert _rollup_snapshot() == expected
+    print("✓ init_db backfills relief rollups")
+
+
+def test_statistics_match_live_aggregates():
+    """Rollup-backed statistics equal aggregates computed over the distributions"""
+    with app.test_client() as client:
+        data = client.get('/api/statistics').get_json()
+    with app.app_context():
+        count, cash = db.session.query(
+            db.func.count(ReliefDistribution.id), db.func.coalesce(db.func.sum(ReliefDistribution.cash_received), 0.0)
+        ).one()
+        quantities = {}
+        for distribution in ReliefDistribution.query.all():
+            for item in distribution.get_relief_items():
+                try:
+                    quantities[item.get('item', 'Unknown')] = quantities.get(item.get('item', 'Unknown'), 0) + int(item.get('quantity', 0))
+                except (ValueError, TypeError):
+                    continue
+    assert data['total_distributions'] == count
+    assert abs(data['total_cash'] - cash) < 1e-6
+    assert {row['item']: row['quantity'] for row in data['items_distribution']} == quantities
+    print("✓ Statistics match live aggregates")
+
+
+DISASTER_TOTALS = {
+    'total_affected_people': 'affected_people', 'total_deaths': 'deaths', 'total_missing': 'missing_persons',
+    'total_affected_households': 'affected_households',
+    'total_public_buildings_destroyed': 'public_building_destruction',
+    'total_public_buildings_damaged': 'public_building_damage',
+    'total_livestock_injured': 'livestock_injured', 'total_livestock_death': 'livestock_death',
+    'total_cattle_lost': 'cattle_lost', 'total_cattle_injured': 'cattle_injured',
+    'total_poultry_lost': 'poultry_lost', 'total_poultry_injured': 'poultry_injured',
+    'total_goats_sheep_lost': 'goats_sheep_lost', 'total_goats_sheep_injured': 'goats_sheep_injured',
+    'total_other_livestock_lost': 'other_livestock_lost', 'total_other_livestock_injured': 'other_livestock_injured',
+    'total_affected_males': 'affected_people_male', 'total_affected_females': 'affected_people_female',
+    'total_estimated_loss': 'estimated_loss'
+}
+
+
+def _disaster_statistics_in_python(disasters):
+    """The row-by-row computation /api/disaster-statistics used to do"""
+    result = {'total_disasters': len(disasters)}
+    for key, column in DISASTER_TOTALS.items():
+        result[key] = sum(getattr(d, column) or 0 for d in disasters)
+    wards, types = {}, {}
+    for d in disasters:
+        wards[d.ward] = wards.get(d.ward, 0) + 1
+        types[d.disaster_type] = types.get(d.disaster_type, 0) + 1
+    result['ward_distribution'] = [{'ward': w, 'count': c} for w, c in sorted(wards.items())]
+    result['disaster_type_distribution'] = [{'disaster_type': t, 'count': c} for t, c in sorted(types.items())]
+    return result
+
+
+def test_disaster_statistics_single_pass():
+    """The SQL aggregates give the same numbers as summing the rows in Python"""
+    with app.app_context():
+        for i in range(30):
+            db.session.add(Disaster(
+                disaster_type=['Flood', 'Landslide', 'Fire'][i % 3], disaster_date=leoc.date(2024, 1 + i % 12, 1),
+                ward=(i % 4) + 1, fiscal_year='2080/81' if i % 2 else '2081/82',
+                affected_people=i, deaths=i % 3, missing_persons=i % 2, affected_households=i * 2,
+                livestock_injured=i % 5, cattle_lost=i % 7, poultry_injured=i % 4,
+                affected_people_male=i // 2, affected_people_female=i - i // 2, estimated_loss=i * 1000.5
+            ))
+        db.session.commit()
+
+    cases = ['', '?fiscal_year=2080/81', '?disaster_type=Fire', '?ward=2', '?ward=1,3&fiscal_year=2081/82', '?ward=x']
+    with app.test_client() as client:
+        for query in cases:
+            data = client.get(f'/api/disaster-statistics{query}').get_json()
+            with app.test_request_context(f'/api/disaster-statistics{query}'):
+                q = Disaster.query
+                if request.args.get('fiscal_year'):
+                    q = q.filter(Disaster.fiscal_year == request.args['fiscal_year'])
+                if request.args.get('disaster_type'):
+                    q = q.filter(Disaster.disaster_type == request.args['disaster_type'])
+                if request.args.get('ward', 'x').replace(',', '').isdigit():
+                    q = q.filter(Disaster.ward.in_([int(w) for w in request.args['ward'].split(',')]))
+                expected = _disaster_statistics_in_python(q.all())
+            for key, value in expected.items():
+                assert data[key] == value, f"{query} {key}: {data[key]!r} != {value!r}"
+    print("✓ Disaster statistics match row-by-row totals")
+
+
+def test_statistics_cube():
+    """The cube endpoint groups by any dimensions and returns aligned columns"""
+    with app.test_client() as client:
+        stats = client.get('/api/statistics').get_json()
+        cube = client.get('/api/statistics/cube?source=relief&dimensions=ward&measures=count,cash').get_json()
+        assert cube['dimensions'] == ['ward'] and cube['measures'] == ['count', 'cash']
+        by_ward = dict(zip(cube['columns']['ward'], cube['columns']['count']))
+        assert {row['ward']: row['count'] for row in stats['ward_distribution']} == \
+            {ward: count for ward, count in by_ward.items() if ward is not None}
+        assert sum(cube['columns']['count']) == stats['total_distributions']
+
+        # 'status' is not in the rollup, so this one runs on relief_distribution itself
+        base = client.get('/api/statistics/cube?dimensions=ward,status&measures=count').get_json()
+        regrouped = {}
+        for ward, count in zip(base['columns']['ward'], base['columns']['count']):
+            regrouped[ward] = regrouped.get(ward, 0) + count
+        assert regrouped == by_ward, "Rollup and base table disagree"
+
+        disasters = client.get('/api/statistics/cube?source=disaster&dimensions=disaster_type&measures=count,deaths&ward=1,2').get_json()
+        assert len(disasters['columns']['disaster_type']) == disasters['row_count'] == len(disasters['columns']['deaths'])
+        total = client.get('/api/statistics/cube?source=disaster&measures=count&ward=1,2').get_json()
+        assert total['row_count'] == 1 and total['columns']['count'] == [sum(disasters['columns']['count'])]
+
+        bad = client.get('/api/statistics/cube?dimensions=beneficiary_name')
+        assert bad.status_code == 400 and bad.get_json()['success'] is False
+        assert client.get('/api/statistics/cube?source=inventory').status_code == 400
+    print("✓ Statistics cube groups by any dimensions")
+
+
+def _ad(bs_date):
+    return leoc.datetime.strptime(bs_to_ad(bs_date), '%Y-%m-%d')
+
+
+def test_timeseries_by_bs_month():
+    """A fiscal year comes back as twelve BS months with the day rollup summed in"""
+    with app.app_context():
+        _add_distribution('TS-1', [], ward=6, cash_received=100.0, distribution_date=_ad('2060-04-05'))
+        _add_distribution('TS-2', [], ward=6, cash_received=50.0, distribution_date=_ad('2060-04-20'))
+        _add_distribution('TS-3', [], ward=7, cash_received=10.0, distribution_date=_ad('2060-09-01'))
+        db.session.commit()
+
+    with app.test_client() as client:
+        # 2060 is outside the converter tables, so it is rejected rather than guessed
+        assert client.get('/api/timeseries?fiscal_year=2060/61').status_code == 400
+
+    with app.app_context():
+        for i, distribution in enumerate(ReliefDistribution.query.filter(ReliefDistribution.beneficiary_id.like('TS-%'))):
+            distribution.distribution_date = _ad(['2081-04-05', '2081-04-20', '2081-09-01'][i])
+        db.session.commit()
+
+    with app.test_client() as client:
+        data = client.get('/api/timeseries?fiscal_year=2081/82&interval=month&ward=6,7').get_json()
+        assert data['buckets'][0] == '2081-04' and data['buckets'][-1] == '2082-03'
+        assert len(data['buckets']) == 12
+        assert data['series']['count'][0] == 2 and data['series']['cash'][0] == 150.0
+        assert data['series']['count'][5] == 1  # Poush
+        assert sum(data['series']['count']) == 3
+
+        days = client.get('/api/timeseries?from_bs_date=2081-04-01&to_bs_date=2081-04-31&interval=day&ward=6').get_json()
+        assert len(days['buckets']) == 31 and days['buckets'][4] == '2081-04-05'
+        assert days['series']['count'][4] == 1 and days['series']['count'][19] == 1
+
+        weeks = client.get('/api/timeseries?fiscal_year=2081/82&interval=week&ward=6,7').get_json()
+        assert sum(weeks['series']['cash']) == 160.0
+
+        assert client.get('/api/timeseries?interval=year').status_code == 400
+        assert client.get('/api/timeseries?from_bs_date=2081-13-45').status_code == 400
+
+    with app.app_context():
+        def snapshot():
+            return sorted((repr((r.day, r.source, r.disaster_type, r.ward, r.record_count, round(r.cash_total, 2)))
+                           for r in DailyRollup.query.all() if r.record_count))
+
+        incremental = snapshot()
+        rebuild_daily_rollups()
+        rebuilt = snapshot()
+        assert incremental == rebuilt, "Daily rollup drifted from a rebuild"
+    print("✓ Time series buckets by BS month, day and week")
+
+
+
+def test_init_db_backfills_daily_rollups():
+    """init_db fills an empty daily rollup on a database that already has records"""
+    def snapshot():
+        return sorted(repr((r.day, r.source, r.disaster_type, r.ward, r.record_count, round(r.cash_total, 2)))
+                      for r in DailyRollup.query.all() if r.record_count)
+
+    with app.app_context():
+        _add_distribution('DAILY-1', [], ward=8, cash_received=25.0, distribution_date=_ad('2081-05-10'))
+        db.session.commit()
+        expected = snapshot()
+        # Simulate a database from before the daily_rollup table existed
+        db.session.execute(DailyRollup.__table__.delete())
+        db.session.commit()
+
+    leoc.init_db()
+
+    with app.app_context():
+        assert snapshot() == expected
+    print("✓ init_db backfills daily rollups")
+
+if __name__ == '__main__':
+    failed = 0
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            try:
+                func()
+            except AssertionError as e:
+                print(f"✗ {name} FAILED: {e}")
+                failed += 1
+    sys.exit(1 if failed else 0)